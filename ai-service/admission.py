@@ -0,0 +1,214 @@
+"""
+Admission control: rate limit token bucket theo client + nhóm endpoint, giới hạn số request
+nặng chạy đồng thời, trả 429 kèm Retry-After khi vượt
+
+Nhóm endpoint:
+- heavy: /train, /predict/batch, /weather/check-batch, /matching/run, /priority/recompute
+  (train forest, hàng chục lần gọi OpenWeatherMap, query từng phần tử)
+- priority: /predict, /chat/*, /weather/check/{tinh_thanh}, /centers/nearest - lưu lượng của
+  chatbot và dự báo đơn lẻ, bucket rộng và không bị giới hạn concurrency
+- default: còn lại; /, /health, /metrics không bị giới hạn
+
+Request heavy chiếm tối đa ADMISSION_HEAVY_TOTAL thread (mỗi route tối đa
+ADMISSION_HEAVY_CONCURRENCY), phần còn lại của threadpool luôn dành cho priority / default.
+Caller nội bộ tin cậy (Next.js, action server Rasa: header X-Service-Key đúng ADMISSION_SERVICE_KEY, hoặc
+IP kết nối trực tiếp nằm trong ADMISSION_TRUSTED_CLIENTS) gom traffic của mọi người dùng về một IP nên không qua
+token bucket theo client; request heavy của họ vẫn bị giới hạn concurrency. IP lấy từ X-Forwarded-For không bao
+giờ được miễn (client tự đặt được header này).
+Trạng thái nằm trong từng process: chạy nhiều worker thì giới hạn là theo mỗi worker.
+"""
+
+import hmac
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from json_response import FastJSONResponse
+from metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# "số request/số giây" cho mỗi client; dung lượng bucket bằng số request (cho phép burst)
+RATE_LIMITS = {
+    "heavy": os.getenv("RATE_LIMIT_HEAVY", "6/60"),
+    "priority": os.getenv("RATE_LIMIT_PRIORITY", "600/60"),
+    "default": os.getenv("RATE_LIMIT_DEFAULT", "120/60"),
+}
+ADMISSION_HEAVY_CONCURRENCY = int(os.getenv("ADMISSION_HEAVY_CONCURRENCY", "2"))
+ADMISSION_HEAVY_TOTAL = int(os.getenv("ADMISSION_HEAVY_TOTAL", "4"))
+# Retry-After khi bị từ chối vì hết slot concurrency (không biết trước khi nào có slot)
+ADMISSION_BUSY_RETRY_AFTER = int(os.getenv("ADMISSION_BUSY_RETRY_AFTER", "5"))
+# Lấy IP client từ X-Forwarded-For (chỉ bật khi service nằm sau proxy tin cậy): entry thứ ADMISSION_PROXY_HOPS
+# tính từ phải sang, tức địa chỉ do proxy của mình thêm vào; các entry bên trái do client tự gửi
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "false").lower() == "true"
+ADMISSION_PROXY_HOPS = max(1, int(os.getenv("ADMISSION_PROXY_HOPS", "1")))
+# Key dịch vụ gửi qua header X-Service-Key; IP caller nội bộ (phân tách bằng dấu phẩy, mặc định trống:
+# sau reverse proxy cùng máy mọi client đều có IP loopback)
+ADMISSION_TRUSTED_CLIENTS = {
+    ip.strip() for ip in os.getenv("ADMISSION_TRUSTED_CLIENTS", "").split(",") if ip.strip()
+}
+ADMISSION_SERVICE_KEY = os.getenv("ADMISSION_SERVICE_KEY", "")
+# Số bucket tối đa giữ trong bộ nhớ (client lâu không gọi bị bỏ trước)
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+HEAVY_ROUTES = {
+    ("POST", "/train"),
+    ("POST", "/predict/batch"),
+    ("POST", "/weather/check-batch"),
+    ("POST", "/matching/run"),
+    ("POST", "/priority/recompute"),
+}
+PRIORITY_PREFIXES = ("/predict", "/chat/", "/weather/check/", "/centers/nearest")
+EXEMPT_PATHS = {"/", "/health", "/metrics"}
+
+
+def parse_rate(value: str) -> Tuple[float, float]:
+    """"6/60" -> (6 request, 60 giây)"""
+    count, _, seconds = value.partition("/")
+    return float(count), float(seconds or 1)
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Nhóm của request theo method + path (trước khi routing); None nếu không giới hạn"""
+    path = path.rstrip("/") or "/"
+    if path in EXEMPT_PATHS:
+        return None
+    if (method, path) in HEAVY_ROUTES:
+        return "heavy"
+    if path.startswith(PRIORITY_PREFIXES):
+        return "priority"
+    return "default"
+
+
+class TokenBucket:
+    """capacity token, nạp lại rate token mỗi giây"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def acquire(self) -> float:
+        """Lấy một token; trả về 0 nếu được, ngược lại số giây phải chờ tới token kế tiếp"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    def __init__(self, rate_limits: Dict[str, str] = RATE_LIMITS,
+                 heavy_concurrency: int = ADMISSION_HEAVY_CONCURRENCY,
+                 heavy_total: int = ADMISSION_HEAVY_TOTAL,
+                 max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.limits = {name: parse_rate(value) for name, value in rate_limits.items()}
+        self.heavy_concurrency = heavy_concurrency
+        self.heavy_total = heavy_total
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _check_rate(self, client: str, cls: str):
+        count, seconds = self.limits[cls]
+        with self._lock:
+            bucket = self._buckets.get((client, cls))
+            if bucket is None:
+                bucket = self._buckets[(client, cls)] = TokenBucket(count, count / seconds)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end((client, cls))
+            wait = bucket.acquire()
+        if wait:
+            raise Rejected("rate_limited", wait)
+
+    def acquire(self, client: str, cls: str, route: str, trusted: bool = False):
+        """Gọi trước khi xử lý request; raise Rejected nếu phải từ chối"""
+        if cls != "heavy":
+            if not trusted:
+                self._check_rate(client, cls)
+            return
+        # Giữ slot trước: request bị từ chối vì bận không tốn token của client
+        with self._lock:
+            total = sum(self._running.values())
+            if self._running.get(route, 0) >= self.heavy_concurrency or total >= self.heavy_total:
+                raise Rejected("busy", ADMISSION_BUSY_RETRY_AFTER)
+            self._running[route] = self._running.get(route, 0) + 1
+        if trusted:
+            return
+        try:
+            self._check_rate(client, cls)
+        except Rejected:
+            self.release(cls, route)
+            raise
+
+    def release(self, cls: str, route: str):
+        if cls != "heavy":
+            return
+        with self._lock:
+            self._running[route] -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "heavy_running": {route: n for route, n in self._running.items() if n},
+                "clients": len(self._buckets),
+            }
+
+
+controller = AdmissionController()
+
+
+def client_id(request) -> Tuple[str, bool]:
+    """(IP client, True nếu lấy từ X-Forwarded-For)"""
+    if ADMISSION_TRUST_PROXY:
+        forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+        if len(forwarded) >= ADMISSION_PROXY_HOPS:
+            return forwarded[-ADMISSION_PROXY_HOPS], True
+    return (request.client.host if request.client else "unknown"), False
+
+
+def is_trusted(request, client: str, forwarded: bool) -> bool:
+    if not forwarded and client in ADMISSION_TRUSTED_CLIENTS:
+        return True
+    key = request.headers.get("x-service-key")
+    return bool(ADMISSION_SERVICE_KEY and key) and hmac.compare_digest(key, ADMISSION_SERVICE_KEY)
+
+
+async def admission_middleware(request, call_next):
+    cls = route_class(request.method, request.url.path) if ADMISSION_ENABLED else None
+    if cls is None:
+        return await call_next(request)
+    route = f"{request.method} {request.url.path.rstrip('/')}"
+    client, forwarded = client_id(request)
+    try:
+        controller.acquire(client, cls, route, trusted=is_trusted(request, client, forwarded))
+    except Rejected as e:
+        ADMISSION_REJECTED.labels(cls, e.reason).inc()
+        logger.warning("Request rejected (%s): %s from %s", e.reason, route, client,
+                       extra={"route_class": cls, "retry_after": e.retry_after})
+        detail = "Quá nhiều request, vui lòng thử lại sau" if e.reason == "rate_limited" \
+            else "Service đang xử lý quá nhiều tác vụ nặng, vui lòng thử lại sau"
+        return FastJSONResponse({"detail": detail}, status_code=429,
+                                headers={"Retry-After": str(e.retry_after)})
+    try:
+        return await call_next(request)
+    finally:
+        controller.release(cls, route)
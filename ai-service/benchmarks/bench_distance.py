@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Benchmark ma trận khoảng cách: geo.distance_matrix (NumPy) so với haversine scalar
+Chạy: python benchmarks/bench_distance.py [--requests 10000] [--centers 500]  (từ thư mục ai-service)
+"""
+
+import argparse
+import sys
+import time
+from math import radians, sin, cos, sqrt, atan2
+from pathlib import Path
+
+import numpy as np
+
+# Thêm thư mục ai-service vào path để import geo
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from geo import distance_matrix, nearest  # noqa: E402
+
+# Khung tọa độ Việt Nam
+LAT_RANGE = (8.5, 23.4)
+LON_RANGE = (102.1, 109.5)
+
+
+def scalar_haversine_km(lat1, lon1, lat2, lon2):
+    """Bản scalar, giống _haversine_km trong chatbot/actions/actions.py"""
+    R = 6371.0
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def random_points(rng, n):
+    lat = rng.uniform(*LAT_RANGE, size=n)
+    lon = rng.uniform(*LON_RANGE, size=n)
+    return np.column_stack([lat, lon])
+
+
+def bench_scalar(requests, centers):
+    req = requests.tolist()
+    cen = centers.tolist()
+    start = time.perf_counter()
+    out = [[scalar_haversine_km(a[0], a[1], b[0], b[1]) for b in cen] for a in req]
+    return time.perf_counter() - start, np.array(out)
+
+
+def bench(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--centers", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    requests = random_points(rng, args.requests)
+    centers = random_points(rng, args.centers)
+    pairs = args.requests * args.centers
+
+    print(f"📏 {args.requests} requests × {args.centers} centers = {pairs:,} pairs")
+
+    scalar_time, scalar_result = bench_scalar(requests, centers)
+    print(f"  scalar (math)        : {scalar_time * 1000:9.1f} ms  ({pairs / scalar_time / 1e6:6.2f} M pairs/s)")
+
+    matrix_time, matrix = bench(lambda: distance_matrix(requests, centers, chunk_size=args.chunk_size), args.repeat)
+    print(f"  distance_matrix      : {matrix_time * 1000:9.1f} ms  ({pairs / matrix_time / 1e6:6.2f} M pairs/s)"
+          f"  x{scalar_time / matrix_time:.0f}")
+
+    nearest_time, _ = bench(lambda: nearest(requests, centers, k=5, chunk_size=args.chunk_size), args.repeat)
+    print(f"  nearest (k=5)        : {nearest_time * 1000:9.1f} ms")
+
+    max_error = float(np.max(np.abs(matrix - scalar_result)))
+    print(f"  max |numpy - scalar| : {max_error:.2e} km")
+    if max_error > 1e-6:
+        print("❌ Vectorized result differs from scalar haversine")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
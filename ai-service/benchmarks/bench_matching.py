@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark auto-matching: solve_matching trên dữ liệu giả lập (không cần database)
+Chạy: python benchmarks/bench_matching.py [--requests 50000] [--resources 2000]  (từ thư mục ai-service)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Thêm thư mục ai-service vào path để import matching
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from matching import solve_matching  # noqa: E402
+
+LAT_RANGE = (8.5, 23.4)
+LON_RANGE = (102.1, 109.5)
+
+# Giống dữ liệu seed (prisma/seed.ts)
+REQUEST_TYPES = [
+    "Thực phẩm khẩn cấp",
+    "Nước uống và thuốc men",
+    "Chỗ ở tạm thời",
+    "Hỗ trợ y tế",
+    "Quần áo và chăn màn",
+    "Cứu hộ khẩn cấp",
+]
+RESOURCE_TYPES = ["Thực phẩm", "Nước uống", "Y tế", "Chỗ ở", "Quần áo", "Điện tử", "Năng lượng"]
+
+
+def make_requests(rng, n):
+    lat = rng.uniform(*LAT_RANGE, size=n)
+    lon = rng.uniform(*LON_RANGE, size=n)
+    types = rng.integers(0, len(REQUEST_TYPES), size=n)
+    people = rng.integers(1, 200, size=n)
+    # ~5% yêu cầu không có tọa độ
+    missing = rng.random(n) < 0.05
+    return [
+        {
+            "id": i + 1,
+            "loai_yeu_cau": REQUEST_TYPES[types[i]],
+            "so_nguoi": int(people[i]),
+            "vi_do": None if missing[i] else float(lat[i]),
+            "kinh_do": None if missing[i] else float(lon[i]),
+        }
+        for i in range(n)
+    ]
+
+
+def make_resources(rng, m):
+    lat = rng.uniform(*LAT_RANGE, size=m)
+    lon = rng.uniform(*LON_RANGE, size=m)
+    types = rng.integers(0, len(RESOURCE_TYPES), size=m)
+    stock = rng.integers(50, 5000, size=m)
+    minimum = rng.integers(10, 200, size=m)
+    return [
+        {
+            "id": j + 1,
+            "loai": RESOURCE_TYPES[types[j]],
+            "so_luong": int(stock[j]),
+            "so_luong_toi_thieu": int(minimum[j]),
+            "vi_do": float(lat[j]),
+            "kinh_do": float(lon[j]),
+        }
+        for j in range(m)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--resources", type=int, default=2_000)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    requests = make_requests(rng, args.requests)
+    resources = make_resources(rng, args.resources)
+
+    print(f"🔗 {args.requests} requests × {args.resources} resources")
+    start = time.perf_counter()
+    result = solve_matching(requests, resources, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    matched = int(np.count_nonzero(result["resource_ids"] >= 0))
+    print(f"  solve_matching : {elapsed * 1000:9.1f} ms  ({args.requests / elapsed:,.0f} requests/s)")
+    print(f"  matched        : {matched}/{args.requests}")
+    print(f"  avg distance   : {np.nanmean(result['distances']):.1f} km")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
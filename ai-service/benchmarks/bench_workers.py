@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+So sánh throughput của ai-service với 1 và N worker (gunicorn -c gunicorn.conf.py)
+Chạy: python benchmarks/bench_workers.py --workers 1,4 --duration 20 --concurrency 16  (từ thư mục ai-service)
+
+Mỗi cấu hình: start gunicorn trên một port riêng, chờ /health, rồi --concurrency process
+client gửi request liên tục trong --duration giây (client là process riêng nên không bị GIL
+của client giới hạn). Kịch bản:
+- predict: POST /predict?persist=false xoay vòng tỉnh / loại thiên tai (cache dùng chung + ML/heuristic)
+- chat: POST /chat/query (statistics, requests, centers) - cần DATABASE_URL
+- root: GET / (chi phí của framework)
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import requests
+
+AI_SERVICE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(AI_SERVICE_DIR))
+
+from features import DISASTER_TYPES, PROVINCES  # noqa: E402
+
+
+def _scenario_requests(scenario: str):
+    if scenario == "predict":
+        for i in itertools.count():
+            yield "POST", "/predict?persist=false", {
+                "tinh_thanh": PROVINCES[i % len(PROVINCES)],
+                "loai_thien_tai": DISASTER_TYPES[(i // len(PROVINCES)) % len(DISASTER_TYPES)],
+            }
+    elif scenario == "chat":
+        queries = ["statistics", "requests", "centers"]
+        for i in itertools.count():
+            yield "POST", "/chat/query", {"query_type": queries[i % len(queries)], "limit": 20}
+    else:
+        while True:
+            yield "GET", "/", None
+
+
+def _client(base_url: str, scenario: str, duration: float, offset: int):
+    """Một process client: gửi tuần tự tới khi hết giờ, trả về (latency ms của từng request, số lỗi)"""
+    session = requests.Session()
+    latencies, errors = [], 0
+    plan = _scenario_requests(scenario)
+    for _ in range(offset):
+        next(plan)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        method, path, body = next(plan)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=30)
+            if response.status_code >= 400:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, errors
+
+
+def _wait_ready(base_url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Service at {base_url} not ready after {timeout}s")
+
+
+def run_config(workers: int, port: int, args) -> dict:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}",
+           "LOG_LEVEL": "WARNING"}
+    # gunicorn.conf.py tự tạo socket trong thư mục riêng và sinh authkey cho mỗi lần chạy
+    env.pop("SHARED_STATE_ADDRESS", None)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+                              cwd=AI_SERVICE_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        # Warm-up: model, cache, kết nối
+        _client(base_url, args.scenario, 2, 0)
+        with ProcessPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(_client, base_url, args.scenario, args.duration, i * 7)
+                       for i in range(args.concurrency)]
+            results = [f.result() for f in futures]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies = sorted(ms for lat, _ in results for ms in lat)
+    errors = sum(err for _, err in results)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,{min(os.cpu_count() or 1, 4)}", help="các số worker cần so sánh")
+    parser.add_argument("--scenario", choices=["predict", "chat", "root"], default="predict")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16, help="số process client")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    rows = []
+    for i, workers in enumerate(int(w) for w in args.workers.split(",")):
+        row = run_config(workers, args.port + i, args)
+        rows.append(row)
+        print(f"⏱️  {workers} worker(s): {row['rps']:.0f} req/s, p50 {row['p50_ms']:.1f}ms, "
+              f"p95 {row['p95_ms']:.1f}ms, {row['errors']} errors")
+
+    base = rows[0]["rps"] or 1.0
+    print(f"\n{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50':>9} {'p95':>9} {'errors':>7}")
+    for row in rows:
+        print(f"{row['workers']:8d} {row['rps']:10.0f} {row['rps'] / base:7.2f}x "
+              f"{row['p50_ms']:7.1f}ms {row['p95_ms']:7.1f}ms {row['errors']:7d}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Thời gian import main (cold start của ai-service) đo bằng python -X importtime
+Chạy: python benchmarks/import_time.py [--top 15]  (từ thư mục ai-service)
+
+In tổng thời gian import, các module tốn nhiều nhất (cumulative), và exit code 1 nếu
+một module nặng lẽ ra phải import muộn (--forbid, mặc định sklearn, joblib, apscheduler)
+bị import ngay khi import main.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+AI_SERVICE_DIR = Path(__file__).parent.parent
+
+# Chỉ được import khi cần (ML lần đầu / lifespan), không phải lúc import main
+LAZY_MODULES = ("sklearn", "joblib", "apscheduler")
+
+
+def import_times(module: str = "main") -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """
+    Import module trong một process mới với -X importtime.
+    Trả về (tổng microsecond của module, {tên module: (self us, cumulative us)})
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AI_SERVICE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+        if name.strip() == module and not name[1:].startswith(" "):
+            total = int(cumulative_us)
+    return total, modules
+
+
+def top_level_packages(modules: Dict[str, Tuple[int, int]]) -> List[Tuple[str, int]]:
+    """Tổng self time theo package gốc (numpy, fastapi, ...), giảm dần"""
+    totals: Dict[str, int] = {}
+    for name, (self_us, _) in modules.items():
+        root = name.split(".")[0]
+        totals[root] = totals.get(root, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--forbid", default=",".join(LAZY_MODULES),
+                        help="package không được import lúc khởi động (phân cách bằng dấu phẩy, rỗng để bỏ qua)")
+    args = parser.parse_args()
+
+    total, modules = import_times(args.module)
+    print(f"⏱️  import {args.module}: {total / 1000:.1f} ms ({len(modules)} modules)\n")
+    print(f"{'package':30} {'self':>10}")
+    for name, self_us in top_level_packages(modules)[:args.top]:
+        print(f"{name:30} {self_us / 1000:8.1f}ms")
+
+    forbidden = [p for p in args.forbid.split(",") if p]
+    eager = sorted({name.split(".")[0] for name in modules} & set(forbidden))
+    if eager:
+        print(f"\n❌ Imported at startup (should be lazy): {', '.join(eager)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+"""
+Benchmark các đường nóng của ai-service và so với baseline đã lưu
+Chạy: python benchmarks/run_benchmarks.py [--filter chat] [--save-baseline]  (từ thư mục ai-service)
+
+- Không cần database: import main (cold start, process mới với -X importtime), get_province_coords, analyze_disaster_risk (dữ liệu thời tiết mẫu trong
+  benchmarks/fixtures/weather.json), ML predict đơn lẻ / batch (model train trên dữ liệu giả lập,
+  registry tạm, không đụng tới models/).
+- Cần DATABASE_URL (nên nạp dữ liệu bằng scripts/generate_synthetic_data.py): heuristic_prediction,
+  các handler /chat/query và train_models. Tự bỏ qua khi không kết nối được.
+
+Baseline nằm ở benchmarks/baseline.json (--save-baseline để ghi lại trên máy tham chiếu).
+Exit code 1 nếu có benchmark chậm hơn baseline quá --threshold (mặc định 25%), hoặc nếu chưa có
+baseline (gate CI không được âm thầm bỏ qua); --no-compare để chỉ đo.
+
+Runner riêng (không dùng pytest-benchmark / pytest-postgresql): benchmark database chạy trên
+DATABASE_URL có sẵn dữ liệu giả lập thay vì một Postgres tạm dựng cho mỗi lần chạy.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# Thêm thư mục ai-service vào path để import main
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import main  # noqa: E402
+from db import get_db_connection  # noqa: E402
+from import_time import import_times  # noqa: E402
+from features import DISASTER_TYPES, PROVINCES, FeatureEncoder  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from prediction_cache import PredictionCache  # noqa: E402
+from training import MODEL_TARGETS, compute_targets, train_models  # noqa: E402
+from weather_service import analyze_disaster_risk, get_province_coords  # noqa: E402
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+WEATHER_FIXTURES = BENCH_DIR / "fixtures" / "weather.json"
+
+# Giống dữ liệu seed (prisma/seed.ts)
+RESOURCE_TYPES = ["Thực phẩm", "Nước uống", "Y tế", "Chỗ ở", "Quần áo", "Điện tử", "Năng lượng"]
+
+# Tên tỉnh như người dùng / chatbot gửi lên (khớp đúng, khớp một phần, không khớp)
+PROVINCE_QUERIES = ["Hà Nội", "Hồ Chí Minh", "Đà Nẵng", "Huế", "Quảng", "Cần Thơ", "Sài Gòn", "Nghệ An"]
+
+CHAT_QUERIES = [
+    ("statistics", None),
+    ("requests", None),
+    ("requests", {"request_type": "thực phẩm"}),
+    ("pending_requests", None),
+    ("urgent_requests", None),
+    ("resources", {"resource_type": "thực phẩm"}),
+    ("centers", {"location": "hà nội"}),
+    ("distributions", None),
+    ("predictions", None),
+    ("recent_activities", None),
+]
+
+# (tên, factory(ctx) -> hàm cần đo, số lần gọi mỗi lượt đo, cần database)
+BENCHMARKS = []
+
+
+def benchmark(name, number=1, needs_db=False):
+    def register(factory):
+        BENCHMARKS.append((name, factory, number, needs_db))
+        return factory
+    return register
+
+
+def _synthetic_registry(root: str, rows: int = 5000, seed: int = 42) -> ModelRegistry:
+    """Train 4 model trên dữ liệu giả lập (cùng encoder / tham số với training.py) vào registry tạm"""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(10, 500, size=len(RESOURCE_TYPES))
+    encoder = FeatureEncoder().fit_counts({r: int(c) for r, c in zip(RESOURCE_TYPES, counts)})
+    so_nguoi = rng.integers(1, 500, size=rows)
+    X = encoder.transform([
+        {
+            "tinh_thanh": PROVINCES[rng.integers(len(PROVINCES))],
+            "loai_thien_tai": DISASTER_TYPES[rng.integers(len(DISASTER_TYPES))],
+            "loai_nguon_luc": RESOURCE_TYPES[rng.integers(len(RESOURCE_TYPES))],
+            "so_nguoi": int(so_nguoi[i]),
+            "ngay": datetime(2024, int(rng.integers(1, 13)), 1),
+        }
+        for i in range(rows)
+    ])
+    Y = compute_targets(so_nguoi.astype(np.float64))
+    models = {
+        name: RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1).fit(X, Y[:, i])
+        for i, name in enumerate(MODEL_TARGETS)
+    }
+    registry = ModelRegistry(root)
+    version = registry.publish(
+        {"encoder": encoder.to_dict(), "models": models, "feature_names": encoder.feature_names,
+         "n_samples": rows, "trained_at": datetime.now().isoformat()},
+        {"training": {"synthetic_rows": rows}},
+    )
+    registry.promote(version)
+    return registry
+
+
+def _use_synthetic_model(ctx):
+    if "registry" not in ctx:
+        ctx["registry"] = _synthetic_registry(tempfile.mkdtemp(prefix="bench_models_"))
+    main.model_registry = ctx["registry"]
+
+
+@benchmark("startup:import_main", number=1)
+def bench_import_main(ctx):
+    # Process mới mỗi lần: gồm cả khởi động interpreter, đúng như cold start của container
+    return lambda: import_times("main")
+
+
+@benchmark("get_province_coords", number=1000)
+def bench_province_coords(ctx):
+    def run():
+        for name in PROVINCE_QUERIES:
+            get_province_coords(name)
+    return run
+
+
+def _register_weather_benchmarks():
+    with open(WEATHER_FIXTURES, encoding="utf-8") as f:
+        scenarios = json.load(f)
+    for scenario, data in scenarios.items():
+        def factory(ctx, data=data):
+            return lambda: analyze_disaster_risk(data["weather"], data["forecast"])
+        benchmark(f"analyze_disaster_risk[{scenario}]", number=1000)(factory)
+
+
+_register_weather_benchmarks()
+
+
+@benchmark("ml_prediction", number=20)
+def bench_ml_prediction(ctx):
+    _use_synthetic_model(ctx)
+    request = main.PredictionRequest(tinh_thanh="Quảng Bình", loai_thien_tai="Lũ lụt", so_nguoi=1000)
+    return lambda: main.ml_prediction_batch([request])
+
+
+def _batch_requests(n=60):
+    return [
+        main.PredictionRequest(tinh_thanh=PROVINCES[i % len(PROVINCES)],
+                               loai_thien_tai=DISASTER_TYPES[i % len(DISASTER_TYPES)])
+        for i in range(n)
+    ]
+
+
+@benchmark("predict_batch[uncached]", number=5)
+def bench_predict_batch(ctx):
+    _use_synthetic_model(ctx)
+    items = _batch_requests()
+
+    def run():
+        # Cache kích thước 0: mọi phần tử đều phải chạy model
+        main.prediction_cache = PredictionCache(max_size=0)
+        return main.predict_batch(items, persist=False)
+    return run
+
+
+@benchmark("predict_batch[cached]", number=50)
+def bench_predict_batch_cached(ctx):
+    _use_synthetic_model(ctx)
+    items = _batch_requests()
+    main.prediction_cache = PredictionCache()
+    main.predict_batch(items, persist=False)
+    return lambda: main.predict_batch(items, persist=False)
+
+
+@benchmark("heuristic_prediction", number=20, needs_db=True)
+def bench_heuristic(ctx):
+    return lambda: main.heuristic_prediction("Hà Nội", "Lũ lụt", 1000)
+
+
+def _register_chat_benchmarks():
+    for query_type, filters in CHAT_QUERIES:
+        label = query_type + (f"[{','.join(filters)}]" if filters else "")
+
+        def factory(ctx, query_type=query_type, filters=filters):
+            request = main.ChatQueryRequest(query_type=query_type, filters=filters, limit=20)
+            return lambda: main.chat_database_query(request)
+        benchmark(f"chat_query:{label}", number=10, needs_db=True)(factory)
+
+
+_register_chat_benchmarks()
+
+
+@benchmark("train_models", number=1, needs_db=True)
+def bench_train(ctx):
+    def run():
+        conn = get_db_connection()
+        try:
+            train_models(conn, tempfile.mkdtemp(prefix="bench_train_"))
+        finally:
+            conn.close()
+    return run
+
+
+def measure(fn, number: int, repeat: int, warmup: bool = True) -> dict:
+    if warmup:
+        fn()  # import lazy, page cache
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) * 1000 / number)
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(min(timings), 4),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Tên các benchmark chậm hơn baseline quá threshold"""
+    regressions = []
+    print(f"\n{'benchmark':42} {'median':>11} {'baseline':>11} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:42} {result['median_ms']:9.3f}ms {'-':>11} {'new':>8}")
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        flag = "🔴" if change > threshold else ("🟢" if change < -threshold else "  ")
+        if change > threshold:
+            regressions.append(name)
+        print(f"{name:42} {result['median_ms']:9.3f}ms {base['median_ms']:9.3f}ms {change:+7.1%} {flag}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="chỉ chạy benchmark có tên chứa chuỗi này")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.25, help="ngưỡng chậm hơn baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="ghi kết quả lần chạy này thành baseline")
+    parser.add_argument("--skip-db", action="store_true", help="bỏ qua benchmark cần database")
+    parser.add_argument("--no-compare", action="store_true", help="chỉ đo, không so với baseline")
+    args = parser.parse_args()
+
+    has_db = False
+    if not args.skip_db:
+        conn = get_db_connection()
+        if conn:
+            has_db = True
+            conn.close()
+        else:
+            print("⚠️  Database not available, skipping database benchmarks")
+
+    ctx = {}
+    results = {}
+    for name, factory, number, needs_db in BENCHMARKS:
+        if args.filter and args.filter not in name:
+            continue
+        if needs_db and not has_db:
+            continue
+        # Train đọc toàn bộ dữ liệu: chỉ chạy một lần, không warm-up
+        heavy = name == "train_models"
+        results[name] = measure(factory(ctx), number, 1 if heavy else args.repeat, warmup=not heavy)
+        print(f"⏱️  {name:42} {results[name]['median_ms']:9.3f} ms")
+
+    if args.save_baseline:
+        baseline = {}
+        if args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        baseline.update(results)
+        baseline["_meta"] = {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        }
+        args.baseline.write_text(json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
+                                 encoding="utf-8")
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if args.no_compare:
+        return 0
+    if not args.baseline.exists():
+        print(f"❌ No baseline at {args.baseline}, run with --save-baseline on the reference machine first")
+        return 1
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,143 @@
+"""
+Centers index - tìm trung tâm cứu trợ gần nhất bằng BallTree (haversine)
+trên toàn bộ trung_tam_cuu_tros, build lại khi bảng thay đổi (LISTEN/NOTIFY)
+"""
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db import dict_cursor
+from geo import EARTH_RADIUS_KM
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+# Channel do trigger trung_tam_cuu_tros_notify phát (xem migration add_centers_change_notify)
+CENTERS_CHANNEL = "trung_tam_cuu_tros_thay_doi"
+
+CENTERS_QUERY = """
+    SELECT id, ten_trung_tam, dia_chi, so_lien_he, vi_do, kinh_do
+    FROM trung_tam_cuu_tros
+    WHERE vi_do IS NOT NULL AND kinh_do IS NOT NULL
+"""
+
+# Fallback khi index chưa sẵn sàng: tính haversine trong database, vẫn chính xác trên mọi dòng
+NEAREST_CENTERS_SQL = """
+    SELECT id, ten_trung_tam, dia_chi, so_lien_he, vi_do, kinh_do,
+           2 * 6371.0 * ASIN(LEAST(1.0, SQRT(
+               POWER(SIN(RADIANS(vi_do::float8 - %(lat)s) / 2), 2)
+               + COS(RADIANS(%(lat)s)) * COS(RADIANS(vi_do::float8))
+               * POWER(SIN(RADIANS(kinh_do::float8 - %(lon)s) / 2), 2)
+           ))) AS distance_km
+    FROM trung_tam_cuu_tros
+    WHERE vi_do IS NOT NULL AND kinh_do IS NOT NULL
+"""
+
+
+def _matches_location(item: Dict, location: str) -> bool:
+    loc_lower = location.lower()
+    return (
+        loc_lower in (item.get("dia_chi") or "").lower()
+        or loc_lower in (item.get("ten_trung_tam") or "").lower()
+    )
+
+
+def _to_item(row: Dict) -> Dict:
+    item = dict(row)
+    item["vi_do"] = float(item["vi_do"])
+    item["kinh_do"] = float(item["kinh_do"])
+    return item
+
+
+class CentersIndex:
+    """
+    BallTree (metric haversine) trên tọa độ tất cả trung tâm.
+
+    Cây và danh sách trung tâm được thay cùng lúc khi build lại, nên
+    nearest() luôn đọc một snapshot nhất quán mà không cần giữ lock.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[Tuple["BallTree", List[Dict]]] = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready and self._snapshot is not None
+
+    def load(self, conn):
+        cursor = dict_cursor(conn)
+        cursor.execute(CENTERS_QUERY)
+        items = [_to_item(row) for row in cursor.fetchall()]
+        cursor.close()
+
+        tree = None
+        if items:
+            # Import muộn: sklearn nặng, load() chạy ở thread listener sau khi service đã lên
+            from sklearn.neighbors import BallTree
+
+            coords = np.radians([[it["vi_do"], it["kinh_do"]] for it in items])
+            tree = BallTree(coords, metric="haversine")
+
+        with self._lock:
+            self._snapshot = (tree, items)
+            self._ready = True
+        logger.info("Centers index built with %d centers", len(items))
+
+    def handle_notifications(self, conn, payloads: List[str]):
+        # Số trung tâm nhỏ, build lại cả cây rẻ hơn cập nhật từng điểm
+        self.load(conn)
+
+    def invalidate(self):
+        with self._lock:
+            self._ready = False
+
+    def nearest(self, lat: float, lon: float, k: int, location: Optional[str] = None) -> List[Dict]:
+        """Top-k trung tâm gần nhất (chính xác), kèm distance_km"""
+        if self._snapshot is None:
+            return []
+        tree, items = self._snapshot
+        if tree is None or not items:
+            return []
+
+        query = np.radians([[lat, lon]])
+        n = len(items)
+        k_query = min(k, n)
+        while True:
+            dist, ind = tree.query(query, k=k_query)
+            results = []
+            for d, i in zip(dist[0], ind[0]):
+                item = items[i]
+                if location and not _matches_location(item, location):
+                    continue
+                results.append({**item, "distance_km": round(float(d) * EARTH_RADIUS_KM, 3)})
+                if len(results) == k:
+                    return results
+            if k_query >= n:
+                return results
+            # Lọc theo địa điểm loại bớt kết quả: mở rộng số láng giềng cần lấy
+            k_query = min(n, k_query * 4)
+
+
+def nearest_centers_from_db(cursor, lat: float, lon: float, k: int, location: Optional[str] = None) -> List[Dict]:
+    """Top-k trung tâm gần nhất tính trong database (dùng khi index chưa sẵn sàng)"""
+    query = NEAREST_CENTERS_SQL
+    params = {"lat": lat, "lon": lon, "k": k}
+    if location:
+        query += " AND (LOWER(dia_chi) LIKE %(location)s OR LOWER(ten_trung_tam) LIKE %(location)s)"
+        params["location"] = f"%{location.lower()}%"
+    query += " ORDER BY distance_km LIMIT %(k)s"
+
+    cursor.execute(query, params)
+    results = []
+    for row in cursor.fetchall():
+        item = _to_item(row)
+        item["distance_km"] = round(float(item["distance_km"]), 3)
+        results.append(item)
+    return results
@@ -0,0 +1,121 @@
+"""
+Circuit breaker cho các phụ thuộc bên ngoài (Postgres, OpenWeatherMap)
+
+closed: gọi bình thường, đếm lỗi liên tiếp; đủ `failure_threshold` lỗi -> open
+open: từ chối ngay (không chờ timeout kết nối) trong `reset_timeout` giây
+half_open: hết thời gian open, cho một request thử; thành công -> closed, lỗi -> open lại
+
+Khi breaker từ chối, nơi gọi dùng giá trị tốt gần nhất (LastKnownGood) nếu có.
+Trạng thái nằm trong từng process và được trả về ở /health.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from metrics import CIRCUIT_BREAKER_REJECTED, CIRCUIT_BREAKER_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state,
+                           extra={"breaker": self.name, "last_error": self.last_error})
+            CIRCUIT_BREAKER_TRANSITIONS.labels(self.name, state).inc()
+            self.state = state
+
+    def allow(self) -> bool:
+        """True nếu được phép gọi; mỗi lần được phép phải kết thúc bằng success() hoặc failure()"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+                self.probe_started = now
+                return True
+            # Chỉ một request thử mỗi lần; request thử bị treo quá lâu thì cho request khác thử
+            if self.state == HALF_OPEN and now - self.probe_started >= self.reset_timeout:
+                self.probe_started = now
+                return True
+        CIRCUIT_BREAKER_REJECTED.labels(self.name).inc()
+        return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._transition(CLOSED)
+
+    def failure(self, error: Any = None):
+        with self._lock:
+            self.failures += 1
+            if error is not None:
+                self.last_error = str(error)[:200]
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {"state": self.state, "failures": self.failures, "last_error": self.last_error}
+            if self.state == OPEN:
+                stats["retry_in_seconds"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return stats
+
+
+class LastKnownGood:
+    """Giá trị thành công gần nhất theo key (giới hạn số key), kèm thời điểm lưu"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._items[key] = (value, datetime.now().isoformat())
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, str]]:
+        """(giá trị, thời điểm lưu ISO) hoặc None"""
+        with self._lock:
+            return self._items.get(key)
+
+
+db_breaker = CircuitBreaker(
+    "postgres",
+    failure_threshold=int(os.getenv("DB_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("DB_BREAKER_RESET_SECONDS", "15")),
+)
+weather_breaker = CircuitBreaker(
+    "openweathermap",
+    failure_threshold=int(os.getenv("WEATHER_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("WEATHER_BREAKER_RESET_SECONDS", "60")),
+)
+
+
+def breaker_stats() -> Dict[str, Dict]:
+    return {breaker.name: breaker.stats() for breaker in (db_breaker, weather_breaker)}
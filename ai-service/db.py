@@ -0,0 +1,183 @@
+"""
+Database helpers - kết nối PostgreSQL (psycopg2 hoặc psycopg 3) và LISTEN/NOTIFY
+"""
+
+import os
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from circuit_breaker import db_breaker
+from query_profiler import profile_cursor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    PSYCOPG_VERSION = 2
+except ImportError:
+    try:
+        import psycopg
+        from psycopg.rows import dict_row
+        PSYCOPG_VERSION = 3
+    except ImportError:
+        raise ImportError("Please install psycopg2-binary or psycopg[binary]")
+
+# Giây chờ tối đa khi mở kết nối (database chết thì request không treo lâu)
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+
+def get_db_connection(autocommit: bool = False):
+    """
+    Tạo kết nối database; None nếu lỗi hoặc circuit breaker đang open
+    (sau vài lần lỗi liên tiếp trả None ngay, không chờ connect timeout)
+    """
+    if not db_breaker.allow():
+        logger.debug("Database circuit open, skipping connect")
+        return None
+    database_url = os.getenv("DATABASE_URL")
+    try:
+        if PSYCOPG_VERSION == 3:
+            conn = psycopg.connect(database_url, autocommit=autocommit, connect_timeout=DB_CONNECT_TIMEOUT)
+        else:
+            conn = psycopg2.connect(database_url, connect_timeout=DB_CONNECT_TIMEOUT)
+            if autocommit:
+                conn.autocommit = True
+    except Exception as e:
+        db_breaker.failure(e)
+        logger.error("Database connection error: %s", e)
+        return None
+    db_breaker.success()
+    return conn
+
+
+def dict_cursor(conn):
+    """Cursor trả về dict cho mỗi dòng (RealDictCursor / dict_row), đo bởi query_profiler khi bật"""
+    if PSYCOPG_VERSION == 3:
+        return profile_cursor(conn.cursor(row_factory=dict_row))
+    return profile_cursor(conn.cursor(cursor_factory=RealDictCursor))
+
+
+def named_dict_cursor(conn, name: str, itersize: int = 2000):
+    """
+    Server-side cursor trả về dict: dữ liệu được kéo về theo từng lô
+    (fetchmany / itersize) thay vì tải toàn bộ kết quả vào bộ nhớ.
+    Cần kết nối không autocommit (cursor sống trong transaction).
+    """
+    if PSYCOPG_VERSION == 3:
+        cursor = conn.cursor(name=name, row_factory=dict_row)
+    else:
+        cursor = conn.cursor(name=name, cursor_factory=RealDictCursor)
+    cursor.itersize = itersize
+    return cursor
+
+
+def parse_payloads(payloads: List[str]) -> List[Dict]:
+    """Parse payload JSON của pg_notify, bỏ qua payload lỗi"""
+    parsed = []
+    for payload in payloads:
+        try:
+            parsed.append(json.loads(payload))
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+class NotificationListener:
+    """
+    Lắng nghe LISTEN/NOTIFY trên một kết nối riêng trong background thread.
+
+    Mỗi channel đăng ký một handler(conn, payloads) nhận cả lô notification
+    đến cùng lúc, và tùy chọn on_connect(conn) được gọi sau mỗi lần (re)connect
+    để đồng bộ lại trạng thái (notification bị mất khi mất kết nối).
+    on_disconnect() được gọi khi kết nối rớt.
+    """
+
+    def __init__(self, poll_timeout: float = 1.0, reconnect_delay: float = 5.0):
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, Callable] = {}
+        self._on_connect: List[Callable] = []
+        self._on_disconnect: List[Callable] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: Callable,
+        on_connect: Optional[Callable] = None,
+        on_disconnect: Optional[Callable] = None,
+    ):
+        self._handlers[channel] = handler
+        if on_connect:
+            self._on_connect.append(on_connect)
+        if on_disconnect:
+            self._on_disconnect.append(on_disconnect)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_timeout + 1)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = get_db_connection(autocommit=True)
+            if not conn:
+                self._stop.wait(self.reconnect_delay)
+                continue
+            try:
+                cursor = conn.cursor()
+                for channel in self._handlers:
+                    cursor.execute(f'LISTEN "{channel}"')
+                cursor.close()
+
+                for on_connect in self._on_connect:
+                    on_connect(conn)
+
+                logger.info("Listening for database notifications: %s", ", ".join(self._handlers))
+                while not self._stop.is_set():
+                    batch = self._wait_for_notifications(conn)
+                    for channel, payloads in batch.items():
+                        handler = self._handlers.get(channel)
+                        if handler:
+                            handler(conn, payloads)
+            except Exception as e:
+                logger.warning("Database listener error: %s", e)
+            finally:
+                for on_disconnect in self._on_disconnect:
+                    on_disconnect()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._stop.wait(self.reconnect_delay)
+
+    def _wait_for_notifications(self, conn) -> Dict[str, List[str]]:
+        batch = defaultdict(list)
+        if PSYCOPG_VERSION == 3:
+            for notify in conn.notifies(timeout=self.poll_timeout):
+                batch[notify.channel].append(notify.payload)
+        else:
+            if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                return batch
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                batch[notify.channel].append(notify.payload)
+        return batch
@@ -0,0 +1,179 @@
+"""
+Feature engineering cho ML model dự báo nhu cầu
+
+Mã hóa xác định (không phụ thuộc hash() / PYTHONHASHSEED): one-hot tỉnh thành và
+loại thiên tai theo danh mục cố định, one-hot loại nguồn lực theo vocabulary học từ
+dữ liệu train, log1p(số người) và tháng dạng sin/cos. Encoder được lưu cùng model
+(to_dict/from_dict) nên lúc dự báo dùng đúng các cột như lúc train.
+"""
+
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from weather_service import VIETNAM_PROVINCES_COORDS, extract_province
+
+UNKNOWN = "__unknown__"
+
+PROVINCES = sorted(VIETNAM_PROVINCES_COORDS)
+
+# Cùng danh mục với disaster_multipliers trong heuristic_prediction
+DISASTER_TYPES = ["Lũ lụt", "Bão", "Hạn hán", "Sạt lở đất", "Động đất", "Cháy rừng"]
+
+# Từ khóa (chữ thường, giữ dấu: "bão" khác "bảo") -> loại thiên tai,
+# dùng để suy ra loại thiên tai từ mô tả yêu cầu
+DISASTER_KEYWORDS = [
+    ("sạt lở", "Sạt lở đất"),
+    ("động đất", "Động đất"),
+    ("cháy rừng", "Cháy rừng"),
+    ("hạn hán", "Hạn hán"),
+    ("lũ", "Lũ lụt"),
+    ("ngập", "Lũ lụt"),
+    ("bão", "Bão"),
+]
+
+ENCODER_VERSION = 1
+
+
+def detect_disaster_type(*texts: Optional[str]) -> Optional[str]:
+    """Suy ra loại thiên tai từ mô tả / loại yêu cầu (None nếu không nhận ra)"""
+    normalized = unicodedata.normalize("NFC", " ".join(t for t in texts if t)).lower()
+    for keyword, disaster_type in DISASTER_KEYWORDS:
+        if keyword in normalized:
+            return disaster_type
+    return None
+
+
+def _normalize_disaster_type(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    if value in DISASTER_TYPES:
+        return value
+    return detect_disaster_type(value)
+
+
+def _normalize_province(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    if value in VIETNAM_PROVINCES_COORDS:
+        return value
+    return extract_province(value)
+
+
+class FeatureEncoder:
+    """
+    Biến mỗi dòng {tinh_thanh, loai_thien_tai, loai_nguon_luc, so_nguoi, ngay}
+    thành vector số. Giá trị ngoài danh mục rơi vào cột "unknown" của nhóm đó.
+    """
+
+    def __init__(self, resource_types: Optional[List[str]] = None,
+                 resource_weights: Optional[List[float]] = None):
+        self.resource_types = list(resource_types or [])
+        # Tần suất từng loại nguồn lực trong dữ liệu train (dùng khi dự báo không chỉ định loại)
+        self.resource_weights = list(resource_weights or [])
+        self._build_index()
+
+    def _build_index(self):
+        self._province_index = {p: i for i, p in enumerate(PROVINCES)}
+        self._disaster_index = {d: i for i, d in enumerate(DISASTER_TYPES)}
+        self._resource_index = {r: i for i, r in enumerate(self.resource_types)}
+
+    def fit(self, rows: List[Dict], min_count: int = 1) -> "FeatureEncoder":
+        counts: Dict[str, int] = {}
+        for row in rows:
+            resource_type = (row.get("loai_nguon_luc") or "").strip()
+            if resource_type:
+                counts[resource_type] = counts.get(resource_type, 0) + 1
+        return self.fit_counts(counts, min_count)
+
+    def fit_counts(self, counts: Dict[str, int], min_count: int = 1) -> "FeatureEncoder":
+        """Học vocabulary từ số lần xuất hiện của từng loại nguồn lực (vd. từ GROUP BY)"""
+        merged: Dict[str, int] = {}
+        for resource_type, count in counts.items():
+            resource_type = (resource_type or "").strip()
+            if resource_type:
+                merged[resource_type] = merged.get(resource_type, 0) + int(count)
+        counts = merged
+        self.resource_types = sorted(r for r, c in counts.items() if c >= min_count)
+        total = sum(counts[r] for r in self.resource_types) or 1
+        self.resource_weights = [counts[r] / total for r in self.resource_types]
+        self._build_index()
+        return self
+
+    @property
+    def feature_names(self) -> List[str]:
+        return (
+            ["log_so_nguoi", "month_sin", "month_cos"]
+            + [f"tinh_thanh={p}" for p in PROVINCES] + [f"tinh_thanh={UNKNOWN}"]
+            + [f"loai_thien_tai={d}" for d in DISASTER_TYPES] + [f"loai_thien_tai={UNKNOWN}"]
+            + [f"loai_nguon_luc={r}" for r in self.resource_types] + [f"loai_nguon_luc={UNKNOWN}"]
+        )
+
+    @property
+    def n_features(self) -> int:
+        return 3 + (len(PROVINCES) + 1) + (len(DISASTER_TYPES) + 1) + (len(self.resource_types) + 1)
+
+    def transform(self, rows: List[Dict]) -> np.ndarray:
+        n = len(rows)
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        if n == 0:
+            return X
+
+        so_nguoi = np.array([max(float(r.get("so_nguoi") or 0), 0.0) for r in rows])
+        months = np.array([(r.get("ngay") or datetime.now()).month for r in rows], dtype=np.float64)
+        X[:, 0] = np.log1p(so_nguoi)
+        X[:, 1] = np.sin(2 * np.pi * (months - 1) / 12)
+        X[:, 2] = np.cos(2 * np.pi * (months - 1) / 12)
+
+        province_offset = 3
+        disaster_offset = province_offset + len(PROVINCES) + 1
+        resource_offset = disaster_offset + len(DISASTER_TYPES) + 1
+
+        rows_index = np.arange(n)
+        province_cols = [
+            self._province_index.get(_normalize_province(r.get("tinh_thanh")), len(PROVINCES))
+            for r in rows
+        ]
+        disaster_cols = [
+            self._disaster_index.get(_normalize_disaster_type(r.get("loai_thien_tai")), len(DISASTER_TYPES))
+            for r in rows
+        ]
+        resource_cols = [
+            self._resource_index.get((r.get("loai_nguon_luc") or "").strip(), len(self.resource_types))
+            for r in rows
+        ]
+        X[rows_index, province_offset + np.array(province_cols)] = 1.0
+        X[rows_index, disaster_offset + np.array(disaster_cols)] = 1.0
+        X[rows_index, resource_offset + np.array(resource_cols)] = 1.0
+        return X
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": ENCODER_VERSION,
+            "provinces": PROVINCES,
+            "disaster_types": DISASTER_TYPES,
+            "resource_types": self.resource_types,
+            "resource_weights": self.resource_weights,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FeatureEncoder":
+        if data.get("version") != ENCODER_VERSION:
+            raise ValueError(f"Unsupported feature encoder version: {data.get('version')}")
+        if data.get("provinces") != PROVINCES or data.get("disaster_types") != DISASTER_TYPES:
+            # Danh mục cố định đã đổi -> cột không còn khớp, cần train lại
+            raise ValueError("Feature vocabulary changed, retrain the model")
+        return cls(data.get("resource_types"), data.get("resource_weights"))
+
+
+def training_row(record: Dict) -> Dict:
+    """Dòng feature từ một bản ghi phân phối (join yeu_cau_cuu_tros + nguon_lucs)"""
+    return {
+        "tinh_thanh": extract_province(record.get("dia_chi")),
+        "loai_thien_tai": detect_disaster_type(record.get("mo_ta"), record.get("loai_yeu_cau")),
+        "loai_nguon_luc": record.get("loai"),
+        "so_nguoi": record.get("so_nguoi"),
+        "ngay": record.get("thoi_gian_xuat") or record.get("created_at"),
+    }
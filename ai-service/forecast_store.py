@@ -0,0 +1,185 @@
+"""
+Forecast store - ghi dự báo vào du_bao_ais theo kiểu write-behind
+
+/predict chỉ đưa kết quả vào buffer; một background thread ghi cả lô bằng một câu
+INSERT ... SELECT FROM unnest(...) khi buffer đủ lớn hoặc sau mỗi khoảng thời gian.
+Dự báo giống hệt nhau (cùng tỉnh, loại thiên tai, nhu cầu, ngày dự báo) trong
+cửa sổ dedupe chỉ được ghi một lần.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+INSERT_FORECASTS_SQL = """
+    INSERT INTO du_bao_ais (
+        tinh_thanh, loai_thien_tai,
+        du_doan_nhu_cau_thuc_pham, du_doan_nhu_cau_nuoc,
+        du_doan_nhu_cau_thuoc, du_doan_nhu_cau_cho_o,
+        ngay_du_bao
+    )
+    SELECT * FROM unnest(
+        %s::text[], %s::text[],
+        %s::int[], %s::int[], %s::int[], %s::int[],
+        %s::timestamp[]
+    )
+"""
+
+FORECAST_FIELDS = [
+    "tinh_thanh",
+    "loai_thien_tai",
+    "du_doan_nhu_cau_thuc_pham",
+    "du_doan_nhu_cau_nuoc",
+    "du_doan_nhu_cau_thuoc",
+    "du_doan_nhu_cau_cho_o",
+    "ngay_du_bao",
+]
+
+DEFAULT_FLUSH_SIZE = int(os.getenv("FORECAST_FLUSH_SIZE", "200"))
+DEFAULT_FLUSH_SECONDS = float(os.getenv("FORECAST_FLUSH_SECONDS", "5"))
+DEFAULT_DEDUPE_SECONDS = float(os.getenv("FORECAST_DEDUPE_SECONDS", "3600"))
+# Giới hạn buffer khi database không ghi được (bỏ dự báo cũ nhất)
+DEFAULT_MAX_BUFFER = int(os.getenv("FORECAST_MAX_BUFFER", "10000"))
+
+
+def forecast_row(prediction: Dict) -> Dict:
+    """Dòng du_bao_ais từ một PredictionResponse (dạng dict)"""
+    ngay_du_bao = prediction["ngay_du_bao"]
+    if isinstance(ngay_du_bao, str):
+        ngay_du_bao = datetime.fromisoformat(ngay_du_bao)
+    row = {field: prediction[field] for field in FORECAST_FIELDS}
+    row["ngay_du_bao"] = ngay_du_bao
+    return row
+
+
+def _dedupe_key(row: Dict) -> Tuple:
+    # ngay_du_bao = now + 7 ngày, chỉ so theo ngày để các lần gọi liên tiếp trùng key
+    return tuple(row[f] for f in FORECAST_FIELDS[:-1]) + (row["ngay_du_bao"].date(),)
+
+
+class ForecastWriter:
+    def __init__(
+        self,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        dedupe_seconds: float = DEFAULT_DEDUPE_SECONDS,
+        max_buffer: int = DEFAULT_MAX_BUFFER,
+    ):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.max_buffer = max_buffer
+        self._buffer: List[Dict] = []
+        self._recent: Dict[Tuple, float] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_error: Optional[str] = None
+
+    def add(self, prediction: Dict) -> bool:
+        """Đưa một dự báo vào buffer; False nếu trùng dự báo đã ghi trong cửa sổ dedupe"""
+        row = forecast_row(prediction)
+        key = _dedupe_key(row)
+        now = time.monotonic()
+        with self._cond:
+            expires = self._recent.get(key)
+            if expires is not None and expires > now:
+                self.deduplicated += 1
+                return False
+            self._recent[key] = now + self.dedupe_seconds
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify()
+        return True
+
+    def add_many(self, predictions: List[Dict]) -> int:
+        return sum(self.add(p) for p in predictions)
+
+    def flush(self) -> int:
+        """Ghi toàn bộ buffer trong một câu INSERT; lỗi thì trả lại buffer để lần sau ghi tiếp"""
+        with self._flush_lock:
+            with self._cond:
+                rows, self._buffer = self._buffer, []
+                self._expire_recent()
+            if not rows:
+                return 0
+
+            conn = get_db_connection()
+            try:
+                if not conn:
+                    raise RuntimeError("Cannot connect to database")
+                cursor = conn.cursor()
+                cursor.execute(INSERT_FORECASTS_SQL, tuple([r[f] for r in rows] for f in FORECAST_FIELDS))
+                cursor.close()
+                conn.commit()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Forecast flush failed (%d rows kept in buffer): %s", len(rows), e)
+                with self._cond:
+                    self._buffer = rows + self._buffer
+                    overflow = len(self._buffer) - self.max_buffer
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        self.dropped += overflow
+                return 0
+            finally:
+                if conn:
+                    conn.close()
+
+            self.written += len(rows)
+            self.flushes += 1
+            self.last_error = None
+            return len(rows)
+
+    def _expire_recent(self):
+        now = time.monotonic()
+        for key in [k for k, expires in self._recent.items() if expires <= now]:
+            del self._recent[key]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="forecast-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dừng thread và ghi nốt phần còn trong buffer"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=self.flush_seconds + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if len(self._buffer) < self.flush_size:
+                    self._cond.wait(self.flush_seconds)
+            if self._stop.is_set():
+                break
+            self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,137 @@
+"""
+Geo utilities - khoảng cách haversine vector hóa bằng NumPy
+(N yêu cầu × M trung tâm trong một lần gọi, chia chunk để giới hạn bộ nhớ)
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Số dòng mỗi chunk: 2048 × M float64 ≈ 16KB × M (M = 500 -> ~8MB mỗi mảng tạm)
+DEFAULT_CHUNK_SIZE = 2048
+
+
+def to_radians(points) -> np.ndarray:
+    """Chuyển danh sách (vi_do, kinh_do) sang mảng radians shape (N, 2)"""
+    arr = np.asarray(points, dtype=np.float64)
+    if arr.size == 0:
+        return arr.reshape(0, 2)
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        raise ValueError(f"Expected points with shape (N, 2), got {arr.shape}")
+    return np.radians(arr)
+
+
+def coords_array(rows) -> np.ndarray:
+    """
+    Mảng (vi_do, kinh_do) shape (N, 2) từ các dòng database (dict có vi_do/kinh_do).
+    Dòng thiếu tọa độ -> NaN, khoảng cách tính ra cũng là NaN.
+    """
+    return np.array(
+        [
+            (float(r["vi_do"]), float(r["kinh_do"]))
+            if r.get("vi_do") is not None and r.get("kinh_do") is not None
+            else (np.nan, np.nan)
+            for r in rows
+        ],
+        dtype=np.float64,
+    ).reshape(len(rows), 2)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Haversine từng phần tử (broadcast theo quy tắc NumPy), input tính bằng độ"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _block(lat_a, lon_a, cos_a, lat_b, lon_b, cos_b) -> np.ndarray:
+    # lat_a/lon_a/cos_a: (n, 1), lat_b/lon_b/cos_b: (m,) -> (n, m)
+    a = np.sin((lat_b - lat_a) * 0.5)
+    np.square(a, out=a)
+    dlon = np.sin((lon_b - lon_a) * 0.5)
+    np.square(dlon, out=dlon)
+    dlon *= cos_a
+    dlon *= cos_b
+    a += dlon
+    np.minimum(a, 1.0, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_KM
+    return a
+
+
+def iter_distance_chunks(
+    points_a, points_b, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Duyệt ma trận khoảng cách (km) theo từng khối dòng.
+
+    Yield (start, block) với block shape (<= chunk_size, M) ứng với
+    points_a[start:start + len(block)]. Dùng khi không cần giữ cả ma trận N × M.
+    """
+    rad_a = to_radians(points_a)
+    rad_b = to_radians(points_b)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    lat_b = rad_b[:, 0]
+    lon_b = rad_b[:, 1]
+    cos_b = np.cos(lat_b)
+
+    for start in range(0, len(rad_a), chunk_size):
+        chunk = rad_a[start:start + chunk_size]
+        lat_a = chunk[:, 0:1]
+        lon_a = chunk[:, 1:2]
+        yield start, _block(lat_a, lon_a, np.cos(lat_a), lat_b, lon_b, cos_b)
+
+
+def distance_matrix(
+    points_a, points_b, chunk_size: int = DEFAULT_CHUNK_SIZE, dtype=np.float64
+) -> np.ndarray:
+    """Ma trận khoảng cách haversine (km) shape (N, M) giữa hai tập (vi_do, kinh_do)"""
+    n = len(points_a)
+    m = len(points_b)
+    out = np.empty((n, m), dtype=dtype)
+    for start, block in iter_distance_chunks(points_a, points_b, chunk_size):
+        out[start:start + len(block)] = block
+    return out
+
+
+def nearest(
+    points_a, points_b, k: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k điểm gần nhất trong points_b cho mỗi điểm của points_a.
+
+    Trả về (distances_km, indices) shape (N, k), sắp xếp tăng dần theo khoảng cách.
+    Không giữ cả ma trận N × M trong bộ nhớ.
+    """
+    n = len(points_a)
+    m = len(points_b)
+    k = min(k, m)
+    distances = np.empty((n, k), dtype=np.float64)
+    indices = np.empty((n, k), dtype=np.int64)
+    if k == 0:
+        return distances, indices
+
+    for start, block in iter_distance_chunks(points_a, points_b, chunk_size):
+        if k < m:
+            idx = np.argpartition(block, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(m), block.shape).copy()
+        dist = np.take_along_axis(block, idx, axis=1)
+        order = np.argsort(dist, axis=1)
+        end = start + len(block)
+        distances[start:end] = np.take_along_axis(dist, order, axis=1)
+        indices[start:end] = np.take_along_axis(idx, order, axis=1)
+    return distances, indices
+
+
+def nearest_distance_km(points_a, points_b, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[np.ndarray]:
+    """Khoảng cách (km) tới điểm gần nhất trong points_b cho mỗi điểm của points_a"""
+    if len(points_b) == 0:
+        return None
+    distances, _ = nearest(points_a, points_b, k=1, chunk_size=chunk_size)
+    return distances[:, 0]
@@ -0,0 +1,95 @@
+"""
+Cấu hình gunicorn cho production nhiều worker: gunicorn -c gunicorn.conf.py main:app
+
+- WEB_CONCURRENCY worker uvicorn chỉ phục vụ HTTP (SCHEDULER_ENABLED=false)
+- Một process shared state (prediction cache + job train, xem shared_state.py) và một
+  process scheduler (scheduler_service.py) do master start trước khi fork worker
+- preload_app: master import main và load model trước khi fork, các worker dùng chung
+  bộ nhớ model (copy-on-write) thay vì mỗi worker một bản
+- Metrics Prometheus gộp qua PROMETHEUS_MULTIPROC_DIR
+- Shared state: unix socket trong thư mục riêng 0700, authkey ngẫu nhiên mỗi lần chạy nếu không đặt
+  SHARED_STATE_AUTHKEY (địa chỉ host:port thì bắt buộc đặt)
+"""
+
+import multiprocessing
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Các biến môi trường này phải có trước khi preload import main (metrics, shared_state đọc lúc import)
+# và trước khi fork manager, worker, scheduler (cùng nhận qua os.environ)
+_socket_dir = None
+if "SHARED_STATE_ADDRESS" not in os.environ:
+    _socket_dir = tempfile.mkdtemp(prefix="relieflink-state-")  # mode 0700
+    os.environ["SHARED_STATE_ADDRESS"] = os.path.join(_socket_dir, "state.sock")
+if not os.environ.get("SHARED_STATE_AUTHKEY"):
+    # Cùng quy tắc với shared_state.parse_address (chưa import được: module đọc key lúc import)
+    _address = os.environ["SHARED_STATE_ADDRESS"]
+    if "/" not in _address and _address.rpartition(":")[2].isdigit():
+        raise RuntimeError("SHARED_STATE_AUTHKEY must be set when SHARED_STATE_ADDRESS is host:port")
+    os.environ["SHARED_STATE_AUTHKEY"] = secrets.token_hex(32)
+os.environ["SCHEDULER_ENABLED"] = "false"
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "relieflink-metrics")
+    # Số liệu của lần chạy trước không còn đúng
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+_shared_state = None
+_scheduler = None
+
+
+def when_ready(server):
+    global _shared_state, _scheduler
+    import main
+    from shared_state import start_server
+
+    _shared_state = start_server(os.environ["SHARED_STATE_ADDRESS"], os.environ["SHARED_STATE_AUTHKEY"])
+    _scheduler = subprocess.Popen(
+        [sys.executable, "scheduler_service.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "SCHEDULER_ENABLED": "true"},
+    )
+    server.log.info("Scheduler process started (pid %s)", _scheduler.pid)
+
+    # Load model ở master: worker fork ra dùng chung các trang bộ nhớ của model
+    try:
+        if main.model_registry.load_current() is not None:
+            server.log.info("Model %s loaded before fork", main.model_registry.current_version())
+    except Exception as e:
+        server.log.warning("Cannot preload model: %s", e)
+
+
+def post_fork(server, worker):
+    # Thread ghi log của master không sang process con
+    from log_setup import setup_logging
+    setup_logging()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _scheduler is not None and _scheduler.poll() is None:
+        _scheduler.terminate()
+        try:
+            _scheduler.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            _scheduler.kill()
+    if _shared_state is not None:
+        _shared_state.shutdown()
+    if _socket_dir is not None:
+        shutil.rmtree(_socket_dir, ignore_errors=True)
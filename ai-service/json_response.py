@@ -0,0 +1,38 @@
+"""
+Serialize JSON bằng orjson cho response lớn (list /chat/query, dữ liệu thời tiết)
+
+orjson tự xử lý datetime/date/UUID/numpy; Decimal (cột NUMERIC của Postgres) đổi sang float
+trong `default`, nên các handler trả thẳng dòng từ database mà không cần vòng lặp chuyển kiểu.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "item"):  # numpy scalar orjson chưa biết (vd. np.int32 trong dict key)
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    Response class mặc định của app. Endpoint trả dict thì FastAPI vẫn chạy jsonable_encoder
+    trước; endpoint nóng trả thẳng FastJSONResponse(...) để bỏ qua bước đó
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,178 @@
+"""
+Logging có cấu trúc cho ai-service
+
+- Mức log theo LOG_LEVEL, output JSON mỗi dòng một record (LOG_FORMAT=text để đọc khi dev)
+- Thread gọi log chỉ đẩy record vào hàng đợi (QueueHandler); ghi stdout nằm ở thread
+  riêng (QueueListener). Hàng đợi đầy thì bỏ record chứ không chặn request
+- Lấy mẫu: mỗi mẫu message (logger + chuỗi format) dưới mức ERROR chỉ được ghi
+  LOG_SAMPLE_BURST lần mỗi LOG_SAMPLE_WINDOW giây, số record bị bỏ được báo ở lần ghi kế tiếp
+- request_id: lấy từ contextvar (middleware gán cho mỗi request) và gắn vào mọi record
+
+Dùng: logger = logging.getLogger(__name__); logger.info("... %s", value, extra={"tinh_thanh": ...})
+Các field trong extra được ghi thành key JSON riêng.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+# Thuộc tính có sẵn của LogRecord; phần còn lại là field từ extra=...
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "request_id", None):
+            record.request_id = "-"
+        return super().format(record)
+
+
+class ContextFilter(logging.Filter):
+    """Gắn request_id ở thread gọi log (contextvar không sang được thread listener)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Giới hạn số record mỗi mẫu message trong một cửa sổ; ERROR trở lên luôn được ghi"""
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # (logger, msg) -> [bắt đầu cửa sổ, số record đã ghi, số record đã bỏ]
+        self._windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.sampled_out = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler không bao giờ chờ: hàng đợi đầy thì đếm và bỏ record"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Gộp args vào message và định dạng exception ngay ở thread gọi, giữ nguyên field extra
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_listener_pid = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Cấu hình root logger một lần cho mỗi process (gọi lại không có tác dụng)
+
+    Mặc định đọc LOG_LEVEL (INFO) / LOG_FORMAT (json) lúc gọi, tức là sau load_dotenv().
+    """
+    global _listener, _listener_pid, _queue_handler
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+    with _setup_lock:
+        # Process con tạo bằng fork có sẵn _listener nhưng không có thread listener
+        if _listener is not None and _listener_pid == os.getpid():
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter())
+        _queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        root.handlers = [_queue_handler]
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Ghi nốt các record còn trong hàng đợi"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
@@ -0,0 +1,92 @@
+"""
+Low-stock tracker - giữ danh sách nguồn lực sắp hết trong bộ nhớ,
+cập nhật qua LISTEN/NOTIFY thay vì quét bảng nguon_lucs mỗi lần hỏi
+"""
+
+import logging
+import threading
+from typing import Dict, List
+
+from db import dict_cursor, parse_payloads
+
+logger = logging.getLogger(__name__)
+
+# Channel do trigger nguon_lucs_ton_kho_notify phát (xem migration add_low_stock_tracking)
+LOW_STOCK_CHANNEL = "nguon_lucs_ton_kho"
+
+# Cùng điều kiện với partial index nguon_lucs_ton_kho_thap_idx
+LOW_STOCK_QUERY = """
+    SELECT nl.id, nl.ten_nguon_luc, nl.loai, nl.so_luong, nl.don_vi,
+           nl.trang_thai, nl.so_luong_toi_thieu,
+           tt.ten_trung_tam, tt.dia_chi,
+           nl.ty_le_con_lai as percent_remaining
+    FROM nguon_lucs nl
+    JOIN trung_tam_cuu_tros tt ON nl.id_trung_tam = tt.id
+    WHERE nl.so_luong <= nl.so_luong_toi_thieu * 1.5
+"""
+
+
+def _sort_key(item: Dict):
+    # ORDER BY percent_remaining ASC NULLS FIRST, so_luong ASC
+    percent = item.get("percent_remaining")
+    return (percent is not None, percent or 0, item.get("so_luong") or 0)
+
+
+class LowStockTracker:
+    """
+    Tập nguồn lực sắp hết (so_luong <= so_luong_toi_thieu * 1.5).
+
+    load() nạp snapshot qua partial index khi listener (re)connect,
+    handle_notifications() chỉ đọc lại đúng các dòng vừa thay đổi.
+    Khi listener mất kết nối, tracker không còn ready và caller
+    phải fallback về query database.
+    """
+
+    def __init__(self):
+        self._items: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def load(self, conn):
+        cursor = dict_cursor(conn)
+        cursor.execute(LOW_STOCK_QUERY)
+        items = {row["id"]: dict(row) for row in cursor.fetchall()}
+        cursor.close()
+        with self._lock:
+            self._items = items
+            self._ready = True
+        logger.info("Low-stock tracker loaded %d resources", len(items))
+
+    def invalidate(self):
+        with self._lock:
+            self._ready = False
+
+    def handle_notifications(self, conn, payloads: List[str]):
+        ids = sorted({p["id"] for p in parse_payloads(payloads) if "id" in p})
+        if not ids:
+            return
+
+        cursor = dict_cursor(conn)
+        cursor.execute(LOW_STOCK_QUERY + " AND nl.id = ANY(%s)", (ids,))
+        rows = {row["id"]: dict(row) for row in cursor.fetchall()}
+        cursor.close()
+
+        with self._lock:
+            for resource_id in ids:
+                if resource_id in rows:
+                    self._items[resource_id] = rows[resource_id]
+                else:
+                    # Đã đủ hàng hoặc bị xóa
+                    self._items.pop(resource_id, None)
+
+    def items(self, limit: int) -> List[Dict]:
+        with self._lock:
+            items = sorted(self._items.values(), key=_sort_key)
+        return [dict(item) for item in items[:limit]]
+
+    def __len__(self):
+        return len(self._items)
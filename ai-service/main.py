@@ -3,46 +3,79 @@ ReliefLink AI Service
 Python microservice để dự báo nhu cầu cứu trợ dựa trên historical data
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    PSYCOPG_VERSION = 2
-except ImportError:
-    try:
-        import psycopg
-        from psycopg.rows import dict_row
-        PSYCOPG_VERSION = 3
-    except ImportError:
-        raise ImportError("Please install psycopg2-binary or psycopg[binary]")
 import os
+import logging
+import uuid
 from dotenv import load_dotenv
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestRegressor
-import joblib
 import sys
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+import threading
+import time
 import requests
 
-# Import weather service
-try:
-    from weather_service import check_weather_and_predict, get_province_coords
-except ImportError:
-    print("⚠️  weather_service module not found, weather features disabled")
-    check_weather_and_predict = None
-    get_province_coords = None
+from db import get_db_connection, dict_cursor, NotificationListener
+from circuit_breaker import LastKnownGood, breaker_stats, db_breaker
+from low_stock import LowStockTracker, LOW_STOCK_CHANNEL, LOW_STOCK_QUERY
+from centers_index import CentersIndex, CENTERS_CHANNEL, nearest_centers_from_db
+from matching import run_matching
+from priority_scoring import run_priority_scoring
+from features import FeatureEncoder
+# features.py đã import weather_service nên weather_service là phụ thuộc bắt buộc
+from weather_service import check_weather_and_predict, compact_result, get_province_coords, set_risk_store
+from training import MODEL_TARGETS
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, normalize_text, prediction_key
+from forecast_store import ForecastWriter
+from query_profiler import QUERY_PROFILER_ENABLED, profiler as query_profiler, query_context
+from metrics import (
+    ALERTS_SENT, CHAT_QUERY_DURATION, PREDICT_DURATION, PREDICTIONS,
+    metrics_middleware, render_metrics, track_job,
+)
+from training_jobs import TrainingJobManager
+from shared_state import SHARED_STATE_ADDRESS, connect as connect_shared_state_server
+from log_setup import request_id_var, setup_logging
+from json_response import FastJSONResponse
+from admission import ADMISSION_ENABLED, admission_middleware, controller as admission_controller
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+
 
-app = FastAPI(title="ReliefLink AI Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Việc nặng chạy sau khi import xong (không chặn cold start): scheduler, LISTEN/NOTIFY, pre-warm model"""
+    on_startup()
+    try:
+        yield
+    finally:
+        on_shutdown()
+
+
+app = FastAPI(
+    title="ReliefLink AI Service",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
-# CORS middleware
+# Nén response lớn (list /chat/query, /weather/check-batch); response nhỏ giữ nguyên
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+# Rate limit / giới hạn request nặng (429 + Retry-After), xem admission.py
+app.middleware("http")(admission_middleware)
+
+# CORS middleware: thêm sau admission (middleware thêm sau nằm ngoài) để response 429 cũng có header CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Trong production nên chỉ định cụ thể
@@ -51,19 +84,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database connection
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Latency từng route cho /metrics (gồm cả request bị admission từ chối)
+app.middleware("http")(metrics_middleware)
+
+
+@app.middleware("http")
+async def request_id_middleware(request, call_next):
+    """Gắn request id (X-Request-ID của client hoặc tự sinh) vào mọi log của request"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
-# Model paths
+# Model paths (ModelRegistry tự tạo thư mục)
 MODEL_DIR = "models"
-os.makedirs(MODEL_DIR, exist_ok=True)
 
 # Next.js API URL for sending notifications
 NEXTJS_API_URL = os.getenv("NEXTJS_API_URL", "http://localhost:3000")
 
-# Scheduler for periodic weather checks
-scheduler = BackgroundScheduler()
-scheduler.start()
+# Scheduler for periodic weather checks (tạo và start trong lifespan, xem start_scheduler)
+scheduler = None
+
+# LISTEN/NOTIFY: giữ danh sách nguồn lực sắp hết và index trung tâm trong bộ nhớ
+DB_LISTENER_ENABLED = os.getenv("DB_LISTENER_ENABLED", "true").lower() == "true"
+low_stock_tracker = LowStockTracker()
+centers_index = CentersIndex()
+db_listener = NotificationListener()
+db_listener.subscribe(
+    LOW_STOCK_CHANNEL,
+    low_stock_tracker.handle_notifications,
+    on_connect=low_stock_tracker.load,
+    on_disconnect=low_stock_tracker.invalidate,
+)
+db_listener.subscribe(
+    CENTERS_CHANNEL,
+    centers_index.handle_notifications,
+    on_connect=centers_index.load,
+    on_disconnect=centers_index.invalidate,
+)
 
 
 class PredictionRequest(BaseModel):
@@ -89,33 +151,25 @@ class WeatherAlertRequest(BaseModel):
     message: Optional[str] = None
 
 
-def get_db_connection():
-    """Tạo kết nối database"""
-    try:
-        if PSYCOPG_VERSION == 3:
-            conn = psycopg.connect(DATABASE_URL)
-            return conn
-        else:
-            conn = psycopg2.connect(DATABASE_URL)
-            return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
+# Kết quả tốt gần nhất khi database không khả dụng (circuit breaker open / lỗi kết nối)
+_last_good_history = LastKnownGood()
+_last_good_chat = LastKnownGood()
+# Các query_type của /chat/query là số liệu tổng hợp, trả bản cũ vẫn có ích khi database chết
+CHAT_FALLBACK_QUERY_TYPES = {"statistics", "affected_people", "compare_centers"}
 
 
 def analyze_historical_data(tinh_thanh: str, loai_thien_tai: Optional[str] = None):
     """
     Phân tích dữ liệu lịch sử từ database để tạo dự báo
+    (database không khả dụng: dùng kết quả tốt gần nhất của tỉnh nếu có)
     """
     conn = get_db_connection()
     if not conn:
-        return None
+        cached = _last_good_history.get(tinh_thanh)
+        return cached[0] if cached else None
 
     try:
-        if PSYCOPG_VERSION == 3:
-            cursor = conn.cursor(row_factory=dict_row)
-        else:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = dict_cursor(conn)
         
         # Query historical requests
         query = """
@@ -159,15 +213,18 @@ def analyze_historical_data(tinh_thanh: str, loai_thien_tai: Optional[str] = Non
         cursor.close()
         conn.close()
         
-        return {
+        result = {
             "requests": historical_requests,
             "distributions": historical_distributions
         }
+        _last_good_history.put(tinh_thanh, result)
+        return result
     except Exception as e:
-        print(f"Error analyzing historical data: {e}")
+        logger.exception("Error analyzing historical data")
         if conn:
             conn.close()
-        return None
+        cached = _last_good_history.get(tinh_thanh)
+        return cached[0] if cached else None
 
 
 def send_alert_to_nextjs(tinh_thanh: str, disaster_types: List[str], risk_level: str, details: Dict):
@@ -194,13 +251,16 @@ def send_alert_to_nextjs(tinh_thanh: str, disaster_types: List[str], risk_level:
         
         if response.status_code == 200:
             result = response.json()
-            print(f"✅ Alert sent successfully: {result.get('notifications_sent', 0)} notifications")
+            logger.info("Alert sent for %s: %s notifications", tinh_thanh, result.get('notifications_sent', 0))
+            ALERTS_SENT.labels("sent").inc()
             return True
         else:
-            print(f"⚠️  Failed to send alert: {response.status_code} - {response.text}")
+            logger.warning("Failed to send alert for %s: %s - %s", tinh_thanh, response.status_code, response.text)
+            ALERTS_SENT.labels("failed").inc()
             return False
     except Exception as e:
-        print(f"❌ Error sending alert to Next.js: {e}")
+        logger.error("Error sending alert to Next.js: %s", e)
+        ALERTS_SENT.labels("error").inc()
         return False
 
 
@@ -293,116 +353,202 @@ def heuristic_prediction(
     )
 
 
-def train_ml_model():
+# Model theo version: models/versions/<version>/, version đang dùng ghi trong models/CURRENT
+model_registry = ModelRegistry(MODEL_DIR)
+
+# Cache kết quả /predict theo (tỉnh, loại thiên tai, số người, version model)
+prediction_cache = PredictionCache()
+# Qua biến global: prediction_cache có thể được thay bằng cache dùng chung lúc startup
+model_registry.on_promote(lambda version: prediction_cache.invalidate(version))
+
+# Ghi dự báo vào du_bao_ais theo lô (write-behind)
+FORECAST_PERSIST_ENABLED = os.getenv("FORECAST_PERSIST_ENABLED", "true").lower() == "true"
+forecast_writer = ForecastWriter()
+
+# Train chạy nền trong process pool (POST /train trả về job id)
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", "1"))
+training_jobs = TrainingJobManager(MODEL_DIR, max_workers=TRAINING_WORKERS)
+
+# Nhiều worker (gunicorn.conf.py): prediction cache và job train nằm ở process shared state
+shared_state = None
+# Worker của gunicorn không chạy scheduler (đã có process scheduler_service.py riêng)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+
+
+def use_shared_state():
     """
-    Train ML model từ historical data
-    Chạy định kỳ (cron job) hoặc on-demand
+    Thay cache / job train / rủi ro thời tiết của process bằng proxy tới process shared state
+    (nếu có SHARED_STATE_ADDRESS): rủi ro do process scheduler ghi, /priority/recompute ở worker đọc được
     """
-    historical_data = analyze_historical_data("")  # Get all data
-    
-    if not historical_data or not historical_data["distributions"]:
-        print("Not enough data to train model")
-        return False
-    
-    # Prepare features
-    X = []
-    y_food = []
-    y_water = []
-    y_medicine = []
-    y_shelter = []
-    
-    distributions = historical_data["distributions"]
-    
-    for dist in distributions:
-        # Features: số người, loại thiên tai, thời gian, ...
-        features = [
-            dist["so_nguoi"],
-            hash(dist.get("loai", "")) % 100,  # Simple encoding
-        ]
-        X.append(features)
-        
-        # Labels: actual distributed amounts (sẽ cần thêm fields trong DB)
-        # Tạm thời estimate từ so_nguoi
-        y_food.append(dist["so_nguoi"] * 2 * 7)
-        y_water.append(dist["so_nguoi"] * 5 * 7)
-        y_medicine.append(dist["so_nguoi"] * 0.5 * 7)
-        y_shelter.append(max(1, dist["so_nguoi"] // 4))
-    
-    if len(X) < 10:
-        print("Not enough data for ML model")
-        return False
-    
-    X = np.array(X)
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    # Train models
-    models = {
-        "food": RandomForestRegressor(n_estimators=50, random_state=42),
-        "water": RandomForestRegressor(n_estimators=50, random_state=42),
-        "medicine": RandomForestRegressor(n_estimators=50, random_state=42),
-        "shelter": RandomForestRegressor(n_estimators=50, random_state=42),
-    }
-    
-    models["food"].fit(X_scaled, y_food)
-    models["water"].fit(X_scaled, y_water)
-    models["medicine"].fit(X_scaled, y_medicine)
-    models["shelter"].fit(X_scaled, y_shelter)
-    
-    # Save models
-    joblib.dump(scaler, f"{MODEL_DIR}/scaler.pkl")
-    for name, model in models.items():
-        joblib.dump(model, f"{MODEL_DIR}/model_{name}.pkl")
-    
-    print("Models trained and saved successfully")
-    return True
+    global shared_state, prediction_cache, training_jobs
+    if shared_state is not None:
+        return
+    shared_state = connect_shared_state_server(SHARED_STATE_ADDRESS)
+    if shared_state is not None:
+        prediction_cache = shared_state.prediction_cache()
+        training_jobs = shared_state.training_jobs(MODEL_DIR, TRAINING_WORKERS)
+        set_risk_store(shared_state.risk_store())
 
 
-def ml_prediction(tinh_thanh: str, so_nguoi: Optional[int] = None) -> Optional[PredictionResponse]:
+def ml_prediction_batch(items: List[PredictionRequest]) -> List[Optional[PredictionResponse]]:
     """
-    Dự báo bằng ML model (nếu đã train)
+    Dự báo bằng ML model (nếu đã train) cho cả lô: mỗi model chỉ predict một lần
+    trên ma trận feature của toàn bộ lô. Trả None cho từng phần tử nếu không dùng được model.
     """
-    model_paths = {
-        "food": f"{MODEL_DIR}/model_food.pkl",
-        "water": f"{MODEL_DIR}/model_water.pkl",
-        "medicine": f"{MODEL_DIR}/model_medicine.pkl",
-        "shelter": f"{MODEL_DIR}/model_shelter.pkl",
-    }
-    
-    scaler_path = f"{MODEL_DIR}/scaler.pkl"
-    
-    # Check if models exist
-    if not all(os.path.exists(path) for path in list(model_paths.values()) + [scaler_path]):
-        return None
-    
+    if not items:
+        return []
     try:
-        scaler = joblib.load(scaler_path)
-        models = {name: joblib.load(path) for name, path in model_paths.items()}
+        # Load một lần cho mỗi version, tự đổi khi có version mới được promote
+        bundle = model_registry.load_current()
+        if not bundle:
+            return [None] * len(items)
+        encoder = FeatureEncoder.from_dict(bundle["encoder"])
+        models = bundle["models"]
         
-        # Prepare features
-        features = np.array([[so_nguoi or 100, hash(tinh_thanh) % 100]])
-        features_scaled = scaler.transform(features)
+        # Dự báo tổng nhu cầu: tính cho từng loại nguồn lực đã thấy khi train
+        # rồi lấy trung bình theo tần suất của chúng
+        now = datetime.now()
+        resource_types = encoder.resource_types or [None]
+        weights = np.array(encoder.resource_weights or [1.0])
+        features = encoder.transform([
+            {
+                "tinh_thanh": item.tinh_thanh,
+                "loai_thien_tai": item.loai_thien_tai,
+                "so_nguoi": item.so_nguoi or 100,
+                "ngay": now,
+                "loai_nguon_luc": r,
+            }
+            for item in items
+            for r in resource_types
+        ])
         
-        # Predict
-        food = int(models["food"].predict(features_scaled)[0])
-        water = int(models["water"].predict(features_scaled)[0])
-        medicine = int(models["medicine"].predict(features_scaled)[0])
-        shelter = int(models["shelter"].predict(features_scaled)[0])
+        # (số yêu cầu, số loại nguồn lực) -> trung bình theo trọng số trên từng dòng
+        predicted = {
+            name: np.average(
+                models[name].predict(features).reshape(len(items), len(resource_types)),
+                axis=1,
+                weights=weights,
+            )
+            for name in MODEL_TARGETS
+        }
         
-        return PredictionResponse(
-            tinh_thanh=tinh_thanh,
-            loai_thien_tai="Dự báo",
-            du_doan_nhu_cau_thuc_pham=max(1000, food),
-            du_doan_nhu_cau_nuoc=max(2000, water),
-            du_doan_nhu_cau_thuoc=max(500, medicine),
-            du_doan_nhu_cau_cho_o=max(50, shelter),
-            ngay_du_bao=(datetime.now() + timedelta(days=7)).isoformat(),
-            confidence_score=0.85,
-            method="ml"
-        )
+        ngay_du_bao = (now + timedelta(days=7)).isoformat()
+        return [
+            PredictionResponse(
+                tinh_thanh=item.tinh_thanh,
+                loai_thien_tai=item.loai_thien_tai or "Dự báo",
+                du_doan_nhu_cau_thuc_pham=max(1000, int(predicted["food"][i])),
+                du_doan_nhu_cau_nuoc=max(2000, int(predicted["water"][i])),
+                du_doan_nhu_cau_thuoc=max(500, int(predicted["medicine"][i])),
+                du_doan_nhu_cau_cho_o=max(50, int(predicted["shelter"][i])),
+                ngay_du_bao=ngay_du_bao,
+                confidence_score=0.85,
+                method="ml"
+            )
+            for i, item in enumerate(items)
+        ]
     except Exception as e:
-        print(f"ML prediction error: {e}")
-        return None
+        logger.exception("ML prediction error")
+        return [None] * len(items)
+
+
+def predict_many(
+    items: List[PredictionRequest],
+    persist: bool = True,
+    cache_ttl: Optional[float] = None
+) -> List[Optional[PredictionResponse]]:
+    """
+    Dự báo cả lô: lấy từ cache, phần còn lại chạy ML một lần cho cả lô, fallback heuristic.
+    Phần tử lỗi trả về None.
+    """
+    version = model_registry.current_version()
+    normalized = [
+        PredictionRequest(
+            tinh_thanh=normalize_text(item.tinh_thanh) or item.tinh_thanh,
+            loai_thien_tai=normalize_text(item.loai_thien_tai),
+            so_nguoi=item.so_nguoi,
+        )
+        for item in items
+    ]
+    keys = [prediction_key(r.tinh_thanh, r.loai_thien_tai, r.so_nguoi, version) for r in normalized]
+    results = prediction_cache.get_many(keys)
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if len(missing) < len(results):
+        PREDICTIONS.labels("cache").inc(len(results) - len(missing))
+    fresh = []
+    if missing:
+        # Try ML first, fallback to heuristic
+        with PREDICT_DURATION.labels("ml").time():
+            ml_results = ml_prediction_batch([normalized[i] for i in missing])
+        for i, result in zip(missing, ml_results):
+            request = normalized[i]
+            if result is None:
+                try:
+                    with PREDICT_DURATION.labels("heuristic").time():
+                        result = heuristic_prediction(
+                            request.tinh_thanh,
+                            request.loai_thien_tai,
+                            request.so_nguoi
+                        )
+                except Exception as e:
+                    logger.warning("Error predicting for %s: %s", request.tinh_thanh, e)
+                    continue
+            PREDICTIONS.labels(result.method).inc()
+            fresh.append((keys[i], result))
+            results[i] = result
+    if fresh:
+        prediction_cache.put_many(fresh, ttl=cache_ttl)
+    
+    if persist and FORECAST_PERSIST_ENABLED:
+        forecast_writer.add_many([r.model_dump() for r in results if r is not None])
+    return results
+
+
+# Load model + import sklearn ở thread nền khi khởi động, để request ML đầu tiên không phải chờ
+MODEL_PREWARM = os.getenv("MODEL_PREWARM", "true").lower() == "true"
+model_prewarm = {"status": "disabled" if not MODEL_PREWARM else "pending", "elapsed_ms": None}
+
+
+def prewarm_model():
+    model_prewarm["status"] = "running"
+    started = time.perf_counter()
+    try:
+        if model_registry.current_version() is None:
+            model_prewarm["status"] = "no_model"
+            return
+        # Predict thử một lần: load bundle, unpickle model (import sklearn), chạy predict
+        ml_prediction_batch([PredictionRequest(tinh_thanh="Hà Nội", loai_thien_tai="Lũ lụt")])
+        model_prewarm["status"] = "done"
+    except Exception:
+        model_prewarm["status"] = "failed"
+        logger.exception("Model pre-warm failed")
+    finally:
+        model_prewarm["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Model pre-warm %s in %sms", model_prewarm["status"], model_prewarm["elapsed_ms"])
+
+
+def on_startup():
+    use_shared_state()
+    if SCHEDULER_ENABLED:
+        start_scheduler()
+    if DB_LISTENER_ENABLED:
+        db_listener.start()
+    if FORECAST_PERSIST_ENABLED:
+        forecast_writer.start()
+    if MODEL_PREWARM:
+        threading.Thread(target=prewarm_model, name="model-prewarm", daemon=True).start()
+
+
+def on_shutdown():
+    stop_scheduler()
+    db_listener.stop()
+    # Job train dùng chung thuộc về process shared state, không tắt theo worker
+    if shared_state is None:
+        training_jobs.shutdown()
+    # Ghi nốt các dự báo còn trong buffer
+    if FORECAST_PERSIST_ENABLED:
+        forecast_writer.stop()
 
 
 @app.get("/")
@@ -415,79 +561,135 @@ def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus metrics
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/health")
 def health_check():
     conn = get_db_connection()
-    db_status = "connected" if conn else "disconnected"
     if conn:
+        db_status = "connected"
         conn.close()
+    else:
+        # circuit_open: không thử kết nối, đang trả số liệu cũ (xem circuit_breakers)
+        db_status = "circuit_open" if db_breaker.state == "open" else "disconnected"
     
     return {
         "status": "healthy",
         "database": db_status,
+        "low_stock_tracker": {
+            "ready": low_stock_tracker.ready,
+            "tracked_resources": len(low_stock_tracker)
+        },
+        "centers_index": {
+            "ready": centers_index.ready
+        },
         "models_available": {
             "heuristic": True,
-            "ml": all(os.path.exists(f"{MODEL_DIR}/model_{name}.pkl") 
-                     for name in ["food", "water", "medicine", "shelter"])
-        }
+            "ml": model_registry.current_version() is not None
+        },
+        "model_version": model_registry.current_version(),
+        "model_prewarm": model_prewarm,
+        "prediction_cache": prediction_cache.stats(),
+        "shared_state": SHARED_STATE_ADDRESS if shared_state is not None else None,
+        "forecast_writer": forecast_writer.stats(),
+        "admission": admission_controller.stats() if ADMISSION_ENABLED else None,
+        "circuit_breakers": breaker_stats()
     }
 
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(request: PredictionRequest):
+def predict(request: PredictionRequest, persist: bool = True):
     """
-    Tạo dự báo nhu cầu cứu trợ
+    Tạo dự báo nhu cầu cứu trợ (persist=false: không lưu vào du_bao_ais)
     """
-    try:
-        # Try ML first, fallback to heuristic
-        ml_result = ml_prediction(request.tinh_thanh, request.so_nguoi)
-        
-        if ml_result:
-            return ml_result
-        
-        # Use heuristic
-        return heuristic_prediction(
-            request.tinh_thanh,
-            request.loai_thien_tai,
-            request.so_nguoi
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = predict_many([request], persist=persist)[0]
+    if result is None:
+        raise HTTPException(status_code=500, detail=f"Prediction failed for {request.tinh_thanh}")
+    return result
 
 
 @app.post("/predict/batch", response_model=List[PredictionResponse])
-def predict_batch(requests: List[PredictionRequest]):
+def predict_batch(requests: List[PredictionRequest], persist: bool = True):
     """
-    Tạo nhiều dự báo cùng lúc
+    Tạo nhiều dự báo cùng lúc (ML chạy một lần cho cả lô)
     """
-    results = []
-    for req in requests:
-        try:
-            pred = predict(req)
-            results.append(pred)
-        except Exception as e:
-            print(f"Error predicting for {req.tinh_thanh}: {e}")
-    return results
+    return [result for result in predict_many(requests, persist=persist) if result is not None]
 
 
-@app.post("/train")
-def train_model():
+@app.post("/train", status_code=202)
+def train_model(incremental: bool = False, promote: bool = True):
     """
-    Train ML model từ historical data
+    Train ML model từ historical data (chạy nền, trả về job id).
+    promote=false: chỉ publish version mới, promote sau qua /models/{version}/promote
     """
     try:
-        success = train_ml_model()
-        if success:
-            return {"message": "Models trained successfully", "status": "success"}
-        else:
-            return {
-                "message": "Not enough data to train models",
-                "status": "insufficient_data"
-            }
+        return training_jobs.submit(incremental=incremental, promote=promote)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/train/{job_id}")
+def get_training_job(job_id: str):
+    """
+    Trạng thái / tiến độ của job train
+    """
+    job = training_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@app.delete("/train/{job_id}")
+def cancel_training_job(job_id: str):
+    """
+    Hủy job train (đang chờ hoặc đang chạy)
+    """
+    job = training_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@app.get("/models")
+def list_models():
+    """
+    Các version model đã train (manifest) và version đang dùng
+    """
+    return {
+        "current": model_registry.current_version(),
+        "versions": [model_registry.manifest(v) for v in reversed(model_registry.list_versions())],
+    }
+
+
+@app.post("/models/{version}/promote")
+def promote_model(version: str):
+    """
+    Chuyển sang dùng một version model đã train
+    """
+    try:
+        return {"current": model_registry.promote(version)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/models/rollback")
+def rollback_model(version: Optional[str] = None):
+    """
+    Quay về version trước version hiện tại (hoặc version chỉ định)
+    """
+    try:
+        return {"current": model_registry.rollback(version)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @app.get("/predict/provinces")
 def get_provinces():
     """
@@ -526,25 +728,20 @@ def get_provinces():
 
 
 @app.get("/weather/check/{tinh_thanh}")
-def check_weather(tinh_thanh: str):
+def check_weather(tinh_thanh: str, compact: bool = False):
     """
     Check thời tiết và dự đoán thiên tai cho một tỉnh thành
+    compact=true: bỏ forecast gốc, weather chỉ còn các chỉ số chính (xem weather_service.compact_result)
     """
-    if not check_weather_and_predict:
-        raise HTTPException(
-            status_code=503,
-            detail="Weather service not available. Please install weather_service module."
-        )
-    
     try:
         result = check_weather_and_predict(tinh_thanh)
         
-        # Nếu có nguy cơ cao, tự động gửi cảnh báo
+        # Nếu có nguy cơ cao, tự động gửi cảnh báo (dữ liệu stale thì đã cảnh báo lúc còn mới)
         disaster_risk = result.get("disaster_risk", {})
         risk_level = disaster_risk.get("risk_level", "low")
         disaster_types = disaster_risk.get("disaster_types", [])
         
-        if risk_level in ["high", "critical"] and disaster_types:
+        if risk_level in ["high", "critical"] and disaster_types and not result.get("stale"):
             send_alert_to_nextjs(
                 tinh_thanh,
                 disaster_types,
@@ -552,36 +749,30 @@ def check_weather(tinh_thanh: str):
                 disaster_risk.get("details", {})
             )
         
-        return result
+        return FastJSONResponse(compact_result(result) if compact else result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/weather/check-batch")
-def check_weather_batch(provinces: List[str]):
+def check_weather_batch(provinces: List[str], compact: bool = False):
     """
-    Check thời tiết cho nhiều tỉnh thành cùng lúc
+    Check thời tiết cho nhiều tỉnh thành cùng lúc (compact như /weather/check)
     """
-    if not check_weather_and_predict:
-        raise HTTPException(
-            status_code=503,
-            detail="Weather service not available"
-        )
-    
     results = []
     alerts_sent = []
     
     for province in provinces:
         try:
             result = check_weather_and_predict(province)
-            results.append(result)
+            results.append(compact_result(result) if compact else result)
             
             # Check if alert needed
             disaster_risk = result.get("disaster_risk", {})
             risk_level = disaster_risk.get("risk_level", "low")
             disaster_types = disaster_risk.get("disaster_types", [])
             
-            if risk_level in ["high", "critical"] and disaster_types:
+            if risk_level in ["high", "critical"] and disaster_types and not result.get("stale"):
                 alert_sent = send_alert_to_nextjs(
                     province,
                     disaster_types,
@@ -591,17 +782,17 @@ def check_weather_batch(provinces: List[str]):
                 if alert_sent:
                     alerts_sent.append(province)
         except Exception as e:
-            print(f"Error checking weather for {province}: {e}")
+            logger.warning("Error checking weather for %s: %s", province, e)
             results.append({
                 "tinh_thanh": province,
                 "error": str(e)
             })
     
-    return {
+    return FastJSONResponse({
         "results": results,
         "alerts_sent": alerts_sent,
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 
 @app.post("/weather/alert")
@@ -609,12 +800,6 @@ def create_weather_alert(request: WeatherAlertRequest):
     """
     Tạo cảnh báo thời tiết thủ công
     """
-    if not check_weather_and_predict:
-        raise HTTPException(
-            status_code=503,
-            detail="Weather service not available"
-        )
-    
     try:
         result = check_weather_and_predict(request.tinh_thanh)
         disaster_risk = result.get("disaster_risk", {})
@@ -641,14 +826,11 @@ def create_weather_alert(request: WeatherAlertRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@track_job("periodic_weather_check")
 def periodic_weather_check():
     """
     Hàm được gọi định kỳ để check thời tiết cho các tỉnh thành chính
     """
-    if not check_weather_and_predict:
-        print("⚠️  Weather service not available for periodic check")
-        return
-    
     # Danh sách tỉnh thành cần monitor
     provinces_to_check = [
         "Hà Nội",
@@ -663,17 +845,21 @@ def periodic_weather_check():
         "Bình Định"
     ]
     
-    print(f"🔄 Starting periodic weather check for {len(provinces_to_check)} provinces...")
+    logger.info("Starting periodic weather check for %d provinces", len(provinces_to_check))
     
+    at_risk = {}
     for province in provinces_to_check:
         try:
             result = check_weather_and_predict(province)
             disaster_risk = result.get("disaster_risk", {})
             risk_level = disaster_risk.get("risk_level", "low")
             disaster_types = disaster_risk.get("disaster_types", [])
+            if risk_level in PRECOMPUTE_RISK_LEVELS:
+                at_risk[province] = disaster_types
             
-            if risk_level in ["high", "critical"] and disaster_types:
-                print(f"🚨 ALERT: {province} - {', '.join(disaster_types)} - Risk: {risk_level}")
+            if risk_level in ["high", "critical"] and disaster_types and not result.get("stale"):
+                logger.warning("Weather alert: %s - %s - risk %s", province, ", ".join(disaster_types), risk_level,
+                               extra={"tinh_thanh": province, "risk_level": risk_level})
                 send_alert_to_nextjs(
                     province,
                     disaster_types,
@@ -681,26 +867,165 @@ def periodic_weather_check():
                     disaster_risk.get("details", {})
                 )
             else:
-                print(f"✅ {province}: Risk level {risk_level}")
+                logger.debug("%s: risk level %s", province, risk_level)
         except Exception as e:
-            print(f"❌ Error checking {province}: {e}")
+            logger.error("Error checking %s: %s", province, e)
+    
+    logger.info("Periodic weather check completed")
+    
+    if at_risk and scheduler is not None:
+        # Job chạy một lần ngay sau lượt check thời tiết
+        scheduler.add_job(
+            precompute_forecasts,
+            args=[at_risk],
+            id="precompute_forecasts",
+            name="Precompute Forecasts",
+            replace_existing=True
+        )
+
+
+# Tỉnh có rủi ro từ mức này trở lên được tính trước dự báo
+PRECOMPUTE_RISK_LEVELS = ("medium", "high", "critical")
+# Số người chatbot gửi khi hỏi dự báo (ActionPredictRelief)
+CHATBOT_SO_NGUOI = 1000
+# Giữ kết quả tính trước trong cache tới lượt check thời tiết kế tiếp (6 giờ)
+PRECOMPUTE_CACHE_TTL = float(os.getenv("PRECOMPUTE_CACHE_TTL", str(6 * 3600)))
+
+
+@track_job("precompute_forecasts")
+def precompute_forecasts(at_risk: Dict[str, List[str]]):
+    """
+    Tính trước dự báo cho các tỉnh có rủi ro (theo từng loại thiên tai) bằng đường batch,
+    lưu vào du_bao_ais và prediction cache để chatbot / dashboard không phải chờ inference
+    """
+    started = time.perf_counter()
+    # Dự báo theo loại thiên tai (dashboard), được lưu vào du_bao_ais
+    forecasts = [
+        PredictionRequest(tinh_thanh=province, loai_thien_tai=disaster_type)
+        for province, disaster_types in at_risk.items()
+        for disaster_type in disaster_types
+    ]
+    # Dạng request của chatbot (tỉnh + so_nguoi cố định) và của dashboard GET /api/ai?generate=true
+    # (chỉ tỉnh), chỉ cần nằm sẵn trong cache: dashboard tự lưu du_bao_ais khi đọc
+    cache_only = [
+        PredictionRequest(tinh_thanh=province, so_nguoi=CHATBOT_SO_NGUOI)
+        for province in at_risk
+    ] + [PredictionRequest(tinh_thanh=province) for province in at_risk]
+    
+    try:
+        results = predict_many(forecasts, persist=True, cache_ttl=PRECOMPUTE_CACHE_TTL)
+        results += predict_many(cache_only, persist=False, cache_ttl=PRECOMPUTE_CACHE_TTL)
+    except Exception as e:
+        logger.exception("Forecast precompute error")
+        return
     
-    print("✅ Periodic weather check completed")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    done = sum(1 for r in results if r is not None)
+    logger.info("Precomputed %d/%d forecasts for %d provinces in %.0fms", done, len(results), len(at_risk), elapsed_ms)
 
 
-# Schedule periodic weather checks (mỗi 6 giờ)
-scheduler.add_job(
-    periodic_weather_check,
-    trigger=CronTrigger(hour="*/6"),  # Every 6 hours
-    id="periodic_weather_check",
-    name="Periodic Weather Check",
-    replace_existing=True
-)
+# Không chạy hai lượt matching / chấm điểm cùng lúc (scheduler và endpoint)
+matching_lock = threading.Lock()
+priority_lock = threading.Lock()
 
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+@track_job("periodic_priority_scoring")
+def periodic_priority_scoring():
+    """
+    Hàm được gọi định kỳ để tính lại diem_uu_tien cho các yêu cầu đang mở
+    """
+    if not priority_lock.acquire(blocking=False):
+        logger.info("Priority scoring already running, skipping")
+        return
+    
+    conn = get_db_connection()
+    if not conn:
+        priority_lock.release()
+        return
+    
+    try:
+        summary = run_priority_scoring(conn)
+        logger.info("Priority scoring: %s/%s requests updated in %sms",
+                    summary['updated'], summary['scored'], summary['elapsed_ms'])
+    except Exception as e:
+        conn.rollback()
+        logger.exception("Priority scoring error")
+    finally:
+        conn.close()
+        priority_lock.release()
+
+
+@track_job("periodic_matching")
+def periodic_matching():
+    """
+    Hàm được gọi định kỳ để auto-match các yêu cầu đã phê duyệt với nguồn lực
+    """
+    if not matching_lock.acquire(blocking=False):
+        logger.info("Matching already running, skipping")
+        return
+    
+    conn = get_db_connection()
+    if not conn:
+        matching_lock.release()
+        return
+    
+    try:
+        summary = run_matching(conn)
+        logger.info("Auto-matching: %s/%s requests matched", summary['matched'], summary['requests'],
+                    extra={"timings_ms": summary['timings_ms']})
+    except Exception as e:
+        conn.rollback()
+        logger.exception("Auto-matching error")
+    finally:
+        conn.close()
+        matching_lock.release()
+
+
+def start_scheduler():
+    """Tạo scheduler và đăng ký các job định kỳ (import apscheduler lúc khởi động, không phải lúc import)"""
+    global scheduler
+    if scheduler is not None:
+        return
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+    scheduler = BackgroundScheduler()
+
+    # Schedule periodic weather checks (mỗi 6 giờ)
+    scheduler.add_job(
+        periodic_weather_check,
+        trigger=CronTrigger(hour="*/6"),  # Every 6 hours
+        id="periodic_weather_check",
+        name="Periodic Weather Check",
+        replace_existing=True
+    )
+
+    # Schedule priority scoring (mặc định mỗi 10 phút)
+    scheduler.add_job(
+        periodic_priority_scoring,
+        trigger=CronTrigger(minute=f"*/{os.getenv('PRIORITY_INTERVAL_MINUTES', '10')}"),
+        id="periodic_priority_scoring",
+        name="Periodic Priority Scoring",
+        replace_existing=True
+    )
+
+    # Schedule auto-matching (mặc định mỗi 15 phút)
+    scheduler.add_job(
+        periodic_matching,
+        trigger=CronTrigger(minute=f"*/{os.getenv('MATCHING_INTERVAL_MINUTES', '15')}"),
+        id="periodic_matching",
+        name="Periodic Auto-Matching",
+        replace_existing=True
+    )
+
+    scheduler.start()
+
+
+def stop_scheduler():
+    global scheduler
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        scheduler = None
 
 
 # ============================================
@@ -719,74 +1044,98 @@ class ChatQueryResponse(BaseModel):
     message: Optional[str] = None
 
 
+def _chat_response(success: bool, data: Optional[Dict] = None, message: Optional[str] = None):
+    """
+    Trả thẳng FastJSONResponse (cùng schema ChatQueryResponse): bỏ qua bước validate/encode
+    từng dòng của Pydantic, datetime/Decimal từ database do orjson xử lý
+    """
+    return FastJSONResponse({"success": success, "data": data, "message": message})
+
+
 @app.post("/chat/query", response_model=ChatQueryResponse)
 def chat_database_query(request: ChatQueryRequest):
     """
     Unified endpoint for chatbot database queries
     Supports various query types with optional filters
     """
+    # Nguồn lực sắp hết được trả lời từ bộ nhớ, không cần mở kết nối database
+    if request.query_type.lower() == "low_stock" and low_stock_tracker.ready:
+        return _chat_response(
+            success=True,
+            data=_get_low_stock_resources(None, min(request.limit or 20, 100))
+        )
+    
     conn = get_db_connection()
     if not conn:
-        return ChatQueryResponse(
+        cached = _last_good_chat.get(request.query_type.lower())
+        if cached:
+            return _chat_response(
+                success=True,
+                data={**cached[0], "stale": True, "stale_since": cached[1]},
+                message="Cơ sở dữ liệu tạm thời không khả dụng, số liệu lấy từ lần truy vấn trước"
+            )
+        return _chat_response(
             success=False,
             message="Không thể kết nối tới cơ sở dữ liệu"
         )
     
     try:
-        if PSYCOPG_VERSION == 3:
-            cursor = conn.cursor(row_factory=dict_row)
-        else:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = dict_cursor(conn)
         
         query_type = request.query_type.lower()
         filters = request.filters or {}
         limit = min(request.limit or 20, 100)
         
         result = {}
+        started = time.perf_counter()
         
-        if query_type == "statistics":
-            result = _get_statistics(cursor)
-        elif query_type == "resources":
-            result = _get_resources(cursor, filters, limit)
-        elif query_type == "low_stock":
-            result = _get_low_stock_resources(cursor, limit)
-        elif query_type == "requests":
-            result = _get_requests(cursor, filters, limit)
-        elif query_type == "pending_requests":
-            result = _get_pending_requests(cursor, limit)
-        elif query_type == "urgent_requests":
-            result = _get_urgent_requests(cursor, limit)
-        elif query_type == "centers":
-            result = _get_centers(cursor, filters, limit)
-        elif query_type == "distributions":
-            result = _get_distributions(cursor, filters, limit)
-        elif query_type == "volunteers":
-            result = _get_volunteers(cursor, limit)
-        elif query_type == "predictions":
-            result = _get_ai_predictions(cursor, limit)
-        elif query_type == "recent_activities":
-            result = _get_recent_activities(cursor, limit)
-        elif query_type == "compare_centers":
-            result = _compare_centers(cursor)
-        elif query_type == "affected_people":
-            result = _get_affected_people_stats(cursor)
-        else:
-            return ChatQueryResponse(
-                success=False,
-                message=f"Unknown query type: {query_type}"
-            )
+        with query_context(query_type=query_type, filters=sorted(filters)):
+            if query_type == "statistics":
+                result = _get_statistics(cursor)
+            elif query_type == "resources":
+                result = _get_resources(cursor, filters, limit)
+            elif query_type == "low_stock":
+                result = _get_low_stock_resources(cursor, limit)
+            elif query_type == "requests":
+                result = _get_requests(cursor, filters, limit)
+            elif query_type == "pending_requests":
+                result = _get_pending_requests(cursor, limit)
+            elif query_type == "urgent_requests":
+                result = _get_urgent_requests(cursor, limit)
+            elif query_type == "centers":
+                result = _get_centers(cursor, filters, limit)
+            elif query_type == "distributions":
+                result = _get_distributions(cursor, filters, limit)
+            elif query_type == "volunteers":
+                result = _get_volunteers(cursor, limit)
+            elif query_type == "predictions":
+                result = _get_ai_predictions(cursor, limit)
+            elif query_type == "recent_activities":
+                result = _get_recent_activities(cursor, limit)
+            elif query_type == "compare_centers":
+                result = _compare_centers(cursor)
+            elif query_type == "affected_people":
+                result = _get_affected_people_stats(cursor)
+            else:
+                return _chat_response(
+                    success=False,
+                    message=f"Unknown query type: {query_type}"
+                )
         
+        CHAT_QUERY_DURATION.labels(query_type).observe(time.perf_counter() - started)
         cursor.close()
         conn.close()
+        if query_type in CHAT_FALLBACK_QUERY_TYPES:
+            _last_good_chat.put(query_type, result)
         
-        return ChatQueryResponse(
+        return _chat_response(
             success=True,
             data=result
         )
     except Exception as e:
         if conn:
             conn.close()
-        return ChatQueryResponse(
+        return _chat_response(
             success=False,
             message=f"Query error: {str(e)}"
         )
@@ -876,15 +1225,20 @@ def _get_resources(cursor, filters, limit):
 
 def _get_low_stock_resources(cursor, limit):
     """Get resources running low"""
-    cursor.execute("""
-        SELECT nl.id, nl.ten_nguon_luc, nl.loai, nl.so_luong, nl.don_vi, 
-               nl.trang_thai, nl.so_luong_toi_thieu,
-               tt.ten_trung_tam, tt.dia_chi,
-               (nl.so_luong * 100.0 / NULLIF(nl.so_luong_toi_thieu, 0)) as percent_remaining
-        FROM nguon_lucs nl
-        JOIN trung_tam_cuu_tros tt ON nl.id_trung_tam = tt.id
-        WHERE nl.so_luong <= nl.so_luong_toi_thieu * 1.5
-        ORDER BY percent_remaining ASC NULLS FIRST, nl.so_luong ASC
+    # Tracker được cập nhật qua LISTEN/NOTIFY, không cần query database
+    if low_stock_tracker.ready:
+        items = low_stock_tracker.items(limit)
+        return {
+            "items": items,
+            "total": len(items)
+        }
+    return _get_low_stock_resources_from_db(cursor, limit)
+
+
+def _get_low_stock_resources_from_db(cursor, limit):
+    """Get resources running low (partial index nguon_lucs_ton_kho_thap_idx)"""
+    cursor.execute(LOW_STOCK_QUERY + """
+        ORDER BY nl.ty_le_con_lai ASC NULLS FIRST, nl.so_luong ASC
         LIMIT %s
     """, (limit,))
     
@@ -929,12 +1283,7 @@ def _get_requests(cursor, filters, limit):
     
     query += """
         ORDER BY 
-            CASE yc.do_uu_tien 
-                WHEN 'khan_cap' THEN 1 
-                WHEN 'cao' THEN 2 
-                WHEN 'trung_binh' THEN 3 
-                ELSE 4 
-            END,
+            yc.diem_uu_tien DESC,
             yc.created_at DESC
         LIMIT %s
     """
@@ -943,13 +1292,7 @@ def _get_requests(cursor, filters, limit):
     cursor.execute(query, params)
     rows = cursor.fetchall()
     
-    # Convert datetime to string
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('created_at'):
-            item['created_at'] = item['created_at'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -967,23 +1310,13 @@ def _get_pending_requests(cursor, limit):
         LEFT JOIN nguoi_dungs nd ON yc.id_nguoi_dung = nd.id
         WHERE yc.trang_thai_phe_duyet = 'cho_phe_duyet'
         ORDER BY 
-            CASE yc.do_uu_tien 
-                WHEN 'khan_cap' THEN 1 
-                WHEN 'cao' THEN 2 
-                WHEN 'trung_binh' THEN 3 
-                ELSE 4 
-            END,
+            yc.diem_uu_tien DESC,
             yc.created_at DESC
         LIMIT %s
     """, (limit,))
     
     rows = cursor.fetchall()
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('created_at'):
-            item['created_at'] = item['created_at'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1002,18 +1335,13 @@ def _get_urgent_requests(cursor, limit):
         WHERE yc.do_uu_tien IN ('khan_cap', 'cao')
         AND yc.trang_thai_phe_duyet != 'tu_choi'
         ORDER BY 
-            CASE yc.do_uu_tien WHEN 'khan_cap' THEN 1 ELSE 2 END,
+            yc.diem_uu_tien DESC,
             yc.created_at DESC
         LIMIT %s
     """, (limit,))
     
     rows = cursor.fetchall()
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('created_at'):
-            item['created_at'] = item['created_at'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1040,15 +1368,7 @@ def _get_centers(cursor, filters, limit):
     cursor.execute(query, params)
     rows = cursor.fetchall()
     
-    items = []
-    for row in rows:
-        item = dict(row)
-        # Convert Decimal to float for JSON serialization
-        if item.get('vi_do'):
-            item['vi_do'] = float(item['vi_do'])
-        if item.get('kinh_do'):
-            item['kinh_do'] = float(item['kinh_do'])
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1081,14 +1401,7 @@ def _get_distributions(cursor, filters, limit):
     cursor.execute(query, params)
     rows = cursor.fetchall()
     
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('thoi_gian_xuat'):
-            item['thoi_gian_xuat'] = item['thoi_gian_xuat'].isoformat()
-        if item.get('thoi_gian_giao'):
-            item['thoi_gian_giao'] = item['thoi_gian_giao'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1110,12 +1423,7 @@ def _get_volunteers(cursor, limit):
     """, (limit,))
     
     rows = cursor.fetchall()
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('created_at'):
-            item['created_at'] = item['created_at'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1136,14 +1444,7 @@ def _get_ai_predictions(cursor, limit):
     """, (limit,))
     
     rows = cursor.fetchall()
-    items = []
-    for row in rows:
-        item = dict(row)
-        if item.get('ngay_du_bao'):
-            item['ngay_du_bao'] = item['ngay_du_bao'].isoformat()
-        if item.get('created_at'):
-            item['created_at'] = item['created_at'].isoformat()
-        items.append(item)
+    items = [dict(row) for row in rows]
     
     return {
         "items": items,
@@ -1153,38 +1454,32 @@ def _get_ai_predictions(cursor, limit):
 
 def _get_recent_activities(cursor, limit):
     """Get recent system activities"""
-    # Get recent requests
+    # Một query UNION ALL: mỗi nhánh tự LIMIT theo index riêng
+    # (yeu_cau_cuu_tros_created_at_idx, phan_phois_thoi_gian_hoat_dong_idx),
+    # Postgres merge hai nhánh đã sắp xếp rồi cắt lấy `limit` dòng mới nhất
     cursor.execute("""
-        SELECT 'request' as activity_type, id, loai_yeu_cau as description, 
-               trang_thai_phe_duyet as status, created_at
-        FROM yeu_cau_cuu_tros
+        (
+            SELECT 'request' as activity_type, id, loai_yeu_cau as description,
+                   trang_thai_phe_duyet as status, created_at
+            FROM yeu_cau_cuu_tros
+            ORDER BY created_at DESC
+            LIMIT %s
+        )
+        UNION ALL
+        (
+            SELECT 'distribution' as activity_type, pp.id, nl.ten_nguon_luc as description,
+                   pp.trang_thai as status, COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) as created_at
+            FROM phan_phois pp
+            JOIN nguon_lucs nl ON pp.id_nguon_luc = nl.id
+            WHERE pp.thoi_gian_xuat IS NOT NULL OR pp.thoi_gian_giao IS NOT NULL
+            ORDER BY COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) DESC
+            LIMIT %s
+        )
         ORDER BY created_at DESC
         LIMIT %s
-    """, (limit,))
-    requests = cursor.fetchall()
+    """, (limit, limit, limit))
     
-    # Get recent distributions
-    cursor.execute("""
-        SELECT 'distribution' as activity_type, pp.id, nl.ten_nguon_luc as description,
-               pp.trang_thai as status, COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) as created_at
-        FROM phan_phois pp
-        JOIN nguon_lucs nl ON pp.id_nguon_luc = nl.id
-        WHERE pp.thoi_gian_xuat IS NOT NULL OR pp.thoi_gian_giao IS NOT NULL
-        ORDER BY COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) DESC
-        LIMIT %s
-    """, (limit,))
-    distributions = cursor.fetchall()
-    
-    # Combine and sort
-    activities = list(requests) + list(distributions)
-    activities.sort(key=lambda x: x.get('created_at') or datetime.min, reverse=True)
-    
-    items = []
-    for item in activities[:limit]:
-        item_dict = dict(item)
-        if item_dict.get('created_at'):
-            item_dict['created_at'] = item_dict['created_at'].isoformat()
-        items.append(item_dict)
+    items = [dict(row) for row in cursor.fetchall()]
     
     return {
         "items": items,
@@ -1270,3 +1565,126 @@ def get_chat_low_stock():
     request = ChatQueryRequest(query_type="low_stock")
     return chat_database_query(request)
 
+
+# ============================================
+# NEAREST CENTERS
+# ============================================
+
+@app.get("/centers/nearest")
+def get_nearest_centers(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=100),
+    location: Optional[str] = None
+):
+    """
+    Top-k trung tâm cứu trợ gần tọa độ (lat, lon) nhất, xét trên tất cả trung tâm
+    """
+    if centers_index.ready:
+        items = centers_index.nearest(lat, lon, k, location)
+        return {"items": items, "total": len(items), "source": "index"}
+    
+    # Index chưa build (listener chưa kết nối): tính trực tiếp trong database
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=503, detail="Không thể kết nối tới cơ sở dữ liệu")
+    
+    try:
+        cursor = dict_cursor(conn)
+        items = nearest_centers_from_db(cursor, lat, lon, k, location)
+        cursor.close()
+        conn.close()
+        return {"items": items, "total": len(items), "source": "database"}
+    except Exception as e:
+        conn.close()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================
+# AUTO-MATCHING
+# ============================================
+
+@app.post("/matching/run")
+def run_auto_matching(dry_run: bool = False):
+    """
+    Auto-match toàn bộ yêu cầu đã phê duyệt (chua_match) với nguồn lực khả dụng
+    """
+    if not matching_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Matching is already running")
+    
+    conn = get_db_connection()
+    if not conn:
+        matching_lock.release()
+        raise HTTPException(status_code=503, detail="Không thể kết nối tới cơ sở dữ liệu")
+    
+    try:
+        return run_matching(conn, dry_run=dry_run)
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+        matching_lock.release()
+
+
+# ============================================
+# PRIORITY SCORING
+# ============================================
+
+@app.post("/priority/recompute")
+def recompute_priority_scores():
+    """
+    Tính lại diem_uu_tien cho tất cả yêu cầu đang mở
+    """
+    if not priority_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Priority scoring is already running")
+    
+    conn = get_db_connection()
+    if not conn:
+        priority_lock.release()
+        raise HTTPException(status_code=503, detail="Không thể kết nối tới cơ sở dữ liệu")
+    
+    try:
+        return run_priority_scoring(conn)
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+        priority_lock.release()
+
+
+# ============================================
+# DEBUG
+# ============================================
+
+@app.get("/debug/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=500), top: int = Query(20, ge=0, le=500)):
+    """
+    Query chậm gần nhất (kèm EXPLAIN ANALYZE) và các dạng SQL tốn thời gian nhất
+    Cần QUERY_PROFILER_ENABLED=true
+    """
+    if not QUERY_PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Query profiler is disabled (QUERY_PROFILER_ENABLED=false)")
+    return {
+        "threshold_ms": query_profiler.slow_ms,
+        "slow_queries": query_profiler.slow_queries(limit),
+        "top": query_profiler.top(top),
+    }
+
+
+@app.delete("/debug/slow-queries")
+def reset_slow_queries():
+    """
+    Xóa số liệu profiler trong bộ nhớ (file QUERY_PROFILE_FILE giữ nguyên)
+    """
+    if not QUERY_PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Query profiler is disabled (QUERY_PROFILER_ENABLED=false)")
+    query_profiler.reset()
+    return {"success": True}
+
+
+if __name__ == "__main__":
+    # Development: một process. Production nhiều worker: gunicorn -c gunicorn.conf.py main:app
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,275 @@
+"""
+Auto-matching - ghép hàng loạt yêu cầu cứu trợ đã phê duyệt với nguồn lực khả dụng
+
+Cách tính điểm giống RequestWorkflowService.findBestResourceMatch (src/lib/requestWorkflow.ts):
+    điểm = độ tương đồng loại * 50 + max(0, 100 - 2 * khoảng cách km) + tỷ lệ khả dụng * 50
+nhưng tính cho cả ma trận yêu cầu × nguồn lực bằng NumPy, rồi gán tham lam theo
+diem_uu_tien giảm dần, có trừ tồn kho để hai yêu cầu không cùng giữ một lượng hàng.
+"""
+
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from db import dict_cursor
+from geo import coords_array, iter_distance_chunks
+
+# Dùng partial index yeu_cau_cuu_tros_cho_match_idx (migration add_matching_indexes)
+PENDING_REQUESTS_QUERY = """
+    SELECT id, loai_yeu_cau, so_nguoi, vi_do, kinh_do
+    FROM yeu_cau_cuu_tros
+    WHERE trang_thai_phe_duyet = 'da_phe_duyet'
+      AND trang_thai_matching = 'chua_match'
+    ORDER BY diem_uu_tien DESC, created_at ASC
+"""
+
+AVAILABLE_RESOURCES_QUERY = """
+    SELECT nl.id, nl.loai, nl.so_luong, nl.so_luong_toi_thieu,
+           tt.vi_do, tt.kinh_do
+    FROM nguon_lucs nl
+    JOIN trung_tam_cuu_tros tt ON nl.id_trung_tam = tt.id
+    WHERE nl.trang_thai = 'san_sang' AND nl.so_luong > 0
+"""
+
+# Mọi loại nguồn lực (kể cả đang hết hàng): yêu cầu không hợp loại nào mới là khong_match,
+# yêu cầu chỉ thiếu hàng giữ chua_match để lần chạy sau (khi nhập thêm hàng) ghép lại
+RESOURCE_TYPES_QUERY = """
+    SELECT DISTINCT loai FROM nguon_lucs
+"""
+
+# Lượng hàng đã hứa cho các yêu cầu đã match nhưng chưa xử lý xong
+RESERVED_QUERY = """
+    SELECT id_nguon_luc_match AS id, SUM(so_nguoi) AS reserved
+    FROM yeu_cau_cuu_tros
+    WHERE trang_thai_matching = 'da_match'
+      AND id_nguon_luc_match IS NOT NULL
+      AND trang_thai IN ('cho_xu_ly', 'dang_xu_ly')
+    GROUP BY id_nguon_luc_match
+"""
+
+# Một câu UPDATE cho cả lô; chỉ ghi đè yêu cầu vẫn còn chua_match
+# (không đè kết quả auto-match thủ công chạy song song)
+APPLY_MATCHES_SQL = """
+    UPDATE yeu_cau_cuu_tros AS yc
+    SET id_nguon_luc_match = m.id_nguon_luc,
+        khoang_cach_gan_nhat = m.khoang_cach,
+        trang_thai_matching = m.trang_thai,
+        updated_at = NOW()
+    FROM unnest(%s::int[], %s::int[], %s::numeric[], %s::text[])
+        AS m(id, id_nguon_luc, khoang_cach, trang_thai)
+    WHERE yc.id = m.id AND yc.trang_thai_matching = 'chua_match'
+"""
+
+# Từ khóa phổ biến trong cứu trợ (giống extractKeywords bên Next.js)
+KEYWORD_GROUPS = [
+    (("thuc pham", "food"), ("thucpham", "food")),
+    (("nuoc", "water"), ("nuoc", "water")),
+    (("thuoc", "medical", "yte"), ("thuoc", "medical", "yte")),
+    (("cho o", "shelter"), ("choo", "shelter")),
+    (("cuu ho", "rescue"), ("cuuho", "rescue")),
+    (("quan ao", "clothing"), ("quanao", "clothing")),
+]
+
+
+def strip_accents(text: str) -> str:
+    normalized = unicodedata.normalize("NFD", text.lower())
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def extract_keywords(text: str) -> List[str]:
+    """Từ khóa của loại yêu cầu / loại nguồn lực để so khớp linh hoạt"""
+    normalized = strip_accents(text or "")
+    keywords = []
+    for needles, tokens in KEYWORD_GROUPS:
+        if any(needle in normalized for needle in needles):
+            keywords.extend(tokens)
+    keywords.extend(w for w in normalized.split() if len(w) > 2)
+    return list(dict.fromkeys(keywords))
+
+
+def _are_similar(word1: str, word2: str) -> bool:
+    if abs(len(word1) - len(word2)) > 2:
+        return False
+    min_len = min(len(word1), len(word2))
+    if min_len >= 3:
+        if word1[:min_len] == word2[:min_len]:
+            return True
+        if word1 in word2 or word2 in word1:
+            return True
+    return False
+
+
+def match_score(request_keywords: List[str], resource_keywords: List[str]) -> float:
+    """Độ tương đồng 0-1 giữa hai tập từ khóa"""
+    if not request_keywords or not resource_keywords:
+        return 0.0
+    matches = 0
+    for req in request_keywords:
+        for res in resource_keywords:
+            if req == res:
+                matches += 3
+            elif req in res or res in req:
+                matches += 2
+            elif _are_similar(req, res):
+                matches += 1
+    return matches / (len(request_keywords) * len(resource_keywords) * 2)
+
+
+def _has_common_words(text1: str, text2: str) -> bool:
+    words1 = [w for w in (text1 or "").lower().split() if len(w) > 2]
+    words2 = [w for w in (text2 or "").lower().split() if len(w) > 2]
+    return any(w1 == w2 or w1 in w2 or w2 in w1 for w1 in words1 for w2 in words2)
+
+
+def compatibility_matrix(request_types: List[str], resource_types: List[str]) -> np.ndarray:
+    """
+    Độ tương đồng giữa các loại yêu cầu và loại nguồn lực (chỉ tính trên giá trị
+    distinct, số lượng nhỏ). NaN nghĩa là không phù hợp.
+    """
+    request_keywords = [extract_keywords(t) for t in request_types]
+    resource_keywords = [extract_keywords(t) for t in resource_types]
+    compat = np.full((len(request_types), len(resource_types)), np.nan)
+    for i, req_type in enumerate(request_types):
+        for j, res_type in enumerate(resource_types):
+            score = match_score(request_keywords[i], resource_keywords[j])
+            if score > 0 or _has_common_words(req_type, res_type):
+                compat[i, j] = score
+    return compat
+
+
+def solve_matching(
+    requests: List[Dict],
+    resources: List[Dict],
+    reserved: Optional[Dict[int, int]] = None,
+    chunk_size: int = 2048,
+    resource_types: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Gán mỗi yêu cầu (đã sắp theo độ ưu tiên) cho nguồn lực có điểm cao nhất
+    còn đủ hàng (so_luong - đã giữ >= so_nguoi).
+
+    Trả về dict các mảng song song: request_ids, resource_ids (-1 nếu không match),
+    distances (NaN nếu không match hoặc thiếu tọa độ), compatible (False nếu loại yêu cầu
+    không hợp với loại nào trong resource_types - mặc định là loại của `resources`).
+    """
+    n = len(requests)
+    m = len(resources)
+    request_ids = np.array([r["id"] for r in requests], dtype=np.int64)
+    resource_ids = np.full(n, -1, dtype=np.int64)
+    distances = np.full(n, np.nan)
+    compatible = np.ones(n, dtype=bool)
+    result = {"request_ids": request_ids, "resource_ids": resource_ids,
+              "distances": distances, "compatible": compatible}
+    if n == 0:
+        return result
+
+    req_types, req_codes = np.unique([r["loai_yeu_cau"] or "" for r in requests], return_inverse=True)
+    if resource_types is None:
+        resource_types = [r["loai"] or "" for r in resources]
+    if resource_types:
+        all_compat = compatibility_matrix(list(req_types), sorted(set(resource_types)))
+        compatible[:] = (~np.isnan(all_compat)).any(axis=1)[req_codes]
+    if m == 0:
+        return result
+
+    reserved = reserved or {}
+    res_ids = np.array([r["id"] for r in resources], dtype=np.int64)
+    stock = np.array([r["so_luong"] or 0 for r in resources], dtype=np.float64)
+    minimum = np.array([r.get("so_luong_toi_thieu") or 0 for r in resources], dtype=np.float64)
+    remaining = stock - np.array([reserved.get(int(i), 0) for i in res_ids], dtype=np.float64)
+    demand = np.array([max(r["so_nguoi"] or 0, 1) for r in requests], dtype=np.float64)
+
+    # Điểm không phụ thuộc yêu cầu: tỷ lệ khả dụng
+    availability = stock / np.maximum(stock + minimum, 1.0) * 50
+
+    # Mã hóa loại yêu cầu / nguồn lực thành chỉ số vào ma trận tương đồng
+    res_types, res_codes = np.unique([r["loai"] or "" for r in resources], return_inverse=True)
+    compat = compatibility_matrix(list(req_types), list(res_types))
+
+    for start, dist in iter_distance_chunks(coords_array(requests), coords_array(resources), chunk_size):
+        end = start + len(dist)
+        type_score = compat[req_codes[start:end]][:, res_codes] * 50
+        scores = type_score + np.nan_to_num(np.maximum(0.0, 100.0 - 2.0 * dist), nan=0.0) + availability
+        # Loại không phù hợp -> NaN -> -inf
+        scores[np.isnan(type_score)] = -np.inf
+
+        # Gán tuần tự theo thứ tự ưu tiên: tồn kho thay đổi sau mỗi lần gán
+        for row in range(end - start):
+            i = start + row
+            candidates = np.where(remaining >= demand[i], scores[row], -np.inf)
+            j = int(np.argmax(candidates))
+            if candidates[j] == -np.inf:
+                continue
+            remaining[j] -= demand[i]
+            resource_ids[i] = res_ids[j]
+            distances[i] = dist[row, j]
+
+    return result
+
+
+def apply_matches(conn, result: Dict) -> int:
+    """
+    Ghi kết quả vào yeu_cau_cuu_tros bằng một câu UPDATE ... FROM unnest(...).
+    Yêu cầu hợp loại nhưng thiếu hàng không được ghi (giữ chua_match để ghép lại sau)
+    """
+    matched = result["resource_ids"] >= 0
+    write = matched | ~result["compatible"]
+    request_ids = result["request_ids"][write]
+    if len(request_ids) == 0:
+        return 0
+
+    matched = matched[write]
+    distances = np.round(result["distances"][write], 2)
+    params = (
+        request_ids.tolist(),
+        [int(r) if ok else None for r, ok in zip(result["resource_ids"][write], matched)],
+        [None if np.isnan(d) else float(d) for d in distances],
+        ["da_match" if ok else "khong_match" for ok in matched],
+    )
+
+    cursor = conn.cursor()
+    cursor.execute(APPLY_MATCHES_SQL, params)
+    updated = cursor.rowcount
+    cursor.close()
+    conn.commit()
+    return updated
+
+
+def run_matching(conn, dry_run: bool = False) -> Dict:
+    """Nạp dữ liệu, giải bài toán ghép và (nếu không dry_run) ghi kết quả"""
+    started = time.perf_counter()
+    cursor = dict_cursor(conn)
+    cursor.execute(PENDING_REQUESTS_QUERY)
+    requests = cursor.fetchall()
+    cursor.execute(AVAILABLE_RESOURCES_QUERY)
+    resources = cursor.fetchall()
+    cursor.execute(RESERVED_QUERY)
+    reserved = {row["id"]: int(row["reserved"] or 0) for row in cursor.fetchall()}
+    cursor.execute(RESOURCE_TYPES_QUERY)
+    resource_types = [row["loai"] or "" for row in cursor.fetchall()]
+    cursor.close()
+    loaded = time.perf_counter()
+
+    result = solve_matching(requests, resources, reserved, resource_types=resource_types)
+    solved = time.perf_counter()
+
+    updated = 0 if dry_run else apply_matches(conn, result)
+    finished = time.perf_counter()
+
+    matched = int(np.count_nonzero(result["resource_ids"] >= 0))
+    return {
+        "requests": len(requests),
+        "resources": len(resources),
+        "matched": matched,
+        "unmatched": len(requests) - matched,
+        "incompatible": int(np.count_nonzero(~result["compatible"])),
+        "updated": updated,
+        "dry_run": dry_run,
+        "timings_ms": {
+            "load": round((loaded - started) * 1000, 1),
+            "solve": round((solved - loaded) * 1000, 1),
+            "write": round((finished - solved) * 1000, 1),
+        },
+    }
@@ -0,0 +1,122 @@
+"""
+Prometheus metrics cho ai-service
+
+Middleware đo latency từng route (theo route template, không theo URL thật để tránh
+bùng nổ label), các hook đo query chat, gọi Weather API, load / predict model,
+job scheduler và gửi cảnh báo. Khi chạy nhiều worker, đặt PROMETHEUS_MULTIPROC_DIR
+để /metrics gộp số liệu của mọi process.
+"""
+
+import functools
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Bucket (giây) cho request / query: từ 5ms tới 30s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Job nền / train chạy lâu hơn nhiều
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+CHAT_QUERY_DURATION = Histogram(
+    "chat_query_duration_seconds", "Thời gian query database của /chat/query",
+    ["query_type"], buckets=LATENCY_BUCKETS,
+)
+WEATHER_API_DURATION = Histogram(
+    "weather_api_duration_seconds", "Latency gọi OpenWeatherMap",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+WEATHER_API_ERRORS = Counter(
+    "weather_api_errors_total", "Lỗi gọi OpenWeatherMap",
+    ["endpoint", "reason"],
+)
+MODEL_LOAD_DURATION = Histogram(
+    "model_load_duration_seconds", "Thời gian load bundle model",
+    buckets=LATENCY_BUCKETS,
+)
+PREDICT_DURATION = Histogram(
+    "predict_duration_seconds", "Thời gian dự báo (ml: cả lô, heuristic: một yêu cầu)",
+    ["method"], buckets=LATENCY_BUCKETS,
+)
+PREDICTIONS = Counter(
+    "predictions_total", "Số dự báo trả về",
+    ["source"],
+)
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds", "Thời gian chạy job scheduler",
+    ["job"], buckets=JOB_BUCKETS,
+)
+JOB_FAILURES = Counter(
+    "scheduler_job_failures_total", "Job scheduler kết thúc bằng exception",
+    ["job"],
+)
+ALERTS_SENT = Counter(
+    "weather_alerts_total", "Kết quả gửi cảnh báo thời tiết tới Next.js",
+    ["outcome"],
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Số lần circuit breaker chuyển trạng thái",
+    ["breaker", "state"],
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total", "Lời gọi bị breaker (open) từ chối ngay",
+    ["breaker"],
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Request bị trả 429 bởi admission control",
+    ["route_class", "reason"],
+)
+
+
+def track_job(name: str):
+    """Decorator đo thời gian / đếm lỗi của một job scheduler"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                JOB_FAILURES.labels(name).inc()
+                raise
+            finally:
+                JOB_DURATION.labels(name).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+async def metrics_middleware(request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (/train/{job_id}) có sau khi routing xong
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status),
+        ).observe(time.perf_counter() - started)
+
+
+def render_metrics():
+    """(body, content type) cho endpoint /metrics"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,140 @@
+"""
+Model registry - lưu model theo version trên đĩa, promote / rollback nguyên tử
+
+    models/
+      versions/<version>/bundle.joblib   encoder + 4 model
+      versions/<version>/manifest.json   version, số dòng train, metrics, feature schema
+      CURRENT                            tên version đang dùng
+
+Version được ghi vào thư mục tạm rồi rename, CURRENT được thay bằng os.replace,
+nên reader luôn thấy một version hoàn chỉnh. Mỗi process load bundle một lần cho mỗi
+version và giữ một bản riêng trong bộ nhớ (sklearn chép mảng của cây khi unpickle).
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from metrics import MODEL_LOAD_DURATION
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FILE = "bundle.joblib"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+DEFAULT_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "5"))
+
+
+class ModelRegistry:
+    def __init__(self, root: str, keep_versions: int = DEFAULT_KEEP_VERSIONS):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.keep_versions = keep_versions
+        self._lock = threading.Lock()
+        self._loaded: Optional[Dict] = None
+        self._loaded_key = None
+        self._on_promote: List[Callable[[str], None]] = []
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    def on_promote(self, callback: Callable[[str], None]):
+        """Đăng ký callback(version) sau mỗi lần promote / rollback trong process này"""
+        self._on_promote.append(callback)
+
+    def _version_dir(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def list_versions(self) -> List[str]:
+        # Tên version bắt đầu bằng timestamp nên sort theo tên = sort theo thời gian
+        return sorted(
+            name for name in os.listdir(self.versions_dir)
+            if not name.startswith(".") and os.path.exists(os.path.join(self.versions_dir, name, MANIFEST_FILE))
+        )
+
+    def manifest(self, version: str) -> Dict:
+        with open(os.path.join(self._version_dir(version), MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def publish(self, bundle: Dict, manifest: Dict) -> str:
+        """Ghi version mới (chưa promote), trả về tên version"""
+        version = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        tmp_dir = os.path.join(self.versions_dir, f".tmp-{version}")
+        os.makedirs(tmp_dir)
+        import joblib
+        try:
+            # Không nén: load nhanh hơn, đổi lại file lớn hơn
+            joblib.dump(bundle, os.path.join(tmp_dir, BUNDLE_FILE))
+            manifest = {"version": version, "created_at": datetime.now().isoformat(), **manifest}
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.rename(tmp_dir, self._version_dir(version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return version
+
+    def promote(self, version: str) -> str:
+        if not os.path.exists(os.path.join(self._version_dir(version), MANIFEST_FILE)):
+            raise ValueError(f"Model version not found: {version}")
+        with self._lock:
+            tmp_path = os.path.join(self.root, f".{CURRENT_FILE}.{uuid.uuid4().hex}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+            self._cleanup(version)
+        logger.info("Model version %s promoted", version)
+        for callback in self._on_promote:
+            callback(version)
+        return version
+
+    def rollback(self, version: Optional[str] = None) -> str:
+        """Promote lại `version`, hoặc version ngay trước version hiện tại"""
+        if version is None:
+            current = self.current_version()
+            older = [v for v in self.list_versions() if current is None or v < current]
+            if not older:
+                raise ValueError("No previous model version to roll back to")
+            version = older[-1]
+        return self.promote(version)
+
+    def _cleanup(self, current: str):
+        versions = self.list_versions()
+        stale = versions[:max(0, len(versions) - self.keep_versions)]
+        for version in stale:
+            if version != current:
+                shutil.rmtree(self._version_dir(version), ignore_errors=True)
+
+    def load_current(self) -> Optional[Dict]:
+        """
+        Bundle của version hiện tại (kèm "version", "manifest"), cache trong process
+        tới khi CURRENT đổi (kể cả khi process khác promote).
+        """
+        version = self.current_version()
+        if not version:
+            return None
+        if self._loaded_key == version:
+            return self._loaded
+        with self._lock:
+            if self._loaded_key != version:
+                # Import muộn (joblib, sklearn khi unpickle model): chỉ khi cần model lần đầu
+                import joblib
+                with MODEL_LOAD_DURATION.time():
+                    bundle = joblib.load(os.path.join(self._version_dir(version), BUNDLE_FILE))
+                bundle["version"] = version
+                bundle["manifest"] = self.manifest(version)
+                self._loaded = bundle
+                self._loaded_key = version
+        return self._loaded
@@ -0,0 +1,103 @@
+"""
+Prediction cache - LRU + TTL cho kết quả /predict
+
+Với cùng (tỉnh, loại thiên tai, số người) và cùng version model, kết quả chỉ đổi khi
+model được train lại hoặc dữ liệu lịch sử thay đổi: version nằm trong key, cache bị
+xóa khi promote, TTL giới hạn độ cũ so với dữ liệu lịch sử (dùng cho heuristic).
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+DEFAULT_MAX_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+DEFAULT_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL", "600"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(value: Optional[str]) -> Optional[str]:
+    """NFC + gom khoảng trắng; giữ hoa/thường vì heuristic tra loại thiên tai theo đúng tên"""
+    if value is None:
+        return None
+    value = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", value)).strip()
+    return value or None
+
+
+def prediction_key(
+    tinh_thanh: Optional[str],
+    loai_thien_tai: Optional[str],
+    so_nguoi: Optional[int],
+    model_version: Optional[str],
+) -> Tuple:
+    return (normalize_text(tinh_thanh), normalize_text(loai_thien_tai), so_nguoi, model_version)
+
+
+class PredictionCache:
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """ttl: số giây sống riêng cho entry này (mặc định ttl_seconds)"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl_seconds if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys: Iterable[Hashable]) -> List[Optional[Any]]:
+        """Nhiều get trong một lần gọi (một round trip khi cache nằm ở process khác)"""
+        return [self.get(key) for key in keys]
+
+    def put_many(self, items: Iterable[Tuple[Hashable, Any]], ttl: Optional[float] = None):
+        for key, value in items:
+            self.put(key, value, ttl=ttl)
+
+    def invalidate(self, *_):
+        """Xóa toàn bộ (gọi khi promote / rollback model)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
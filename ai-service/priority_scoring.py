@@ -0,0 +1,189 @@
+"""
+Priority scoring - tính diem_uu_tien (0-100) cho các yêu cầu đang mở theo lô bằng NumPy
+
+Thang điểm giống RequestWorkflowService.calculatePriorityScore / prisma/seed.ts:
+độ khẩn cấp + số người + loại yêu cầu + thời gian chờ - khoảng cách tới
+trung tâm còn hàng gần nhất + rủi ro thời tiết hiện tại của tỉnh.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from db import dict_cursor
+from geo import coords_array, nearest_distance_km
+from matching import strip_accents
+
+# Yêu cầu còn cần xử lý; duyệt theo id (keyset) để mỗi lô đọc qua primary key
+OPEN_REQUESTS_QUERY = """
+    SELECT id, do_uu_tien, so_nguoi, loai_yeu_cau, dia_chi, vi_do, kinh_do,
+           diem_uu_tien,
+           EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC' - created_at)) / 3600.0 AS age_hours
+    FROM yeu_cau_cuu_tros
+    WHERE id > %s
+      AND trang_thai IN ('cho_xu_ly', 'dang_xu_ly')
+      AND trang_thai_phe_duyet <> 'tu_choi'
+    ORDER BY id
+    LIMIT %s
+"""
+
+# Trung tâm có ít nhất một nguồn lực sẵn sàng còn hàng
+STOCKED_CENTERS_QUERY = """
+    SELECT tt.vi_do, tt.kinh_do
+    FROM trung_tam_cuu_tros tt
+    WHERE tt.vi_do IS NOT NULL AND tt.kinh_do IS NOT NULL
+      AND EXISTS (
+          SELECT 1 FROM nguon_lucs nl
+          WHERE nl.id_trung_tam = tt.id AND nl.trang_thai = 'san_sang' AND nl.so_luong > 0
+      )
+"""
+
+# Bỏ qua dòng có điểm không đổi để không ghi lại (và không cập nhật index) vô ích
+APPLY_SCORES_SQL = """
+    UPDATE yeu_cau_cuu_tros AS yc
+    SET diem_uu_tien = s.diem_uu_tien
+    FROM unnest(%s::int[], %s::int[]) AS s(id, diem_uu_tien)
+    WHERE yc.id = s.id AND yc.diem_uu_tien IS DISTINCT FROM s.diem_uu_tien
+"""
+
+URGENCY_SCORES = {"khan_cap": 50, "cao": 40, "trung_binh": 25, "thap": 10}
+DEFAULT_URGENCY_SCORE = 10
+
+# (từ khóa đã bỏ dấu, điểm) - khớp từ khóa đầu tiên
+REQUEST_TYPE_SCORES = [
+    ("cuu ho", 20),
+    ("y te", 20),
+    ("thuoc", 18),
+    ("nuoc", 15),
+    ("thuc pham", 15),
+    ("cho o", 12),
+    ("quan ao", 10),
+]
+DEFAULT_TYPE_SCORE = 8
+
+WEATHER_RISK_SCORES = {"critical": 15, "high": 15, "medium": 5}
+
+# Khoảng cách coi như rất xa khi không biết tọa độ (giống giá trị 999 bên Next.js)
+UNKNOWN_DISTANCE_KM = 999.0
+
+
+def _request_type_score(loai_yeu_cau: str) -> int:
+    normalized = strip_accents(loai_yeu_cau or "")
+    for keyword, score in REQUEST_TYPE_SCORES:
+        if keyword in normalized:
+            return score
+    return DEFAULT_TYPE_SCORE
+
+
+def _lookup(values: List[str], fn) -> np.ndarray:
+    # Tính fn một lần cho mỗi giá trị distinct rồi trải ra cả mảng
+    uniques, codes = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+    return np.array([fn(v) for v in uniques], dtype=np.float64)[codes]
+
+
+def compute_scores(
+    rows: List[Dict],
+    centers: Optional[np.ndarray] = None,
+    risks: Optional[Dict[str, Dict]] = None,
+) -> np.ndarray:
+    """diem_uu_tien (int 0-100) cho từng dòng, tính vector hóa trên cả lô"""
+    n = len(rows)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    risks = risks or {}
+
+    # 1. Độ khẩn cấp
+    score = _lookup([r["do_uu_tien"] or "" for r in rows],
+                    lambda v: URGENCY_SCORES.get(v, DEFAULT_URGENCY_SCORE))
+
+    # 2. Số người ảnh hưởng
+    people = np.array([r["so_nguoi"] or 0 for r in rows], dtype=np.float64)
+    score += np.select(
+        [people >= 100, people >= 50, people >= 20, people >= 10],
+        [30, 25, 20, 15],
+        default=10,
+    )
+
+    # 3. Loại yêu cầu
+    score += _lookup([r["loai_yeu_cau"] or "" for r in rows], _request_type_score)
+
+    # 4. Thời gian chờ: +1 điểm mỗi 2 giờ, tối đa 10
+    age_hours = np.array([float(r["age_hours"] or 0) for r in rows], dtype=np.float64)
+    score += np.minimum(np.floor(np.maximum(age_hours, 0) / 2), 10)
+
+    # 5. Khoảng cách tới trung tâm còn hàng gần nhất
+    if centers is not None and len(centers):
+        distance = nearest_distance_km(coords_array(rows), centers)
+        distance = np.where(np.isnan(distance), UNKNOWN_DISTANCE_KM, distance)
+    else:
+        distance = np.full(n, UNKNOWN_DISTANCE_KM)
+    score -= np.select([distance > 50, distance > 20], [10, 5], default=0)
+
+    # 6. Rủi ro thời tiết hiện tại của tỉnh
+    if risks:
+        from weather_service import extract_province
+        province_bonus = {
+            province: WEATHER_RISK_SCORES.get(risk.get("risk_level"), 0)
+            for province, risk in risks.items()
+        }
+        score += _lookup([r["dia_chi"] or "" for r in rows],
+                         lambda v: province_bonus.get(extract_province(v), 0))
+
+    return np.clip(score, 0, 100).astype(np.int64)
+
+
+def load_stocked_centers(conn) -> np.ndarray:
+    cursor = dict_cursor(conn)
+    cursor.execute(STOCKED_CENTERS_QUERY)
+    centers = coords_array(cursor.fetchall())
+    cursor.close()
+    return centers
+
+
+def _latest_risks() -> Dict[str, Dict]:
+    """Rủi ro thời tiết theo tỉnh (rỗng nếu không có weather_service)"""
+    try:
+        from weather_service import get_latest_risks
+    except ImportError:
+        return {}
+    return get_latest_risks()
+
+
+def run_priority_scoring(conn, batch_size: int = 5000) -> Dict:
+    """Tính lại diem_uu_tien cho toàn bộ yêu cầu đang mở, mỗi lô một UPDATE + commit"""
+    started = time.perf_counter()
+    centers = load_stocked_centers(conn)
+    risks = _latest_risks()
+
+    scored = 0
+    updated = 0
+    last_id = 0
+    while True:
+        cursor = dict_cursor(conn)
+        cursor.execute(OPEN_REQUESTS_QUERY, (last_id, batch_size))
+        rows = cursor.fetchall()
+        cursor.close()
+        if not rows:
+            break
+
+        scores = compute_scores(rows, centers, risks)
+        cursor = conn.cursor()
+        cursor.execute(APPLY_SCORES_SQL, ([r["id"] for r in rows], scores.tolist()))
+        updated += cursor.rowcount
+        cursor.close()
+        conn.commit()
+
+        scored += len(rows)
+        last_id = rows[-1]["id"]
+        if len(rows) < batch_size:
+            break
+
+    elapsed = time.perf_counter() - started
+    return {
+        "scored": scored,
+        "updated": updated,
+        "stocked_centers": len(centers),
+        "provinces_with_weather": len(risks),
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
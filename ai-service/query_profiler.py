@@ -0,0 +1,249 @@
+"""
+Query profiler - slow-query log và EXPLAIN cho các query qua dict_cursor (bật bằng QUERY_PROFILER_ENABLED)
+
+Mỗi query ghi lại: dạng SQL (gom khoảng trắng, literal thay bằng ?), hàm gọi (_get_*),
+số tham số / số phần tử của tham số mảng, thời gian, số dòng trả về, và ngữ cảnh
+(query_type, filter của /chat/query). Query chậm hơn QUERY_SLOW_MS được lưu vào
+bộ nhớ + file JSONL (QUERY_PROFILE_FILE); với SELECT, một thread nền chạy lại
+EXPLAIN (ANALYZE, BUFFERS) trên kết nối riêng trong transaction bị rollback, mỗi dạng
+SQL tối đa một lần mỗi QUERY_EXPLAIN_INTERVAL giây. Xem qua GET /debug/slow-queries.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER_ENABLED", "false").lower() == "true"
+QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", "200"))
+QUERY_EXPLAIN_INTERVAL = float(os.getenv("QUERY_EXPLAIN_INTERVAL", "300"))
+QUERY_PROFILE_FILE = os.getenv("QUERY_PROFILE_FILE", "slow_queries.jsonl")
+QUERY_PROFILE_MAX_ENTRIES = int(os.getenv("QUERY_PROFILE_MAX_ENTRIES", "200"))
+# Số dạng SQL tối đa giữ thống kê tổng hợp
+MAX_FINGERPRINTS = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+_context: contextvars.ContextVar = contextvars.ContextVar("query_profile_context", default=None)
+
+
+def sql_shape(query: str) -> str:
+    """SQL không phụ thuộc giá trị: gom khoảng trắng, thay literal bằng ?"""
+    shape = _STRING_LITERAL.sub("?", query)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def fingerprint(shape: str) -> str:
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+
+
+def param_sizes(params) -> List[int]:
+    """Số phần tử của từng tham số (1 với giá trị đơn, len() với list / tuple mảng)"""
+    if params is None:
+        return []
+    values = params.values() if isinstance(params, dict) else params
+    return [len(v) if isinstance(v, (list, tuple, set)) else 1 for v in values]
+
+
+@contextlib.contextmanager
+def query_context(**tags):
+    """Gắn tag (query_type, filters, ...) cho mọi query chạy trong khối"""
+    token = _context.set(tags)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class QueryProfiler:
+    def __init__(
+        self,
+        slow_ms: float = QUERY_SLOW_MS,
+        explain_interval: float = QUERY_EXPLAIN_INTERVAL,
+        store_path: Optional[str] = QUERY_PROFILE_FILE,
+        max_entries: int = QUERY_PROFILE_MAX_ENTRIES,
+    ):
+        self.slow_ms = slow_ms
+        self.explain_interval = explain_interval
+        self.store_path = store_path
+        self._slow = deque(maxlen=max_entries)
+        self._stats: "OrderedDict[str, Dict]" = OrderedDict()
+        self._last_explain: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._explain_queue: queue.Queue = queue.Queue(maxsize=100)
+        self._worker: Optional[threading.Thread] = None
+
+    def record(self, query: str, params, duration_ms: float, rows: int, caller: str):
+        shape = sql_shape(query)
+        fp = fingerprint(shape)
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                stats = {"fingerprint": fp, "caller": caller, "sql": shape,
+                         "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "slow": 0}
+                self._stats[fp] = stats
+                while len(self._stats) > MAX_FINGERPRINTS:
+                    self._stats.popitem(last=False)
+            stats["calls"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["rows"] += max(rows, 0)
+
+            if duration_ms < self.slow_ms:
+                return
+            stats["slow"] += 1
+            entry = {
+                "ts": datetime.now().isoformat(),
+                "fingerprint": fp,
+                "caller": caller,
+                "context": _context.get(),
+                "sql": shape,
+                "param_count": len(param_sizes(params)),
+                "param_sizes": param_sizes(params),
+                "duration_ms": round(duration_ms, 2),
+                "rows": rows,
+                "plan": None,
+            }
+            self._slow.append(entry)
+            explain = (
+                _EXPLAINABLE.match(query) is not None
+                and time.monotonic() - self._last_explain.get(fp, float("-inf")) >= self.explain_interval
+            )
+            if explain:
+                self._last_explain[fp] = time.monotonic()
+
+        logger.warning("Slow query in %s: %.0fms, %d rows", caller, duration_ms, rows,
+                       extra={"fingerprint": fp, "context": entry["context"]})
+        if explain:
+            self._ensure_worker()
+            try:
+                self._explain_queue.put_nowait((entry, query, params))
+                return
+            except queue.Full:
+                pass
+        self._persist(entry)
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._explain_loop, name="query-explain", daemon=True)
+            self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            entry, query, params = self._explain_queue.get()
+            try:
+                entry["plan"] = self._explain(query, params)
+            except Exception as e:
+                entry["plan_error"] = str(e)
+            self._persist(entry)
+
+    def _explain(self, query: str, params):
+        # Import muộn: db import module này
+        from db import get_db_connection
+
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Cannot connect to database for EXPLAIN")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0]
+            cursor.close()
+            return json.loads(plan) if isinstance(plan, str) else plan
+        finally:
+            # ANALYZE chạy thật câu query: không để lại gì
+            conn.rollback()
+            conn.close()
+
+    def _persist(self, entry: Dict):
+        if not self.store_path:
+            return
+        try:
+            with self._file_lock, open(self.store_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.warning("Cannot write slow query log %s: %s", self.store_path, e)
+
+    def slow_queries(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self._slow)[-limit:][::-1]
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Dạng SQL tốn nhiều thời gian nhất (tổng)"""
+        with self._lock:
+            rows = [dict(s) for s in self._stats.values()]
+        rows.sort(key=lambda s: s["total_ms"], reverse=True)
+        for s in rows:
+            s["mean_ms"] = round(s["total_ms"] / s["calls"], 2)
+            s["total_ms"] = round(s["total_ms"], 2)
+            s["max_ms"] = round(s["max_ms"], 2)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._slow.clear()
+            self._stats.clear()
+            self._last_explain.clear()
+
+
+class ProfiledCursor:
+    """Bọc cursor: đo execute(), phần còn lại chuyển thẳng xuống cursor thật"""
+
+    def __init__(self, cursor, profiler: QueryProfiler):
+        self._cursor = cursor
+        self._profiler = profiler
+
+    def execute(self, query, params=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                self._profiler.record(str(query), params, duration_ms, self._cursor.rowcount,
+                                      sys._getframe(1).f_code.co_name)
+            except Exception as e:
+                logger.debug("Query profiler error: %s", e)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+
+profiler = QueryProfiler()
+
+
+def profile_cursor(cursor):
+    """Bọc cursor khi profiler được bật, ngược lại trả nguyên cursor"""
+    if not QUERY_PROFILER_ENABLED:
+        return cursor
+    return ProfiledCursor(cursor, profiler)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Process scheduler riêng cho chế độ nhiều worker: chạy các job định kỳ (check thời tiết,
+tính trước dự báo, chấm điểm ưu tiên, auto-matching) đúng một lần cho cả service.
+gunicorn.conf.py tự chạy process này; có thể chạy tay: python scheduler_service.py
+"""
+
+import logging
+import signal
+import threading
+
+import main
+
+logger = logging.getLogger("scheduler_service")
+
+
+def run():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    # Dự báo tính trước ghi vào cache dùng chung để worker HTTP đọc được
+    main.use_shared_state()
+    if main.FORECAST_PERSIST_ENABLED:
+        main.forecast_writer.start()
+    main.start_scheduler()
+    logger.info("Scheduler process started")
+    try:
+        stop.wait()
+    finally:
+        main.stop_scheduler()
+        if main.FORECAST_PERSIST_ENABLED:
+            main.forecast_writer.stop()
+        logger.info("Scheduler process stopped")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Kiểm tra các query của chatbot/ai-service có dùng đúng index hay không
+Chạy: python scripts/check_query_plans.py  (từ thư mục ai-service, cần DATABASE_URL)
+
+Script gọi trực tiếp các handler _get_* trong main.py với một cursor "EXPLAIN",
+nên luôn kiểm tra đúng câu SQL mà service đang chạy. Seq scan bị tắt trong
+transaction để bảng nhỏ (dữ liệu seed) vẫn cho thấy index có dùng được hay không.
+Exit code khác 0 nếu có query không dùng index mong đợi.
+"""
+
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Thêm thư mục ai-service vào path để import main
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import main  # noqa: E402
+
+
+class ExplainCursor:
+    """Cursor giả: chạy EXPLAIN thay cho query và ghi lại plan"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.plans = []
+
+    def execute(self, query, params=None):
+        self._cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        row = self._cursor.fetchone()
+        plan = row["QUERY PLAN"] if isinstance(row, dict) else row[0]
+        self.plans.append(plan)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return defaultdict(int)
+
+    def close(self):
+        pass
+
+
+def _index_names(node, found=None):
+    """Lấy tất cả "Index Name" trong cây plan JSON"""
+    if found is None:
+        found = set()
+    if isinstance(node, dict):
+        if "Index Name" in node:
+            found.add(node["Index Name"])
+        for value in node.values():
+            _index_names(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _index_names(value, found)
+    return found
+
+
+# Các query chỉ có ở chatbot (actions.py), không đi qua /chat/query
+def _chatbot_user_requests(cursor):
+    cursor.execute("""
+        SELECT id, loai_yeu_cau, mo_ta, so_nguoi, trang_thai, created_at, dia_chi, trang_thai_phe_duyet
+        FROM yeu_cau_cuu_tros
+        WHERE id_nguoi_dung = %s
+        ORDER BY created_at DESC
+        LIMIT 50
+    """, (1,))
+
+
+def _chatbot_notifications(cursor):
+    cursor.execute("""
+        SELECT tieu_de, noi_dung, loai_thong_bao, created_at, da_doc
+        FROM thong_baos
+        WHERE id_nguoi_nhan = %s
+        ORDER BY created_at DESC
+        LIMIT 20
+    """, (1,))
+
+
+# (tên, hàm chạy query, index bắt buộc phải có, nhóm index chỉ cần có một)
+CHECKS = [
+    ("pending_requests", lambda c: main._get_pending_requests(c, 20),
+     ["yeu_cau_cuu_tros_phe_duyet_diem_uu_tien_idx"], []),
+    ("urgent_requests", lambda c: main._get_urgent_requests(c, 20),
+     ["yeu_cau_cuu_tros_khan_cap_idx"], []),
+    ("requests", lambda c: main._get_requests(c, {}, 20),
+     ["yeu_cau_cuu_tros_diem_uu_tien_created_at_idx"], []),
+    ("requests_by_type", lambda c: main._get_requests(c, {"request_type": "thực phẩm"}, 20),
+     [], ["yeu_cau_cuu_tros_loai_yeu_cau_trgm_idx", "yeu_cau_cuu_tros_diem_uu_tien_created_at_idx"]),
+    ("resources_by_type", lambda c: main._get_resources(c, {"resource_type": "thực phẩm"}, 20),
+     [], ["nguon_lucs_loai_trgm_idx", "nguon_lucs_ten_nguon_luc_trgm_idx"]),
+    ("centers_by_location", lambda c: main._get_centers(c, {"location": "hà nội"}, 20),
+     [], ["trung_tam_cuu_tros_dia_chi_trgm_idx", "trung_tam_cuu_tros_ten_trung_tam_trgm_idx"]),
+    ("low_stock", lambda c: main._get_low_stock_resources_from_db(c, 20),
+     ["nguon_lucs_ton_kho_thap_idx"], []),
+    ("distributions", lambda c: main._get_distributions(c, {}, 20),
+     ["phan_phois_thoi_gian_xuat_id_idx"], []),
+    ("distributions_by_status", lambda c: main._get_distributions(c, {"status": "hoan_thanh"}, 20),
+     ["phan_phois_trang_thai_thoi_gian_xuat_idx"], []),
+    ("recent_activities", lambda c: main._get_recent_activities(c, 15),
+     ["yeu_cau_cuu_tros_created_at_idx", "phan_phois_thoi_gian_hoat_dong_idx"], []),
+    ("ai_predictions", lambda c: main._get_ai_predictions(c, 10),
+     ["du_bao_ais_ngay_du_bao_created_at_idx"], []),
+    ("volunteers", lambda c: main._get_volunteers(c, 20),
+     ["nguoi_dungs_vai_tro_idx"], []),
+    ("chatbot_user_requests", _chatbot_user_requests,
+     ["yeu_cau_cuu_tros_id_nguoi_dung_created_at_idx"], []),
+    ("chatbot_notifications", _chatbot_notifications,
+     ["thong_baos_id_nguoi_nhan_created_at_idx"], []),
+]
+
+
+def run_checks(conn):
+    cursor = main.dict_cursor(conn)
+    cursor.execute("SET LOCAL enable_seqscan = off")
+
+    failures = []
+    for name, run, required, any_of in CHECKS:
+        explain_cursor = ExplainCursor(cursor)
+        try:
+            run(explain_cursor)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            failures.append(name)
+            conn.rollback()
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            continue
+
+        used = _index_names(explain_cursor.plans)
+        missing = [idx for idx in required if idx not in used]
+        if any_of and not used.intersection(any_of):
+            missing.append(" | ".join(any_of))
+
+        if missing:
+            print(f"❌ {name}: thiếu index {', '.join(missing)} (plan dùng: {', '.join(sorted(used)) or 'không có index'})")
+            failures.append(name)
+        else:
+            print(f"✅ {name}: {', '.join(sorted(used))}")
+
+    cursor.close()
+    return failures
+
+
+def main_cli():
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL not set")
+        return 2
+
+    conn = main.get_db_connection()
+    if not conn:
+        return 2
+
+    try:
+        failures = run_checks(conn)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print(f"\n{len(CHECKS) - len(failures)}/{len(CHECKS)} query dùng đúng index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+"""
+Sinh dữ liệu giả lập quy mô lớn để đo hiệu năng (heuristic, train model, matching, chat query)
+Chạy: python scripts/generate_synthetic_data.py --requests 1000000 [--truncate]  (từ thư mục ai-service, cần DATABASE_URL)
+
+Nạp nguoi_dungs, trung_tam_cuu_tros, nguon_lucs, yeu_cau_cuu_tros (địa chỉ gắn tên tỉnh + tọa độ
+quanh tỉnh đó), phan_phois và thong_baos bằng COPY, sinh theo từng lô nên bộ nhớ không tăng theo
+quy mô (10k - 10M dòng). Cùng --seed và --end-date cho ra cùng dữ liệu. Id được gán tường minh
+(tiếp nối id lớn nhất hiện có) để khóa ngoại khớp mà không cần đọc lại, sequence được cập nhật sau đó.
+
+Chỉ dùng cho database thử nghiệm: trigger NOTIFY (low-stock, trung tâm) bị tắt trong lúc nạp,
+nên cần restart ai-service sau khi chạy để các index trong bộ nhớ nạp lại.
+"""
+
+import argparse
+import io
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Thêm thư mục ai-service vào path để import db
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db import PSYCOPG_VERSION, get_db_connection  # noqa: E402
+from weather_service import VIETNAM_PROVINCES_COORDS  # noqa: E402
+
+CHUNK_SIZE = 50_000
+
+# Trigger phát NOTIFY cho từng dòng: tắt khi nạp hàng loạt
+NOTIFY_TRIGGERS = [
+    ("nguon_lucs", "nguon_lucs_ton_kho_notify"),
+    ("trung_tam_cuu_tros", "trung_tam_cuu_tros_notify"),
+]
+
+# Thứ tự nạp (bảng sau tham chiếu bảng trước); TRUNCATE theo thứ tự ngược lại
+TABLES = ["nguoi_dungs", "trung_tam_cuu_tros", "nguon_lucs", "yeu_cau_cuu_tros", "phan_phois", "thong_baos"]
+
+PROVINCES = sorted(VIETNAM_PROVINCES_COORDS)
+PROVINCE_LAT = np.array([VIETNAM_PROVINCES_COORDS[p]["lat"] for p in PROVINCES])
+PROVINCE_LON = np.array([VIETNAM_PROVINCES_COORDS[p]["lon"] for p in PROVINCES])
+
+# Từ vựng giống prisma/seed.ts
+FIRST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Phan", "Vũ", "Võ", "Đặng", "Bùi",
+               "Đỗ", "Hồ", "Ngô", "Dương", "Lý", "Đinh", "Đào", "Tôn", "Thái", "Lương"]
+GIVEN_NAMES = ["Văn", "Thị", "Minh", "Hồng", "Thanh", "Thu", "Linh", "Anh", "Hương", "Mai",
+               "Lan", "Hoa", "Nga", "Tuyết", "Hạnh", "Dung", "Phương", "Thảo", "Yến", "Trang"]
+STREETS = ["Lê Lợi", "Trần Phú", "Nguyễn Huệ", "Quang Trung", "Hùng Vương", "Lý Thường Kiệt",
+           "Nguyễn Văn Cừ", "Bạch Đằng", "Hai Bà Trưng", "Điện Biên Phủ"]
+RESOURCE_TYPES = [
+    ("Gạo", "Thực phẩm", "kg", 1000, 50000),
+    ("Mì gói", "Thực phẩm", "gói", 5000, 100000),
+    ("Nước uống đóng chai", "Nước uống", "chai", 2000, 20000),
+    ("Nước lọc", "Nước uống", "lít", 5000, 50000),
+    ("Thuốc cơ bản", "Y tế", "hộp", 500, 5000),
+    ("Khẩu trang y tế", "Y tế", "cái", 2000, 50000),
+    ("Băng gạc", "Y tế", "cuộn", 100, 2000),
+    ("Lều bạt", "Chỗ ở", "cái", 50, 1000),
+    ("Chăn màn", "Chỗ ở", "bộ", 200, 5000),
+    ("Quần áo", "Quần áo", "bộ", 500, 10000),
+    ("Giày dép", "Quần áo", "đôi", 200, 5000),
+    ("Pin dự phòng", "Điện tử", "cái", 100, 2000),
+    ("Đèn pin", "Điện tử", "cái", 200, 5000),
+    ("Bình gas mini", "Năng lượng", "bình", 50, 500),
+    ("Xăng dự phòng", "Năng lượng", "lít", 100, 2000),
+]
+REQUEST_TYPES = ["Thực phẩm khẩn cấp", "Nước uống và thuốc men", "Chỗ ở tạm thời", "Hỗ trợ y tế",
+                 "Quần áo và đồ dùng cá nhân", "Năng lượng và điện", "Phương tiện di chuyển",
+                 "Thiết bị cứu hộ", "Thực phẩm dinh dưỡng", "Vật tư y tế chuyên dụng"]
+# Mô tả có từ khóa thiên tai để features.detect_disaster_type nhận ra
+DISASTERS = ["Lũ lụt", "Bão", "Hạn hán", "Sạt lở đất", "Động đất", "Cháy rừng"]
+DESCRIPTIONS = ["Khu vực bị cô lập", "Nhà cửa bị hư hỏng nặng", "Có người bị thương", "Thiếu nước sạch",
+                "Mất điện kéo dài", "Đường sá bị cắt", "Cần hỗ trợ khẩn cấp", "Dân số đông cần hỗ trợ"]
+REJECT_REASONS = ["Không đủ thông tin", "Yêu cầu không hợp lệ", "Đã có hỗ trợ từ nguồn khác",
+                  "Vùng không thuộc phạm vi hỗ trợ", "Cần bổ sung giấy tờ chứng minh"]
+
+# (giá trị, xác suất)
+ROLES = (["admin", "tinh_nguyen_vien", "nguoi_dan"], [0.01, 0.2, 0.79])
+URGENCY = (["khan_cap", "cao", "trung_binh", "thap"], [0.1, 0.25, 0.4, 0.25])
+APPROVAL = (["cho_phe_duyet", "da_phe_duyet", "tu_choi"], [0.3, 0.6, 0.1])
+RESOURCE_STATUS = (["san_sang", "het_hang", "bao_tri"], [0.75, 0.15, 0.1])
+DISTRIBUTION_STATUS = (["dang_chuan_bi", "dang_van_chuyen", "dang_giao", "hoan_thanh", "huy_bo"],
+                       [0.1, 0.1, 0.1, 0.6, 0.1])
+NOTIFICATION_TYPES = (["yeu_cau_moi", "phe_duyet", "tu_choi", "phan_phoi", "khan_cap"],
+                      [0.3, 0.3, 0.05, 0.25, 0.1])
+NOTIFICATION_TITLES = {
+    "yeu_cau_moi": "🆘 Yêu cầu cứu trợ mới",
+    "phe_duyet": "✅ Yêu cầu cứu trợ được phê duyệt",
+    "tu_choi": "❌ Yêu cầu cứu trợ bị từ chối",
+    "phan_phoi": "🚚 Cập nhật phân phối",
+    "khan_cap": "🚨 CẢNH BÁO KHẨN CẤP",
+}
+
+# Không đăng nhập được bằng mật khẩu này (không phải bcrypt hash hợp lệ)
+PASSWORD_PLACEHOLDER = "synthetic-user-no-login"
+
+
+def _choice(rng, options, n):
+    values, p = options
+    return np.array(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+
+def _format(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, (bool, np.bool_)):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (float, np.floating)):
+        return "\\N" if np.isnan(value) else f"{value:.8f}"
+    return str(value)
+
+
+def _tsv(columns) -> str:
+    """Text format của COPY từ các cột (cùng độ dài); dữ liệu sinh ra không chứa tab / xuống dòng"""
+    buffer = io.StringIO()
+    for row in zip(*columns):
+        buffer.write("\t".join(_format(v) for v in row))
+        buffer.write("\n")
+    return buffer.getvalue()
+
+
+def _timestamps(rng, n, end: datetime, days: int) -> np.ndarray:
+    seconds = rng.integers(0, days * 86400, size=n)
+    return np.array([end - timedelta(seconds=int(s)) for s in seconds], dtype=object)
+
+
+def _phones(rng, n):
+    return np.array([f"09{d:08d}" for d in rng.integers(0, 10**8, size=n)], dtype=object)
+
+
+def _names(rng, n):
+    first = rng.integers(0, len(FIRST_NAMES), size=n)
+    middle = rng.integers(0, len(GIVEN_NAMES), size=n)
+    last = rng.integers(0, len(GIVEN_NAMES), size=n)
+    return np.array([f"{FIRST_NAMES[a]} {GIVEN_NAMES[b]} {GIVEN_NAMES[c]}"
+                     for a, b, c in zip(first, middle, last)], dtype=object)
+
+
+def _place(rng, n, spread=0.15):
+    """(tỉnh, địa chỉ có tên tỉnh, vĩ độ, kinh độ) quanh tâm tỉnh"""
+    province = rng.integers(0, len(PROVINCES), size=n)
+    lat = PROVINCE_LAT[province] + rng.normal(0, spread, size=n)
+    lon = PROVINCE_LON[province] + rng.normal(0, spread, size=n)
+    numbers = rng.integers(1, 999, size=n)
+    streets = rng.integers(0, len(STREETS), size=n)
+    dia_chi = np.array([f"{num} {STREETS[s]}, {PROVINCES[p]}"
+                        for num, s, p in zip(numbers, streets, province)], dtype=object)
+    return province, dia_chi, np.round(lat, 6), np.round(lon, 6)
+
+
+def gen_users(rng, ids, ctx):
+    n = len(ids)
+    _, _, lat, lon = _place(rng, n)
+    created = _timestamps(rng, n, ctx["end"], ctx["days"])
+    roles = _choice(rng, ROLES, n)
+    # Luôn có ít nhất một admin / tình nguyện viên để các bảng sau tham chiếu
+    if ids[0] == ctx["first_id"]["nguoi_dungs"]:
+        roles[0] = "admin"
+        roles[1 % n] = "tinh_nguyen_vien"
+    return [
+        ids, _names(rng, n),
+        np.array([f"synthetic{i}@relieflink.test" for i in ids], dtype=object),
+        _phones(rng, n), np.full(n, PASSWORD_PLACEHOLDER, dtype=object), roles, lat, lon,
+        rng.random(n) > 0.15, rng.random(n) > 0.25, rng.random(n) > 0.65, created, created,
+    ]
+
+
+def gen_centers(rng, ids, ctx):
+    n = len(ids)
+    province, dia_chi, lat, lon = _place(rng, n, spread=0.3)
+    names = np.array([f"Trung tâm Cứu trợ {PROVINCES[p]} #{i}" for p, i in zip(province, ids)], dtype=object)
+    return [ids, names, dia_chi, lat, lon, _names(rng, n), _phones(rng, n),
+            _timestamps(rng, n, ctx["end"], ctx["days"])]
+
+
+def gen_resources(rng, ids, ctx):
+    n = len(ids)
+    kind = rng.integers(0, len(RESOURCE_TYPES), size=n)
+    low = np.array([RESOURCE_TYPES[k][3] for k in kind])
+    high = np.array([RESOURCE_TYPES[k][4] for k in kind])
+    so_luong = (low + rng.random(n) * (high - low)).astype(np.int64)
+    # ~10% dưới ngưỡng để low-stock có dữ liệu
+    so_luong = np.where(rng.random(n) < 0.1, (so_luong * 0.05).astype(np.int64), so_luong)
+    toi_thieu = np.maximum(1, (low * 0.5).astype(np.int64))
+    return [
+        ids,
+        np.array([RESOURCE_TYPES[k][0] for k in kind], dtype=object),
+        np.array([RESOURCE_TYPES[k][1] for k in kind], dtype=object),
+        so_luong,
+        np.array([RESOURCE_TYPES[k][2] for k in kind], dtype=object),
+        ctx["ids"]["trung_tam_cuu_tros"][rng.integers(0, len(ctx["ids"]["trung_tam_cuu_tros"]), size=n)],
+        toi_thieu,
+        _choice(rng, RESOURCE_STATUS, n),
+        _timestamps(rng, n, ctx["end"], ctx["days"]),
+    ]
+
+
+def gen_requests(rng, ids, ctx):
+    n = len(ids)
+    _, dia_chi, lat, lon = _place(rng, n)
+    citizens, admins = ctx["citizen_ids"], ctx["admin_ids"]
+    anonymous = rng.random(n) < 0.1
+    id_nguoi_dung = np.where(anonymous, None, citizens[rng.integers(0, len(citizens), size=n)])
+    so_nguoi = np.minimum(rng.geometric(0.03, size=n), 2000)
+    urgency = _choice(rng, URGENCY, n)
+    approval = _choice(rng, APPROVAL, n)
+    approved = approval == "da_phe_duyet"
+    rejected = approval == "tu_choi"
+    processed = approved | rejected
+    trang_thai = np.where(rejected, "bi_tu_choi", np.where(approved, "da_phe_duyet", "cho_xu_ly"))
+
+    # Cùng thang với diem_uu_tien_mac_dinh (độ khẩn cấp + số người)
+    urgency_score = np.select([urgency == "khan_cap", urgency == "cao", urgency == "trung_binh"], [50, 40, 25], 10)
+    people_score = np.select([so_nguoi >= 100, so_nguoi >= 50, so_nguoi >= 20, so_nguoi >= 10], [30, 25, 20, 15], 10)
+
+    disasters = rng.integers(0, len(DISASTERS), size=n)
+    descriptions = rng.integers(0, len(DESCRIPTIONS), size=n)
+    mo_ta = np.array([f"{DISASTERS[d]}: {DESCRIPTIONS[k]}" for d, k in zip(disasters, descriptions)], dtype=object)
+    created = _timestamps(rng, n, ctx["end"], ctx["days"])
+    approved_at = np.array([c + timedelta(hours=float(h)) if p else None
+                            for c, h, p in zip(created, rng.exponential(12, size=n), processed)], dtype=object)
+    contact_names = _names(rng, n)
+    return [
+        ids, id_nguoi_dung,
+        np.array(REQUEST_TYPES, dtype=object)[rng.integers(0, len(REQUEST_TYPES), size=n)],
+        mo_ta, dia_chi, so_nguoi, urgency, lat, lon, trang_thai,
+        np.where(anonymous, contact_names, None),
+        np.where(anonymous, _phones(rng, n), None),
+        np.full(n, None, dtype=object),
+        approval,
+        np.where(processed, admins[rng.integers(0, len(admins), size=n)], None),
+        approved_at,
+        np.where(rejected, np.array(REJECT_REASONS, dtype=object)[rng.integers(0, len(REJECT_REASONS), size=n)], None),
+        np.minimum(100, urgency_score + people_score),
+        np.full(n, "chua_match", dtype=object),
+        created, created,
+    ]
+
+
+def gen_distributions(rng, ids, ctx):
+    n = len(ids)
+    requests, resources, volunteers = ctx["request_range"], ctx["ids"]["nguon_lucs"], ctx["volunteer_ids"]
+    status = _choice(rng, DISTRIBUTION_STATUS, n)
+    exported = _timestamps(rng, n, ctx["end"], ctx["days"])
+    delivered = np.array([e + timedelta(hours=float(h)) if s == "hoan_thanh" else None
+                          for e, h, s in zip(exported, rng.exponential(24, size=n), status)], dtype=object)
+    tx = rng.integers(0, 2**63, size=(n, 4), dtype=np.int64)
+    return [
+        ids,
+        rng.integers(requests[0], requests[1] + 1, size=n),
+        resources[rng.integers(0, len(resources), size=n)],
+        volunteers[rng.integers(0, len(volunteers), size=n)],
+        status,
+        np.array(["0x" + "".join(f"{v:016x}" for v in row) for row in tx], dtype=object),
+        exported, delivered,
+    ]
+
+
+def gen_notifications(rng, ids, ctx):
+    n = len(ids)
+    users, admins, requests = ctx["user_range"], ctx["admin_ids"], ctx["request_range"]
+    kind = _choice(rng, NOTIFICATION_TYPES, n)
+    request_ids = rng.integers(requests[0], requests[1] + 1, size=n)
+    return [
+        ids,
+        admins[rng.integers(0, len(admins), size=n)],
+        rng.integers(users[0], users[1] + 1, size=n),
+        np.where(kind == "khan_cap", None, request_ids),
+        kind,
+        np.array([NOTIFICATION_TITLES[k] for k in kind], dtype=object),
+        np.array([f"Thông báo về yêu cầu #{r}" for r in request_ids], dtype=object),
+        rng.random(n) > 0.4, rng.random(n) > 0.2, rng.random(n) > 0.8,
+        _timestamps(rng, n, ctx["end"], ctx["days"]),
+    ]
+
+
+# bảng -> (cột, hàm sinh)
+GENERATORS = {
+    "nguoi_dungs": (
+        ["id", "ho_va_ten", "email", "so_dien_thoai", "mat_khau", "vai_tro", "vi_do", "kinh_do",
+         "nhan_thong_bao", "thong_bao_email", "thong_bao_sms", "created_at", "updated_at"],
+        gen_users,
+    ),
+    "trung_tam_cuu_tros": (
+        ["id", "ten_trung_tam", "dia_chi", "vi_do", "kinh_do", "nguoi_quan_ly", "so_lien_he", "created_at"],
+        gen_centers,
+    ),
+    "nguon_lucs": (
+        ["id", "ten_nguon_luc", "loai", "so_luong", "don_vi", "id_trung_tam", "so_luong_toi_thieu",
+         "trang_thai", "created_at"],
+        gen_resources,
+    ),
+    "yeu_cau_cuu_tros": (
+        ["id", "id_nguoi_dung", "loai_yeu_cau", "mo_ta", "dia_chi", "so_nguoi", "do_uu_tien", "vi_do", "kinh_do",
+         "trang_thai", "ho_va_ten_lien_he", "so_dien_thoai_lien_he", "email_lien_he", "trang_thai_phe_duyet",
+         "id_nguoi_phe_duyet", "thoi_gian_phe_duyet", "ly_do_tu_choi", "diem_uu_tien", "trang_thai_matching",
+         "created_at", "updated_at"],
+        gen_requests,
+    ),
+    "phan_phois": (
+        ["id", "id_yeu_cau", "id_nguon_luc", "id_tinh_nguyen_vien", "trang_thai", "ma_giao_dich",
+         "thoi_gian_xuat", "thoi_gian_giao"],
+        gen_distributions,
+    ),
+    "thong_baos": (
+        ["id", "id_nguoi_gui", "id_nguoi_nhan", "id_yeu_cau", "loai_thong_bao", "tieu_de", "noi_dung",
+         "da_doc", "da_gui_email", "da_gui_sms", "created_at"],
+        gen_notifications,
+    ),
+}
+
+
+def _copy(cursor, table, columns, data: str):
+    sql = f'COPY "{table}" ({", ".join(columns)}) FROM STDIN'
+    if PSYCOPG_VERSION == 3:
+        with cursor.copy(sql) as copy:
+            copy.write(data)
+    else:
+        cursor.copy_expert(sql, io.StringIO(data))
+
+
+def _next_id(cursor, table) -> int:
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"')
+    return int(cursor.fetchone()[0])
+
+
+def load_table(conn, table, count, seed, ctx) -> int:
+    columns, generator = GENERATORS[table]
+    # Mỗi bảng một luồng ngẫu nhiên riêng: đổi số dòng bảng này không làm đổi dữ liệu bảng khác
+    rng = np.random.default_rng([seed, TABLES.index(table)])
+    cursor = conn.cursor()
+    first_id = _next_id(cursor, table)
+    ctx["first_id"][table] = first_id
+
+    started = time.perf_counter()
+    for start in range(0, count, CHUNK_SIZE):
+        ids = np.arange(first_id + start, first_id + min(start + CHUNK_SIZE, count), dtype=np.int64)
+        _copy(cursor, table, columns, _tsv(generator(rng, ids, ctx)))
+        done = start + len(ids)
+        print(f"\r  {table:20} {done:>12,}/{count:,}", end="", flush=True)
+
+    # Sequence tiếp tục sau id lớn nhất để insert của app không bị trùng khóa
+    cursor.execute(f"""SELECT setval(pg_get_serial_sequence('"{table}"', 'id'), (SELECT MAX(id) FROM "{table}"))""")
+    cursor.close()
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"\r  {table:20} {count:>12,} rows in {elapsed:6.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+    return first_id
+
+
+def _ids_by_role(conn, roles):
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM nguoi_dungs WHERE vai_tro = ANY(%s) ORDER BY id", (roles,))
+    ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+    cursor.close()
+    return ids
+
+
+def _all_ids(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id FROM "{table}" ORDER BY id')
+    ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+    cursor.close()
+    return ids
+
+
+def _set_notify_triggers(conn, enabled: bool):
+    cursor = conn.cursor()
+    for table, trigger in NOTIFY_TRIGGERS:
+        cursor.execute(f'ALTER TABLE "{table}" {"ENABLE" if enabled else "DISABLE"} TRIGGER "{trigger}"')
+    cursor.close()
+    conn.commit()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000, help="số yêu cầu cứu trợ (các bảng khác suy ra từ đây)")
+    parser.add_argument("--users", type=int, help="mặc định requests / 5")
+    parser.add_argument("--centers", type=int, help="mặc định requests / 2000 (tối thiểu 15)")
+    parser.add_argument("--resources-per-center", type=int, default=15)
+    parser.add_argument("--distributions", type=int, help="mặc định requests * 1.5")
+    parser.add_argument("--notifications", type=int, help="mặc định bằng requests")
+    parser.add_argument("--days", type=int, default=365, help="dữ liệu trải trên N ngày trước --end-date")
+    parser.add_argument("--end-date", default=datetime.now().strftime("%Y-%m-%d"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="xóa dữ liệu cũ (kể cả dữ liệu seed) trước khi nạp")
+    args = parser.parse_args()
+
+    counts = {
+        "nguoi_dungs": args.users or max(50, args.requests // 5),
+        "trung_tam_cuu_tros": args.centers or max(15, args.requests // 2000),
+        "yeu_cau_cuu_tros": args.requests,
+        "phan_phois": args.distributions if args.distributions is not None else int(args.requests * 1.5),
+        "thong_baos": args.notifications if args.notifications is not None else args.requests,
+    }
+    counts["nguon_lucs"] = counts["trung_tam_cuu_tros"] * args.resources_per_center
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Cannot connect to database (DATABASE_URL)")
+        return 1
+
+    ctx = {
+        "end": datetime.strptime(args.end_date, "%Y-%m-%d"),
+        "days": args.days,
+        "first_id": {},
+        "ids": {},
+    }
+    print(f"🧪 Generating synthetic data (seed={args.seed}): "
+          + ", ".join(f"{table}={counts[table]:,}" for table in TABLES))
+
+    started = time.perf_counter()
+    try:
+        if args.truncate:
+            cursor = conn.cursor()
+            cursor.execute("TRUNCATE " + ", ".join(f'"{t}"' for t in reversed(TABLES))
+                           + ", nhat_ky_blockchains, du_bao_ais RESTART IDENTITY CASCADE")
+            cursor.close()
+            conn.commit()
+            print("🗑️  Existing data truncated")
+
+        _set_notify_triggers(conn, enabled=False)
+
+        first = load_table(conn, "nguoi_dungs", counts["nguoi_dungs"], args.seed, ctx)
+        ctx["user_range"] = (first, first + counts["nguoi_dungs"] - 1)
+        ctx["admin_ids"] = _ids_by_role(conn, ["admin"])
+        ctx["volunteer_ids"] = _ids_by_role(conn, ["tinh_nguyen_vien"])
+        ctx["citizen_ids"] = _ids_by_role(conn, ["nguoi_dan"])
+
+        load_table(conn, "trung_tam_cuu_tros", counts["trung_tam_cuu_tros"], args.seed, ctx)
+        ctx["ids"]["trung_tam_cuu_tros"] = _all_ids(conn, "trung_tam_cuu_tros")
+        load_table(conn, "nguon_lucs", counts["nguon_lucs"], args.seed, ctx)
+        ctx["ids"]["nguon_lucs"] = _all_ids(conn, "nguon_lucs")
+
+        first = load_table(conn, "yeu_cau_cuu_tros", counts["yeu_cau_cuu_tros"], args.seed, ctx)
+        ctx["request_range"] = (first, first + counts["yeu_cau_cuu_tros"] - 1)
+        load_table(conn, "phan_phois", counts["phan_phois"], args.seed, ctx)
+        load_table(conn, "thong_baos", counts["thong_baos"], args.seed, ctx)
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Load failed: {e}")
+        return 1
+    finally:
+        try:
+            _set_notify_triggers(conn, enabled=True)
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️  Could not re-enable NOTIFY triggers: {e}")
+
+    # Cập nhật thống kê cho planner sau khi nạp hàng loạt
+    conn.autocommit = True
+    cursor = conn.cursor()
+    for table in TABLES:
+        cursor.execute(f'ANALYZE "{table}"')
+    cursor.close()
+    conn.close()
+
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s. Restart ai-service to reload in-memory indexes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
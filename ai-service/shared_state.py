@@ -0,0 +1,107 @@
+"""
+Trạng thái dùng chung giữa các worker khi chạy nhiều process (gunicorn)
+
+Prediction cache, các job train và rủi ro thời tiết theo tỉnh nằm trong một process riêng (multiprocessing manager,
+thay cho một cache service kiểu Redis); worker và process scheduler gọi qua proxy.
+Bật bằng SHARED_STATE_ADDRESS: "host:port" hoặc đường dẫn unix socket. gunicorn.conf.py
+tự start server này trước khi fork worker.
+
+Manager truyền dữ liệu pickle: ai có SHARED_STATE_AUTHKEY là chạy được code trong service. Không có key
+mặc định - gunicorn.conf.py sinh key ngẫu nhiên cho mỗi lần chạy (worker và scheduler nhận qua biến môi
+trường); chế độ TCP bắt buộc đặt key. Unix socket nằm trong thư mục 0700, socket 0600.
+"""
+
+import logging
+import os
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+from typing import Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+SHARED_STATE_ADDRESS = os.getenv("SHARED_STATE_ADDRESS", "")
+SHARED_STATE_AUTHKEY = os.getenv("SHARED_STATE_AUTHKEY", "")
+
+_prediction_cache = None
+_training_jobs = None
+_risk_store = None
+
+
+def _get_prediction_cache():
+    global _prediction_cache
+    if _prediction_cache is None:
+        from prediction_cache import PredictionCache
+        _prediction_cache = PredictionCache()
+    return _prediction_cache
+
+
+def _get_training_jobs(model_dir: str, max_workers: int):
+    global _training_jobs
+    if _training_jobs is None:
+        from log_setup import setup_logging
+        from training_jobs import TrainingJobManager
+        setup_logging()
+        _training_jobs = TrainingJobManager(model_dir, max_workers=max_workers)
+    return _training_jobs
+
+
+def _get_risk_store():
+    global _risk_store
+    if _risk_store is None:
+        from weather_service import RiskStore
+        _risk_store = RiskStore()
+    return _risk_store
+
+
+class SharedStateManager(BaseManager):
+    pass
+
+
+# Mỗi lần gọi trả về cùng một object trong process server
+SharedStateManager.register("prediction_cache", callable=_get_prediction_cache)
+SharedStateManager.register("training_jobs", callable=_get_training_jobs)
+SharedStateManager.register("risk_store", callable=_get_risk_store)
+
+
+def parse_address(value: str) -> Union[str, Tuple[str, int]]:
+    """"127.0.0.1:8765" -> (host, port); còn lại là đường dẫn unix socket"""
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and "/" not in value:
+        return host, int(port)
+    return value
+
+
+def start_server(address: str = SHARED_STATE_ADDRESS, authkey: str = SHARED_STATE_AUTHKEY) -> SharedStateManager:
+    """Start process server (gọi một lần, ở process cha của các worker)"""
+    if not authkey:
+        raise RuntimeError("SHARED_STATE_AUTHKEY is required to start the shared state server")
+    parsed = parse_address(address)
+    if isinstance(parsed, str):
+        socket_dir = os.path.dirname(os.path.abspath(parsed))
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if os.stat(socket_dir).st_mode & 0o077:
+            logger.warning("Shared state socket directory %s is accessible by other users", socket_dir)
+        if os.path.exists(parsed):
+            os.unlink(parsed)  # socket còn lại từ lần chạy trước
+    manager = SharedStateManager(parsed, authkey=authkey.encode())
+    manager.start()
+    if isinstance(parsed, str):
+        os.chmod(parsed, 0o600)
+    logger.info("Shared state server started at %s", address)
+    return manager
+
+
+def connect(address: str = SHARED_STATE_ADDRESS, authkey: str = SHARED_STATE_AUTHKEY) -> Optional[SharedStateManager]:
+    """Kết nối tới server; None nếu không bật hoặc không kết nối được (dùng state riêng của process)"""
+    if not address:
+        return None
+    if not authkey:
+        logger.error("SHARED_STATE_ADDRESS is set without SHARED_STATE_AUTHKEY, using per-process state")
+        return None
+    manager = SharedStateManager(parse_address(address), authkey=authkey.encode())
+    try:
+        manager.connect()
+    except (OSError, AuthenticationError) as e:
+        logger.error("Cannot connect to shared state at %s, using per-process state: %s", address, e)
+        return None
+    return manager
@@ -0,0 +1,336 @@
+"""
+Training pipeline - đọc toàn bộ lịch sử phân phối qua server-side cursor theo từng lô,
+mã hóa feature từng lô và giữ một mẫu ngẫu nhiên có kích thước cố định (reservoir
+sampling) nên bộ nhớ không tăng theo số dòng. Mẫu được lưu lại cùng watermark
+((hoan_thanh_at, id) của phân phối hoàn thành cuối cùng đã đọc) để lần train sau chỉ cần
+đọc các phân phối hoàn thành sau đó.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from db import dict_cursor, named_dict_cursor
+from features import FeatureEncoder, training_row
+from model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+MODEL_TARGETS = ["food", "water", "medicine", "shelter"]
+
+# Mẫu train đã mã hóa + watermark, dùng cho train incremental
+TRAINING_SAMPLE_FILE = "training_sample.npz"
+
+DEFAULT_MAX_SAMPLES = int(os.getenv("TRAINING_MAX_SAMPLES", "200000"))
+DEFAULT_CHUNK_SIZE = int(os.getenv("TRAINING_CHUNK_SIZE", "5000"))
+# Số core cho mỗi RandomForest (-1 = tất cả)
+DEFAULT_N_JOBS = int(os.getenv("TRAINING_N_JOBS", "-1"))
+# Chỉ đọc phân phối hoàn thành trước NOW() - độ trễ này: transaction commit muộn với
+# hoan_thanh_at cũ hơn watermark không bị bỏ sót
+WATERMARK_LAG_SECONDS = int(os.getenv("TRAINING_WATERMARK_LAG_SECONDS", "300"))
+# Watermark ban đầu (chưa đọc gì)
+INITIAL_WATERMARK = (datetime(1970, 1, 1), 0)
+
+
+class TrainingCancelled(Exception):
+    """Job train bị hủy giữa chừng"""
+
+# Duyệt theo thời điểm hoàn thành (partial index phan_phois_hoan_thanh_at_idx):
+# phân phối id nhỏ nhưng hoàn thành muộn vẫn nằm sau watermark
+TRAINING_QUERY = """
+    SELECT
+        ph.id,
+        ph.hoan_thanh_at,
+        yc.so_nguoi,
+        yc.dia_chi,
+        yc.mo_ta,
+        yc.loai_yeu_cau,
+        nr.loai,
+        ph.thoi_gian_xuat,
+        yc.created_at
+    FROM phan_phois ph
+    JOIN yeu_cau_cuu_tros yc ON ph.id_yeu_cau = yc.id
+    JOIN nguon_lucs nr ON ph.id_nguon_luc = nr.id
+    WHERE ph.trang_thai = 'hoan_thanh'
+      AND (ph.hoan_thanh_at, ph.id) > (%s, %s)
+      AND ph.hoan_thanh_at <= NOW() - make_interval(secs => %s)
+    ORDER BY ph.hoan_thanh_at, ph.id
+"""
+
+# Vocabulary loại nguồn lực: một câu GROUP BY thay vì đọc dữ liệu hai lần
+RESOURCE_COUNTS_QUERY = """
+    SELECT nr.loai, COUNT(*) AS so_lan
+    FROM phan_phois ph
+    JOIN nguon_lucs nr ON ph.id_nguon_luc = nr.id
+    WHERE ph.trang_thai = 'hoan_thanh'
+    GROUP BY nr.loai
+"""
+
+
+def compute_targets(so_nguoi: np.ndarray) -> np.ndarray:
+    """
+    Labels theo thứ tự MODEL_TARGETS: actual distributed amounts (sẽ cần thêm fields trong DB),
+    tạm thời estimate từ so_nguoi
+    """
+    return np.column_stack([
+        so_nguoi * 2 * 7,
+        so_nguoi * 5 * 7,
+        so_nguoi * 0.5 * 7,
+        np.maximum(1, so_nguoi // 4),
+    ])
+
+
+class Reservoir:
+    """
+    Mẫu ngẫu nhiên đều tối đa `capacity` dòng trên một luồng dữ liệu không biết trước độ dài
+    (Algorithm R, vector hóa theo lô).
+    """
+
+    def __init__(self, capacity: int, n_features: int, n_targets: int, seen: int = 0, seed: int = 42):
+        self.capacity = capacity
+        self.X = np.empty((capacity, n_features), dtype=np.float32)
+        self.Y = np.empty((capacity, n_targets), dtype=np.float32)
+        self.seen = seen
+        # Seed theo số dòng đã thấy: kết quả lặp lại được, kể cả khi tiếp tục từ mẫu đã lưu
+        self._rng = np.random.default_rng([seed, seen])
+
+    def __len__(self):
+        return min(self.seen, self.capacity)
+
+    def add(self, X: np.ndarray, Y: np.ndarray):
+        n = len(X)
+        if n == 0:
+            return
+        # Vị trí toàn cục (0-based) của từng dòng trong luồng
+        positions = np.arange(self.seen, self.seen + n)
+
+        # Các dòng đầu: lấp chỗ trống
+        fill = positions < self.capacity
+        if fill.any():
+            self.X[positions[fill]] = X[fill]
+            self.Y[positions[fill]] = Y[fill]
+
+        # Các dòng sau: giữ lại với xác suất capacity / (vị trí + 1)
+        rest = ~fill
+        if rest.any():
+            slots = self._rng.integers(0, positions[rest] + 1)
+            keep = slots < self.capacity
+            self.X[slots[keep]] = X[rest][keep]
+            self.Y[slots[keep]] = Y[rest][keep]
+
+        self.seen += n
+
+    def arrays(self):
+        size = len(self)
+        return self.X[:size], self.Y[:size]
+
+    def save(self, path: str, **metadata):
+        X, Y = self.arrays()
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, X=X, Y=Y, seen=self.seen,
+                 **{k: np.array([v]) for k, v in metadata.items()})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, capacity: int):
+        with np.load(path, allow_pickle=False) as data:
+            X, Y = data["X"], data["Y"]
+            seen = int(data["seen"])
+            # Mẫu đã đầy (seen > len(X)): các dòng bị thay thế không còn, không thể lấp thêm chỗ
+            # trống một cách đều -> giữ dung lượng cũ; tăng dung lượng cần train lại từ đầu
+            if seen > len(X):
+                if capacity > len(X):
+                    logger.info("Training sample capacity stays at %d (requested %d) until a full rebuild",
+                                len(X), capacity)
+                capacity = len(X)
+            reservoir = cls(max(capacity, len(X)), X.shape[1], Y.shape[1], seen=seen)
+            reservoir.X[:len(X)] = X
+            reservoir.Y[:len(Y)] = Y
+            metadata = {k: data[k][0].item() for k in data.files if k not in ("X", "Y", "seen")}
+        return reservoir, metadata
+
+
+def _load_resource_counts(conn) -> Dict[str, int]:
+    cursor = dict_cursor(conn)
+    cursor.execute(RESOURCE_COUNTS_QUERY)
+    counts = {row["loai"]: int(row["so_lan"]) for row in cursor.fetchall()}
+    cursor.close()
+    return counts
+
+
+def build_training_set(
+    conn,
+    sample_path: Optional[str] = None,
+    incremental: bool = False,
+    max_samples: int = DEFAULT_MAX_SAMPLES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress=None,
+) -> Optional[Dict]:
+    """
+    Đọc lịch sử phân phối (toàn bộ, hoặc chỉ phần sau watermark nếu incremental)
+    và trả về {"X", "Y", "encoder", "stats"}. Trả None nếu không có dữ liệu.
+
+    progress(rows_read) được gọi sau mỗi lô (dùng cho báo cáo tiến độ / hủy job).
+    """
+    encoder = FeatureEncoder().fit_counts(_load_resource_counts(conn))
+
+    reservoir = None
+    watermark = INITIAL_WATERMARK
+    if incremental and sample_path and os.path.exists(sample_path):
+        saved, metadata = Reservoir.load(sample_path, max_samples)
+        # Vocabulary đổi (có loại nguồn lực mới) -> cột feature đổi, phải đọc lại từ đầu
+        if metadata.get("resource_types") != "\x1f".join(encoder.resource_types):
+            logger.info("Resource vocabulary changed, rebuilding training sample from scratch")
+        # Mẫu cũ lưu watermark theo id, không dùng được với watermark theo thời điểm hoàn thành
+        elif "watermark_at" not in metadata:
+            logger.info("Training sample has an id watermark, rebuilding from scratch")
+        else:
+            reservoir = saved
+            watermark = (datetime.fromisoformat(metadata["watermark_at"]), int(metadata["watermark"]))
+
+    if reservoir is None:
+        reservoir = Reservoir(max_samples, encoder.n_features, len(MODEL_TARGETS))
+
+    started = time.perf_counter()
+    rows_read = 0
+    last = watermark
+    cursor = named_dict_cursor(conn, "training_stream", itersize=chunk_size)
+    try:
+        cursor.execute(TRAINING_QUERY, (*watermark, WATERMARK_LAG_SECONDS))
+        while True:
+            records = cursor.fetchmany(chunk_size)
+            if not records:
+                break
+            rows = [training_row(record) for record in records]
+            so_nguoi = np.array([record["so_nguoi"] or 0 for record in records], dtype=np.float64)
+            reservoir.add(encoder.transform(rows), compute_targets(so_nguoi))
+
+            rows_read += len(records)
+            last = (records[-1]["hoan_thanh_at"], records[-1]["id"])
+            if progress:
+                progress(rows_read)
+    finally:
+        cursor.close()
+        # Đóng transaction giữ server-side cursor
+        conn.rollback()
+
+    elapsed = time.perf_counter() - started
+    rows_per_sec = rows_read / elapsed if elapsed > 0 else 0.0
+    logger.info("Training data: read %d rows in %.1fs (%.0f rows/s), sample %d/%d",
+                rows_read, elapsed, rows_per_sec, len(reservoir), reservoir.seen)
+
+    if sample_path:
+        reservoir.save(sample_path, watermark=last[1], watermark_at=last[0].isoformat(),
+                       resource_types="\x1f".join(encoder.resource_types))
+
+    if len(reservoir) == 0:
+        return None
+
+    X, Y = reservoir.arrays()
+    return {
+        "X": X,
+        "Y": Y,
+        "encoder": encoder,
+        "stats": {
+            "rows_read": rows_read,
+            "rows_total": reservoir.seen,
+            "samples": len(reservoir),
+            "watermark": last[1],
+            "watermark_at": last[0].isoformat(),
+            "incremental": watermark != INITIAL_WATERMARK,
+            "elapsed_s": round(elapsed, 2),
+            "rows_per_sec": round(rows_per_sec, 1),
+        },
+    }
+
+
+def train_models(
+    conn,
+    model_dir: str,
+    incremental: bool = False,
+    n_jobs: int = DEFAULT_N_JOBS,
+    report: Optional[Callable[..., None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    promote: bool = True,
+) -> Optional[Dict]:
+    """
+    Đọc dữ liệu, train 4 RandomForest và publish thành version mới trong model registry
+    (model_dir), promote luôn nếu promote=True.
+
+    report(**fields) nhận tiến độ (phase, rows_read, models_done);
+    should_cancel() được kiểm tra sau mỗi lô dữ liệu và mỗi model,
+    trả True thì dừng bằng TrainingCancelled mà không publish gì.
+    Trả về thống kê, hoặc None nếu không đủ dữ liệu.
+    """
+    # Import muộn: main chỉ cần MODEL_TARGETS, không kéo sklearn vào lúc khởi động
+    from sklearn.ensemble import RandomForestRegressor
+
+    report = report or (lambda **fields: None)
+
+    def check_cancel():
+        if should_cancel and should_cancel():
+            raise TrainingCancelled()
+
+    def on_progress(rows_read):
+        report(rows_read=rows_read)
+        check_cancel()
+
+    report(phase="loading")
+    training_set = build_training_set(
+        conn,
+        os.path.join(model_dir, TRAINING_SAMPLE_FILE),
+        incremental=incremental,
+        progress=on_progress,
+    )
+    if not training_set or len(training_set["X"]) < 10:
+        logger.warning("Not enough data for ML model")
+        return None
+
+    X, Y = training_set["X"], training_set["Y"]
+    encoder = training_set["encoder"]
+
+    models = {}
+    metrics = {}
+    started = time.perf_counter()
+    for i, name in enumerate(MODEL_TARGETS):
+        report(phase=f"fitting {name}", models_done=i)
+        # OOB score: đánh giá trên các dòng không rơi vào bootstrap, không cần tách tập test
+        models[name] = RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=n_jobs, oob_score=True)
+        models[name].fit(X, Y[:, i])
+        metrics[name] = {"oob_r2": round(float(models[name].oob_score_), 4)}
+        check_cancel()
+    fit_seconds = time.perf_counter() - started
+
+    # Publish thành version mới trong registry (ghi thư mục tạm rồi rename),
+    # promote bằng cách thay CURRENT: reader không bao giờ thấy bundle ghi dở
+    report(phase="publishing", models_done=len(MODEL_TARGETS))
+    stats = {**training_set["stats"], "fit_s": round(fit_seconds, 2)}
+    registry = ModelRegistry(model_dir)
+    version = registry.publish(
+        {
+            "encoder": encoder.to_dict(),
+            "models": models,
+            "feature_names": encoder.feature_names,
+            "n_samples": len(X),
+            "trained_at": datetime.now().isoformat(),
+        },
+        {
+            "training": stats,
+            "metrics": metrics,
+            "feature_schema": {
+                "encoder": encoder.to_dict(),
+                "feature_names": encoder.feature_names,
+                "targets": MODEL_TARGETS,
+            },
+        },
+    )
+    if promote:
+        registry.promote(version)
+
+    logger.info("Models trained and saved successfully (%d samples, %d features, version %s)",
+                len(X), encoder.n_features, version)
+    return {**stats, "version": version, "promoted": promote, "metrics": metrics}
@@ -0,0 +1,170 @@
+"""
+Training jobs - chạy train model trong process pool riêng (không tranh GIL với request
+đang phục vụ), theo dõi tiến độ qua job id và hỗ trợ hủy job
+"""
+
+import logging
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from training import DEFAULT_N_JOBS, TrainingCancelled, train_models
+
+logger = logging.getLogger(__name__)
+
+# Giữ thông tin các job đã xong để /train/{job_id} vẫn trả lời được
+MAX_FINISHED_JOBS = 50
+
+
+def _run_training_job(model_dir: str, incremental: bool, promote: bool, n_jobs: int,
+                      state, cancel_event) -> Optional[Dict]:
+    """Chạy trong process con: tự mở kết nối database, ghi tiến độ vào state (Manager dict)"""
+    from db import get_db_connection
+    from log_setup import setup_logging
+
+    setup_logging()
+
+    state["status"] = "running"
+    state["started_at"] = datetime.now().isoformat()
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Cannot connect to database for training")
+    try:
+        return train_models(
+            conn,
+            model_dir,
+            incremental=incremental,
+            n_jobs=n_jobs,
+            report=state.update,
+            should_cancel=cancel_event.is_set,
+            promote=promote,
+        )
+    finally:
+        conn.close()
+
+
+class TrainingJobManager:
+    """
+    Quản lý job train: mỗi job chạy trong ProcessPoolExecutor (mặc định 1 worker,
+    job sau xếp hàng chờ job trước). Tiến độ và cờ hủy đi qua multiprocessing.Manager.
+    """
+
+    def __init__(self, model_dir: str, max_workers: int = 1, n_jobs: int = DEFAULT_N_JOBS):
+        self.model_dir = model_dir
+        self.max_workers = max_workers
+        self.n_jobs = n_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Khởi tạo lazy: không tốn process nào nếu service không bao giờ train
+        if self._executor is None:
+            # spawn thay vì fork: process cha có nhiều thread (scheduler, listener)
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def submit(self, incremental: bool = False, promote: bool = True) -> Dict:
+        with self._lock:
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            state = self._manager.dict({
+                "status": "queued",
+                "phase": None,
+                "rows_read": 0,
+                "models_done": 0,
+            })
+            cancel_event = self._manager.Event()
+            job = {
+                "job_id": job_id,
+                "incremental": incremental,
+                "promote": promote,
+                "created_at": datetime.now().isoformat(),
+                "state": state,
+                "cancel_event": cancel_event,
+                "result": None,
+                "error": None,
+            }
+            job["future"] = self._executor.submit(
+                _run_training_job, self.model_dir, incremental, promote, self.n_jobs, state, cancel_event
+            )
+            job["future"].add_done_callback(lambda future, job=job: self._on_done(job, future))
+            self._jobs[job_id] = job
+            self._prune()
+        return self.get(job_id)
+
+    def _on_done(self, job: Dict, future):
+        if future.cancelled():
+            status = "cancelled"
+        else:
+            error = future.exception()
+            if isinstance(error, TrainingCancelled):
+                status = "cancelled"
+            elif error is not None:
+                status = "failed"
+                job["error"] = str(error)
+            elif future.result() is None:
+                status = "insufficient_data"
+            else:
+                status = "succeeded"
+                job["result"] = future.result()
+        job["status"] = status
+        job["finished_at"] = datetime.now().isoformat()
+        logger.info("Training job %s %s", job["job_id"], status)
+
+    def _prune(self):
+        finished = sorted(
+            (j for j in self._jobs.values() if j["future"].done()),
+            key=lambda j: j["created_at"],
+        )
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._jobs.pop(job["job_id"], None)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+        try:
+            progress = dict(job["state"])
+        except Exception:
+            # Manager đã tắt (service đang shutdown)
+            progress = {}
+        status = job.get("status") or progress.pop("status", "queued")
+        progress.pop("status", None)
+        return {
+            "job_id": job_id,
+            "status": status,
+            "incremental": job["incremental"],
+            "promote": job["promote"],
+            "created_at": job["created_at"],
+            "started_at": progress.pop("started_at", None),
+            "finished_at": job.get("finished_at"),
+            "progress": progress,
+            "result": job["result"],
+            "error": job["error"],
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+        # Job chưa chạy: bỏ khỏi hàng đợi; đang chạy: bật cờ, worker tự dừng ở checkpoint kế tiếp
+        if not job["future"].cancel():
+            job["cancel_event"].set()
+        return self.get(job_id)
+
+    def shutdown(self):
+        if self._executor:
+            for job in self._jobs.values():
+                if not job["future"].done():
+                    job["cancel_event"].set()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+            self._manager = None
@@ -7,10 +7,21 @@ import requests
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
 import json
+import logging
+import re
+import threading
+import time
+
+from circuit_breaker import LastKnownGood, weather_breaker
+from metrics import WEATHER_API_DURATION, WEATHER_API_ERRORS
+
+logger = logging.getLogger(__name__)
 
 # OpenWeatherMap API Key
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "")
 WEATHER_API_URL = "https://api.openweathermap.org/data/2.5"
+# Timeout (giây) mỗi lần gọi OpenWeatherMap
+WEATHER_API_TIMEOUT = float(os.getenv("WEATHER_API_TIMEOUT", "10"))
 
 # Tọa độ các tỉnh thành lớn ở Việt Nam
 VIETNAM_PROVINCES_COORDS = {
@@ -76,6 +87,65 @@ VIETNAM_PROVINCES_COORDS = {
 }
 
 
+# Tên gọi khác trong địa chỉ -> tên tỉnh trong VIETNAM_PROVINCES_COORDS
+PROVINCE_ALIASES = {
+    "tp.hcm": "Hồ Chí Minh",
+    "tphcm": "Hồ Chí Minh",
+    "sài gòn": "Hồ Chí Minh",
+    "huế": "Thừa Thiên Huế",
+    "vũng tàu": "Bà Rịa - Vũng Tàu",
+}
+
+# Tên dài trước để "Thừa Thiên Huế" không bị khớp thành alias "Huế"
+_PROVINCE_NAMES = {name.lower(): name for name in VIETNAM_PROVINCES_COORDS}
+_PROVINCE_NAMES.update(PROVINCE_ALIASES)
+_PROVINCE_PATTERN = re.compile(
+    "|".join(re.escape(name) for name in sorted(_PROVINCE_NAMES, key=len, reverse=True))
+)
+
+class RiskStore:
+    """Kết quả phân tích rủi ro gần nhất theo tỉnh (cập nhật mỗi lần check_weather_and_predict)"""
+
+    def __init__(self):
+        self._risks: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, province: str, risk: Dict):
+        with self._lock:
+            self._risks[province] = risk
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return dict(self._risks)
+
+
+# Mặc định nằm trong process; chạy nhiều worker thì main.use_shared_state thay bằng proxy
+# tới store trong process shared state (scheduler ghi, worker đọc)
+_risk_store = RiskStore()
+
+# Dữ liệu OpenWeatherMap thành công gần nhất theo (loại, lat, lon): dùng khi API lỗi / breaker open
+_last_good_weather = LastKnownGood()
+
+
+def extract_province(dia_chi: Optional[str]) -> Optional[str]:
+    """Tìm tên tỉnh thành trong chuỗi địa chỉ"""
+    if not dia_chi:
+        return None
+    match = _PROVINCE_PATTERN.search(dia_chi.lower())
+    return _PROVINCE_NAMES[match.group(0)] if match else None
+
+
+def get_latest_risks() -> Dict[str, Dict]:
+    """Rủi ro thiên tai gần nhất đã biết của từng tỉnh (không gọi API)"""
+    return _risk_store.snapshot()
+
+
+def set_risk_store(store):
+    """Dùng store khác (proxy RiskStore của shared_state) thay cho store trong process"""
+    global _risk_store
+    _risk_store = store
+
+
 def get_province_coords(tinh_thanh: str) -> Optional[Dict[str, float]]:
     """Lấy tọa độ của tỉnh thành"""
     # Normalize province name
@@ -93,10 +163,22 @@ def get_province_coords(tinh_thanh: str) -> Optional[Dict[str, float]]:
     return None
 
 
+def _record_response(response):
+    """5xx / 429 là lỗi phía OpenWeatherMap (tính vào breaker); 4xx khác là lỗi request / API key"""
+    if response.status_code >= 500 or response.status_code == 429:
+        weather_breaker.failure(f"HTTP {response.status_code}")
+    else:
+        weather_breaker.success()
+
+
 def get_current_weather(lat: float, lon: float) -> Optional[Dict]:
     """Lấy thời tiết hiện tại từ OpenWeatherMap"""
     if not WEATHER_API_KEY:
-        print("⚠️  WEATHER_API_KEY not set, using mock data")
+        logger.warning("WEATHER_API_KEY not set, using mock data")
+        WEATHER_API_ERRORS.labels("weather", "no_api_key").inc()
+        return None
+    if not weather_breaker.allow():
+        WEATHER_API_ERRORS.labels("weather", "circuit_open").inc()
         return None
     
     try:
@@ -109,22 +191,34 @@ def get_current_weather(lat: float, lon: float) -> Optional[Dict]:
             "lang": "vi"
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        started = time.perf_counter()
+        try:
+            response = requests.get(url, params=params, timeout=WEATHER_API_TIMEOUT)
+        finally:
+            WEATHER_API_DURATION.labels("weather").observe(time.perf_counter() - started)
+        _record_response(response)
         
         if response.status_code == 200:
             return response.json()
         else:
-            print(f"⚠️  Weather API error: {response.status_code}")
+            logger.warning("Weather API error: %s", response.status_code)
+            WEATHER_API_ERRORS.labels("weather", str(response.status_code)).inc()
             return None
     except Exception as e:
-        print(f"⚠️  Error fetching weather: {e}")
+        weather_breaker.failure(e)
+        logger.warning("Error fetching weather: %s", e)
+        WEATHER_API_ERRORS.labels("weather", type(e).__name__).inc()
         return None
 
 
 def get_weather_forecast(lat: float, lon: float, days: int = 5) -> Optional[Dict]:
     """Lấy dự báo thời tiết 5 ngày từ OpenWeatherMap"""
     if not WEATHER_API_KEY:
-        print("⚠️  WEATHER_API_KEY not set, using mock data")
+        logger.warning("WEATHER_API_KEY not set, using mock data")
+        WEATHER_API_ERRORS.labels("forecast", "no_api_key").inc()
+        return None
+    if not weather_breaker.allow():
+        WEATHER_API_ERRORS.labels("forecast", "circuit_open").inc()
         return None
     
     try:
@@ -138,15 +232,23 @@ def get_weather_forecast(lat: float, lon: float, days: int = 5) -> Optional[Dict
             "cnt": days * 8  # 8 forecasts per day (3-hour intervals)
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        started = time.perf_counter()
+        try:
+            response = requests.get(url, params=params, timeout=WEATHER_API_TIMEOUT)
+        finally:
+            WEATHER_API_DURATION.labels("forecast").observe(time.perf_counter() - started)
+        _record_response(response)
         
         if response.status_code == 200:
             return response.json()
         else:
-            print(f"⚠️  Weather Forecast API error: {response.status_code}")
+            logger.warning("Weather Forecast API error: %s", response.status_code)
+            WEATHER_API_ERRORS.labels("forecast", str(response.status_code)).inc()
             return None
     except Exception as e:
-        print(f"⚠️  Error fetching weather forecast: {e}")
+        weather_breaker.failure(e)
+        logger.warning("Error fetching weather forecast: %s", e)
+        WEATHER_API_ERRORS.labels("forecast", type(e).__name__).inc()
         return None
 
 
@@ -315,7 +417,8 @@ def check_weather_and_predict(tinh_thanh: str) -> Dict:
             "weather": {...},
             "forecast": {...},
             "disaster_risk": {...},
-            "timestamp": str
+            "timestamp": str,
+            "stale": True, "stale_since": str  # chỉ khi dùng dữ liệu cũ vì API lỗi
         }
     """
     coords = get_province_coords(tinh_thanh)
@@ -333,10 +436,34 @@ def check_weather_and_predict(tinh_thanh: str) -> Dict:
     # Get forecast
     forecast_data = get_weather_forecast(coords["lat"], coords["lon"])
     
+    # API lỗi / breaker open: dùng dữ liệu tốt gần nhất, đánh dấu stale
+    stale_since = None
+    for kind, data in (("weather", weather_data), ("forecast", forecast_data)):
+        key = (kind, coords["lat"], coords["lon"])
+        if data:
+            _last_good_weather.put(key, data)
+            continue
+        cached = _last_good_weather.get(key)
+        if cached:
+            if kind == "weather":
+                weather_data = cached[0]
+            else:
+                forecast_data = cached[0]
+            stale_since = min(stale_since or cached[1], cached[1])
+    
     # Analyze disaster risk
     disaster_risk = analyze_disaster_risk(weather_data, forecast_data)
     
-    return {
+    # Chỉ ghi nhận khi có dữ liệu thật (API key thiếu/lỗi -> giữ giá trị cũ)
+    if weather_data and not stale_since:
+        province = extract_province(tinh_thanh) or tinh_thanh
+        _risk_store.update(province, {
+            "risk_level": disaster_risk.get("risk_level", "low"),
+            "risk_score": disaster_risk.get("risk_score", 0),
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    result = {
         "tinh_thanh": tinh_thanh,
         "coords": coords,
         "weather": weather_data,
@@ -344,4 +471,38 @@ def check_weather_and_predict(tinh_thanh: str) -> Dict:
         "disaster_risk": disaster_risk,
         "timestamp": datetime.now().isoformat()
     }
+    if stale_since:
+        result["stale"] = True
+        result["stale_since"] = stale_since
+    return result
 
+
+def summarize_weather(weather_data: Optional[Dict]) -> Optional[Dict]:
+    """Vài chỉ số chính của thời tiết hiện tại (thay cho JSON gốc của OpenWeatherMap)"""
+    if not weather_data:
+        return None
+    main = weather_data.get("main", {})
+    weather = (weather_data.get("weather") or [{}])[0]
+    rain = weather_data.get("rain", {})
+    return {
+        "temp": main.get("temp"),
+        "feels_like": main.get("feels_like"),
+        "humidity": main.get("humidity"),
+        "pressure": main.get("pressure"),
+        "wind_speed": weather_data.get("wind", {}).get("speed"),
+        "rain": rain.get("1h") or rain.get("3h") or 0,
+        "cloudiness": weather_data.get("clouds", {}).get("all"),
+        "condition": weather.get("main"),
+        "description": weather.get("description"),
+    }
+
+
+def compact_result(result: Dict) -> Dict:
+    """
+    Bản gọn của kết quả check_weather_and_predict: bỏ forecast gốc (40 mốc 3 giờ),
+    thay weather gốc bằng summarize_weather; disaster_risk giữ nguyên
+    """
+    compact = {key: value for key, value in result.items() if key not in ("weather", "forecast")}
+    if "weather" in result:
+        compact["weather"] = summarize_weather(result["weather"])
+    return compact
@@ -3,12 +3,26 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 import requests
 import json
+import logging
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from math import radians, sin, cos, sqrt, atan2
+
+try:
+    from actions.log_setup import setup_logging
+    from actions.tracing import instrument_actions, span
+except ImportError:
+    # Nạp trực tiếp file actions.py (scripts/test_import.py)
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from log_setup import setup_logging
+    from tracing import instrument_actions, span
 
 # Load environment variables from the root .env file (2 levels up)
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+setup_logging()
+logger = logging.getLogger(__name__)
 
 
 try:
@@ -18,6 +32,18 @@ except Exception:
     psycopg2 = None
 
 AI_SERVICE_URL = os.environ.get("AI_SERVICE_URL", "http://localhost:8000")
+# Gửi qua X-Service-Key: AI service không rate limit theo IP cho action server (xem ai-service/admission.py)
+AI_SERVICE_KEY = os.environ.get("AI_SERVICE_KEY", "")
+
+
+def _http(method: str, url: str, **kwargs):
+    """requests.request trong một span (thời gian gọi AI service / Next.js)"""
+    if AI_SERVICE_KEY and url.startswith(AI_SERVICE_URL):
+        kwargs["headers"] = {**kwargs.get("headers", {}), "X-Service-Key": AI_SERVICE_KEY}
+    with span(f"HTTP {method}", **{"http.method": method, "http.url": url}) as s:
+        response = requests.request(method, url, **kwargs)
+        s.set_attribute("http.status_code", response.status_code)
+        return response
 
 
 def _get_db_conn():
@@ -26,16 +52,16 @@ def _get_db_conn():
         return None
     try:
         if not db_url:
-            print("DEBUG: DATABASE_URL is not set.")
+            logger.debug("DATABASE_URL is not set")
             return None
         # Mask password for logging
         safe_url = db_url.split("@")[-1] if "@" in db_url else "..."
-        print(f"DEBUG: Connecting to DB at ...{safe_url}")
+        logger.debug("Connecting to DB at ...%s", safe_url)
         
         conn = psycopg2.connect(db_url)
         return conn
     except Exception as e:
-        print(f"DEBUG: DB Connection Error: {e}")
+        logger.warning("DB connection error: %s", e)
         return None
 
 
@@ -179,7 +205,7 @@ def _fetch_statistics_from_db():
         conn.close()
         return stats
     except Exception as e:
-        print(f"DEBUG: Error fetching statistics: {e}")
+        logger.warning("Error fetching statistics: %s", e)
         try:
             conn.close()
         except Exception:
@@ -220,7 +246,7 @@ def _fetch_resources_from_db(location_filter: str = None):
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching resources: {e}")
+        logger.warning("Error fetching resources: %s", e)
         try:
             conn.close()
         except Exception:
@@ -253,7 +279,7 @@ def _fetch_distributions_from_db(limit: int = 10):
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching distributions: {e}")
+        logger.warning("Error fetching distributions: %s", e)
         try:
             conn.close()
         except Exception:
@@ -276,12 +302,7 @@ def _fetch_pending_requests_from_db():
             LEFT JOIN nguoi_dungs nd ON yc.id_nguoi_dung = nd.id
             WHERE yc.trang_thai_phe_duyet = 'cho_phe_duyet'
             ORDER BY 
-                CASE yc.do_uu_tien 
-                    WHEN 'khan_cap' THEN 1 
-                    WHEN 'cao' THEN 2 
-                    WHEN 'trung_binh' THEN 3 
-                    ELSE 4 
-                END,
+                yc.diem_uu_tien DESC,
                 yc.created_at DESC
             LIMIT 20
         """)
@@ -291,7 +312,7 @@ def _fetch_pending_requests_from_db():
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching pending requests: {e}")
+        logger.warning("Error fetching pending requests: %s", e)
         try:
             conn.close()
         except Exception:
@@ -322,7 +343,7 @@ def _fetch_volunteers_from_db():
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching volunteers: {e}")
+        logger.warning("Error fetching volunteers: %s", e)
         try:
             conn.close()
         except Exception:
@@ -352,7 +373,7 @@ def _fetch_ai_predictions_from_db():
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching AI predictions: {e}")
+        logger.warning("Error fetching AI predictions: %s", e)
         try:
             conn.close()
         except Exception:
@@ -362,8 +383,6 @@ def _fetch_ai_predictions_from_db():
 
 def _haversine_km(lat1, lon1, lat2, lon2):
     # Haversine formula to compute distance between two lat/lon points in kilometers
-    from math import radians, sin, cos, sqrt, atan2
-
     try:
         lat1 = float(lat1)
         lon1 = float(lon1)
@@ -380,6 +399,48 @@ def _haversine_km(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def _fetch_nearest_centers(lat, lon, k: int, location: str = None):
+    """Lấy k trung tâm gần nhất từ AI service (index trên toàn bộ trung tâm)"""
+    try:
+        params = {"lat": float(lat), "lon": float(lon), "k": k}
+        if location:
+            params["location"] = location
+        resp = _http("GET", f"{AI_SERVICE_URL}/centers/nearest", params=params, timeout=5)
+        if resp.status_code != 200:
+            return None
+        return [(it.get("distance_km"), it) for it in resp.json().get("items", [])]
+    except Exception as e:
+        logger.warning("Error fetching nearest centers: %s", e)
+        return None
+
+
+def _get_max_centers(tracker) -> int:
+    # number of results to return; allow override from slot `max_centers` or `max_results`
+    try:
+        slot_val = tracker.get_slot("max_centers") or tracker.get_slot("max_results")
+        max_n = int(slot_val) if slot_val is not None else 5
+    except Exception:
+        max_n = 5
+    if max_n <= 0:
+        max_n = 5
+    return min(max_n, 20)
+
+
+def _utter_nearest_centers(dispatcher, top, location_filter):
+    if not top:
+        if location_filter:
+            dispatcher.utter_message(text=f"Không tìm thấy trung tâm cứu trợ nào ở {location_filter} gần bạn.")
+        else:
+            dispatcher.utter_message(text="Không tìm thấy trung tâm có tọa độ để tính khoảng cách.")
+        return
+
+    lines = []
+    for dist, it in top:
+        lines.append(f"• {it.get('ten_trung_tam')} — {it.get('dia_chi')} — {it.get('so_lien_he')} — {dist:.1f} km")
+    msg = f"Các trung tâm cứu trợ gần bạn nhất{' tại ' + location_filter if location_filter else ''}:\n" + "\n".join(lines)
+    dispatcher.utter_message(text=msg)
+
+
 class ActionCheckWeather(Action):
     def name(self) -> Text:
         return "action_check_weather"
@@ -394,7 +455,8 @@ class ActionCheckWeather(Action):
             return []
 
         try:
-            response = requests.get(f"{AI_SERVICE_URL}/weather/check/{location}")
+            # compact: chỉ cần nhiệt độ, mô tả và mức rủi ro, không cần forecast gốc
+            response = _http("GET", f"{AI_SERVICE_URL}/weather/check/{location}", params={"compact": "true"})
             if response.status_code == 200:
                 data = response.json()
                 weather = data.get("weather", {})
@@ -431,7 +493,7 @@ class ActionPredictRelief(Action):
 
         try:
             payload = {"tinh_thanh": location, "so_nguoi": 1000}
-            response = requests.post(f"{AI_SERVICE_URL}/predict", json=payload)
+            response = _http("POST", f"{AI_SERVICE_URL}/predict", json=payload)
             if response.status_code == 200:
                 data = response.json()
                 food = data.get("du_doan_nhu_cau_thuc_pham", 0)
@@ -467,7 +529,7 @@ class ActionGetUserRequests(Action):
             items = _fetch_user_requests_from_db(user_id)
             if items is None:
                 payload = {"message": "get_user_requests", "userId": user_id, "queryType": "user_requests"}
-                resp = requests.post("http://localhost:3000/api/chat", json=payload, timeout=10)
+                resp = _http("POST", "http://localhost:3000/api/chat", json=payload, timeout=10)
                 if resp.status_code == 200:
                     data = resp.json()
                     if isinstance(data, dict) and data.get("type") == "user_requests":
@@ -510,7 +572,7 @@ class ActionGetNotifications(Action):
             items = _fetch_notifications_from_db(user_id)
             if items is None:
                 payload = {"message": "get_notifications", "userId": user_id, "queryType": "notifications"}
-                resp = requests.post("http://localhost:3000/api/chat", json=payload, timeout=10)
+                resp = _http("POST", "http://localhost:3000/api/chat", json=payload, timeout=10)
                 if resp.status_code == 200:
                     data = resp.json()
                     if isinstance(data, dict) and data.get("type") == "notifications":
@@ -561,14 +623,25 @@ class ActionGetCenters(Action):
                 user_lon = lon
                 break
 
+        # Try to get requested location filter (e.g. "Hà Nội")
+        location_filter = tracker.get_slot("location")
+        max_n = _get_max_centers(tracker)
+
         try:
+            # With user coordinates, the AI service returns exact top-k over all centers
+            if user_lat is not None and user_lon is not None:
+                nearest = _fetch_nearest_centers(user_lat, user_lon, max_n, location_filter)
+                if nearest is not None:
+                    _utter_nearest_centers(dispatcher, nearest, location_filter)
+                    return []
+
             items = _fetch_centers_from_db()
             if items is None:
                 payload = {"message": "get_centers", "queryType": "centers"}
                 # gửi kèm userId nếu có, để backend có thể log hoặc mở rộng logic sau này
                 if user_id:
                     payload["userId"] = user_id
-                resp = requests.post("http://localhost:3000/api/chat", json=payload, timeout=10)
+                resp = _http("POST", "http://localhost:3000/api/chat", json=payload, timeout=10)
                 if resp.status_code == 200:
                     data = resp.json()
                     if isinstance(data, dict) and data.get("type") == "centers":
@@ -584,10 +657,7 @@ class ActionGetCenters(Action):
                 dispatcher.utter_message(text="Không có trung tâm cứu trợ nào trong hệ thống.")
                 return []
 
-            # Try to get requested location filter (e.g. "Hà Nội")
-            location_filter = tracker.get_slot("location")
-
-            # If user coordinates available, compute distance and sort
+            # AI service unavailable: compute distance over fetched centers and sort
             if user_lat is not None and user_lon is not None:
                 centers_with_dist = []
                 for it in items:
@@ -611,29 +681,7 @@ class ActionGetCenters(Action):
                         if loc_lower in (it.get('dia_chi') or '').lower() or loc_lower in (it.get('ten_trung_tam') or '').lower()
                     ]
 
-                # number of results to return; allow override from slot `max_centers` or `max_results`
-                try:
-                    slot_val = tracker.get_slot("max_centers") or tracker.get_slot("max_results")
-                    max_n = int(slot_val) if slot_val is not None else 5
-                except Exception:
-                    max_n = 5
-                if max_n <= 0:
-                    max_n = 5
-                max_n = min(max_n, 20)
-                top = centers_with_dist[:max_n]
-                
-                if not top:
-                    if location_filter:
-                         dispatcher.utter_message(text=f"Không tìm thấy trung tâm cứu trợ nào ở {location_filter} gần bạn.")
-                    else:
-                         dispatcher.utter_message(text="Không tìm thấy trung tâm có tọa độ để tính khoảng cách.")
-                    return []
-
-                lines = []
-                for dist, it in top:
-                    lines.append(f"• {it.get('ten_trung_tam')} — {it.get('dia_chi')} — {it.get('so_lien_he')} — {dist:.1f} km")
-                msg = f"Các trung tâm cứu trợ gần bạn nhất{' tại ' + location_filter if location_filter else ''}:\n" + "\n".join(lines)
-                dispatcher.utter_message(text=msg)
+                _utter_nearest_centers(dispatcher, centers_with_dist[:max_n], location_filter)
                 return []
 
             # Fallback: no user coords — create list from unfiltered items
@@ -647,15 +695,6 @@ class ActionGetCenters(Action):
                     if loc_lower in (it.get('dia_chi') or '').lower() or loc_lower in (it.get('ten_trung_tam') or '').lower()
                 ]
 
-            try:
-                slot_val = tracker.get_slot("max_centers") or tracker.get_slot("max_results")
-                max_n = int(slot_val) if slot_val is not None else 5
-            except Exception:
-                max_n = 5
-            if max_n <= 0:
-                max_n = 5
-            max_n = min(max_n, 20)
-
             results = filtered_items[:max_n]
             
             if not results:
@@ -1044,12 +1083,7 @@ def _fetch_requests_by_status_from_db(status: str = None, priority: str = None,
         
         query += """
             ORDER BY 
-                CASE yc.do_uu_tien 
-                    WHEN 'khan_cap' THEN 1 
-                    WHEN 'cao' THEN 2 
-                    WHEN 'trung_binh' THEN 3 
-                    ELSE 4 
-                END,
+                yc.diem_uu_tien DESC,
                 yc.created_at DESC
             LIMIT %s
         """
@@ -1061,7 +1095,7 @@ def _fetch_requests_by_status_from_db(status: str = None, priority: str = None,
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching requests by status: {e}")
+        logger.warning("Error fetching requests by status: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1100,7 +1134,7 @@ def _fetch_requests_by_type_from_db(request_type: str = None, limit: int = 20):
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching requests by type: {e}")
+        logger.warning("Error fetching requests by type: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1139,7 +1173,7 @@ def _fetch_resources_by_type_from_db(resource_type: str = None, limit: int = 30)
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching resources by type: {e}")
+        logger.warning("Error fetching resources by type: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1158,11 +1192,11 @@ def _fetch_low_stock_resources_from_db(limit: int = 20):
             SELECT nl.id, nl.ten_nguon_luc, nl.loai, nl.so_luong, nl.don_vi, 
                    nl.trang_thai, nl.so_luong_toi_thieu,
                    tt.ten_trung_tam, tt.dia_chi,
-                   (nl.so_luong * 100.0 / NULLIF(nl.so_luong_toi_thieu, 0)) as percent_remaining
+                   nl.ty_le_con_lai as percent_remaining
             FROM nguon_lucs nl
             JOIN trung_tam_cuu_tros tt ON nl.id_trung_tam = tt.id
             WHERE nl.so_luong <= nl.so_luong_toi_thieu * 1.5
-            ORDER BY percent_remaining ASC, nl.so_luong ASC
+            ORDER BY nl.ty_le_con_lai ASC NULLS FIRST, nl.so_luong ASC
             LIMIT %s
         """, (limit,))
         
@@ -1171,7 +1205,7 @@ def _fetch_low_stock_resources_from_db(limit: int = 20):
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching low stock resources: {e}")
+        logger.warning("Error fetching low stock resources: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1187,38 +1221,37 @@ def _fetch_recent_activities_from_db(limit: int = 15):
     try:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Get recent requests
+        # Yêu cầu mới + phân phối gần đây trong một query UNION ALL,
+        # mỗi nhánh LIMIT theo index thời gian của bảng tương ứng
         cur.execute("""
-            SELECT 'request' as activity_type, id, loai_yeu_cau as description, 
-                   trang_thai_phe_duyet as status, created_at
-            FROM yeu_cau_cuu_tros
+            (
+                SELECT 'request' as activity_type, id, loai_yeu_cau as description,
+                       trang_thai_phe_duyet as status, created_at
+                FROM yeu_cau_cuu_tros
+                ORDER BY created_at DESC
+                LIMIT %s
+            )
+            UNION ALL
+            (
+                SELECT 'distribution' as activity_type, pp.id, nl.ten_nguon_luc as description,
+                       pp.trang_thai as status, COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) as created_at
+                FROM phan_phois pp
+                JOIN nguon_lucs nl ON pp.id_nguon_luc = nl.id
+                WHERE pp.thoi_gian_xuat IS NOT NULL OR pp.thoi_gian_giao IS NOT NULL
+                ORDER BY COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) DESC
+                LIMIT %s
+            )
             ORDER BY created_at DESC
             LIMIT %s
-        """, (limit,))
-        requests = cur.fetchall()
-        
-        # Get recent distributions
-        cur.execute("""
-            SELECT 'distribution' as activity_type, pp.id, nl.ten_nguon_luc as description,
-                   pp.trang_thai as status, COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) as created_at
-            FROM phan_phois pp
-            JOIN nguon_lucs nl ON pp.id_nguon_luc = nl.id
-            WHERE pp.thoi_gian_xuat IS NOT NULL OR pp.thoi_gian_giao IS NOT NULL
-            ORDER BY COALESCE(pp.thoi_gian_xuat, pp.thoi_gian_giao) DESC
-            LIMIT %s
-        """, (limit,))
-        distributions = cur.fetchall()
+        """, (limit, limit, limit))
+        activities = cur.fetchall()
         
         cur.close()
         conn.close()
         
-        # Combine and sort by time
-        activities = list(requests) + list(distributions)
-        activities.sort(key=lambda x: x.get('created_at') or datetime.min, reverse=True)
-        
-        return activities[:limit]
+        return activities
     except Exception as e:
-        print(f"DEBUG: Error fetching recent activities: {e}")
+        logger.warning("Error fetching recent activities: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1242,7 +1275,7 @@ def _fetch_urgent_requests_from_db(limit: int = 20):
             WHERE yc.do_uu_tien IN ('khan_cap', 'cao')
             AND yc.trang_thai_phe_duyet != 'tu_choi'
             ORDER BY 
-                CASE yc.do_uu_tien WHEN 'khan_cap' THEN 1 ELSE 2 END,
+                yc.diem_uu_tien DESC,
                 yc.created_at DESC
             LIMIT %s
         """, (limit,))
@@ -1252,7 +1285,7 @@ def _fetch_urgent_requests_from_db(limit: int = 20):
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error fetching urgent requests: {e}")
+        logger.warning("Error fetching urgent requests: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1283,7 +1316,7 @@ def _compare_resources_between_centers():
         conn.close()
         return rows
     except Exception as e:
-        print(f"DEBUG: Error comparing resources: {e}")
+        logger.warning("Error comparing resources: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1336,7 +1369,7 @@ def _fetch_total_affected_people():
         conn.close()
         return stats
     except Exception as e:
-        print(f"DEBUG: Error fetching affected people: {e}")
+        logger.warning("Error fetching affected people: %s", e)
         try:
             conn.close()
         except Exception:
@@ -1798,3 +1831,7 @@ class ActionGetTotalAffectedPeople(Action):
         except Exception as e:
             dispatcher.utter_message(text=f"Lỗi khi lấy thống kê: {str(e)}")
         return []
+
+
+# Span cho mọi Action.run, truy vấn database (_fetch_*, mở kết nối) - xem tracing.py
+instrument_actions(globals(), Action, helper_prefixes=("_fetch_", "_get_db_conn", "_compare_resources"))
@@ -0,0 +1,73 @@
+"""
+Log JSON cho action server, cùng định dạng với ai-service/log_setup.py (ts, level, logger, msg,
+request_id và các field extra) để gom chung một chỗ
+
+Chỉ gắn handler vào logger của code actions ("actions", "tracing"), không động tới root logger
+mà Rasa SDK đã cấu hình; LOG_ROOT_HANDLER=true để thay handler của root (log của SDK cũng ra JSON).
+request_id là trace id của lần chạy action (tracing.py gán vào request_id_var).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+# Logger của actions.py / tracing.py (nạp theo package "actions" hoặc nạp file trực tiếp)
+APP_LOGGERS = ("actions", "tracing")
+
+# Thuộc tính có sẵn của LogRecord; phần còn lại là field từ extra=...
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_configured = False
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """Cấu hình một lần (LOG_LEVEL, LOG_FORMAT=json|text, LOG_ROOT_HANDLER); gọi lại không có tác dụng"""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)-7s %(name)s %(message)s") if fmt == "text" else JsonFormatter()
+    )
+
+    if os.getenv("LOG_ROOT_HANDLER", "false").lower() == "true":
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level)
+        return
+    for name in APP_LOGGERS:
+        app_logger = logging.getLogger(name)
+        app_logger.addHandler(handler)
+        app_logger.setLevel(level)
+        # Không đẩy tiếp lên root: tránh ghi hai lần qua handler của Rasa SDK
+        app_logger.propagate = False
@@ -0,0 +1,302 @@
+"""
+Tracing cho action server - đo thời gian từng Action.run, _fetch_* và gọi HTTP
+
+Mỗi span theo mô hình dữ liệu OpenTelemetry (traceId / spanId / parentSpanId, thời gian
+nanosecond, status). Exporter chọn bằng TRACING_EXPORTER:
+- none (mặc định): chỉ gom số liệu trong bộ nhớ cho báo cáo latency
+- console / file: mỗi span một dòng JSON (stdout hoặc TRACING_FILE)
+- otel: mở thêm span qua opentelemetry API (SDK / exporter cấu hình bên ngoài)
+
+Action chạy lâu hơn ACTION_SLOW_MS bị log kèm thời gian từng bước con. Báo cáo
+latency theo từng action: latency_report() / format_report(), ghi qua logger khi tắt server,
+hoặc dựng lại từ file span:  python -m actions.tracing traces.jsonl
+"""
+
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from actions.log_setup import request_id_var
+except ImportError:
+    from log_setup import request_id_var
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.environ.get("TRACING_FILE", "traces.jsonl")
+ACTION_SLOW_MS = float(os.environ.get("ACTION_SLOW_MS", "1000"))
+# Số lần đo gần nhất giữ lại cho mỗi span khi tính percentile
+TRACING_WINDOW = int(os.environ.get("TRACING_WINDOW", "1000"))
+
+ACTION_PREFIX = "action."
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "error", "children")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+        # (tên, thời gian ms) của các span con trực tiếp - để tính self time và log action chậm
+        self.children: List[tuple] = []
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    @property
+    def self_ms(self) -> float:
+        """Thời gian không nằm trong span con (với action: chủ yếu là định dạng tin nhắn)"""
+        return max(self.duration_ms - sum(ms for _, ms in self.children), 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error
+            else {"code": "STATUS_CODE_OK"},
+        }
+
+
+class _JsonLinesExporter:
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+
+def _make_exporter():
+    if TRACING_EXPORTER == "console":
+        return _JsonLinesExporter(sys.stdout)
+    if TRACING_EXPORTER == "file":
+        return _JsonLinesExporter(open(TRACING_FILE, "a", encoding="utf-8"))
+    return None
+
+
+def _make_otel_tracer():
+    if TRACING_EXPORTER != "otel":
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed, tracing to memory only")
+        return None
+    return trace.get_tracer("relieflink.actions")
+
+
+_exporter = _make_exporter() if TRACING_ENABLED else None
+_otel_tracer = _make_otel_tracer() if TRACING_ENABLED else None
+
+
+class LatencyStats:
+    """Gom thời gian theo tên span (cửa sổ TRACING_WINDOW lần đo gần nhất)"""
+
+    def __init__(self, window: int = TRACING_WINDOW):
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._self_ms = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def record(self, name: str, duration_ms: float, self_ms: float, error: bool = False):
+        with self._lock:
+            self._durations[name].append(duration_ms)
+            self._self_ms[name] += self_ms
+            self._counts[name] += 1
+            if error:
+                self._errors[name] += 1
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snapshot = {name: sorted(d) for name, d in self._durations.items()}
+            counts, errors, self_ms = dict(self._counts), dict(self._errors), dict(self._self_ms)
+        report = {}
+        for name, durations in snapshot.items():
+            if not durations:
+                continue
+            report[name] = {
+                "count": counts[name],
+                "errors": errors.get(name, 0),
+                "mean_ms": round(sum(durations) / len(durations), 2),
+                "p50_ms": round(_percentile(durations, 0.50), 2),
+                "p95_ms": round(_percentile(durations, 0.95), 2),
+                "max_ms": round(durations[-1], 2),
+                "self_mean_ms": round(self_ms[name] / counts[name], 2),
+            }
+        return report
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+stats = LatencyStats()
+
+
+def _finish(span: Span, parent: Optional[Span]):
+    duration_ms = span.duration_ms
+    if parent is not None:
+        parent.children.append((span.name, duration_ms))
+    stats.record(span.name, duration_ms, span.self_ms, error=span.error is not None)
+    if _exporter is not None:
+        try:
+            _exporter.export(span)
+        except Exception as e:
+            logger.warning("Error exporting span %s: %s", span.name, e)
+    if span.name.startswith(ACTION_PREFIX) and duration_ms >= ACTION_SLOW_MS:
+        steps = ", ".join(f"{name} {ms:.0f}ms" for name, ms in span.children)
+        logger.warning("Slow action %s: %.0fms (%sself %.0fms)", span.name[len(ACTION_PREFIX):], duration_ms,
+                       steps + ", " if steps else "", span.self_ms, extra={"trace_id": span.trace_id})
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Mở span con của span hiện tại; exception được ghi vào status rồi raise tiếp"""
+    if not TRACING_ENABLED:
+        yield Span(name, None, attributes)
+        return
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    # Span gốc (một lần chạy action): trace id làm request id cho mọi log bên trong
+    request_token = request_id_var.set(current.trace_id) if parent is None else None
+    with contextlib.ExitStack() as stack:
+        if _otel_tracer is not None:
+            stack.enter_context(_otel_tracer.start_as_current_span(name, attributes=attributes))
+        try:
+            yield current
+        except BaseException as e:
+            current.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if request_token is not None:
+                request_id_var.reset(request_token)
+            _finish(current, parent)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: mỗi lần gọi hàm (sync hoặc async) là một span"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if getattr(fn, "__traced__", False):
+            return fn
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with span(span_name):
+                    return fn(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def instrument_actions(namespace: Dict[str, Any], action_base: type, helper_prefixes: Iterable[str] = ("_fetch_",)):
+    """
+    Gắn @traced cho mọi <action>.run và các helper (_fetch_*) trong module actions
+
+    Gọi ở cuối module với globals(): các hàm trong module gọi nhau qua tên global nên
+    bản đã bọc được dùng ở mọi chỗ gọi.
+    """
+    prefixes = tuple(helper_prefixes)
+    for attr, obj in list(namespace.items()):
+        if callable(obj) and not isinstance(obj, type) and attr.startswith(prefixes):
+            namespace[attr] = traced(attr)(obj)
+        elif isinstance(obj, type) and issubclass(obj, action_base) and obj is not action_base \
+                and "run" in vars(obj):
+            obj.run = traced(f"{ACTION_PREFIX}{obj.__name__}")(obj.run)
+
+
+def latency_report() -> Dict[str, Dict[str, float]]:
+    return stats.report()
+
+
+def format_report(report: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    report = latency_report() if report is None else report
+    lines = [f"{'span':48} {'count':>7} {'err':>5} {'p50':>9} {'p95':>9} {'max':>9} {'self':>9}"]
+    # Action trước (theo p95 giảm dần), sau đó tới các bước con
+    ordered = sorted(report.items(), key=lambda item: (not item[0].startswith(ACTION_PREFIX), -item[1]["p95_ms"]))
+    for name, row in ordered:
+        lines.append(f"{name:48} {row['count']:7d} {row['errors']:5d} {row['p50_ms']:7.1f}ms "
+                     f"{row['p95_ms']:7.1f}ms {row['max_ms']:7.1f}ms {row['self_mean_ms']:7.1f}ms")
+    return "\n".join(lines)
+
+
+def report_from_file(path: str) -> Dict[str, Dict[str, float]]:
+    """Dựng báo cáo latency từ file span (TRACING_EXPORTER=file)"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    child_ms = defaultdict(float)
+    for s in spans:
+        if s.get("parentSpanId"):
+            child_ms[s["parentSpanId"]] += (s["endTimeUnixNano"] - s["startTimeUnixNano"]) / 1e6
+    file_stats = LatencyStats(window=max(len(spans), 1))
+    for s in spans:
+        duration_ms = (s["endTimeUnixNano"] - s["startTimeUnixNano"]) / 1e6
+        file_stats.record(
+            s["name"], duration_ms, max(duration_ms - child_ms[s["spanId"]], 0.0),
+            error=s.get("status", {}).get("code") == "STATUS_CODE_ERROR",
+        )
+    return file_stats.report()
+
+
+@atexit.register
+def _log_report_on_exit():
+    report = stats.report() if TRACING_ENABLED else None
+    if report:
+        logger.info("Action latency report\n%s", format_report(report), extra={"latency_report": report})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m actions.tracing <traces.jsonl>")
+        sys.exit(1)
+    print(format_report(report_from_file(sys.argv[1])))
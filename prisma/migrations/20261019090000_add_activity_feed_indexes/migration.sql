@@ -0,0 +1,11 @@
+-- Index phục vụ feed "hoạt động gần đây" (query UNION ALL trong ai-service và chatbot):
+-- mỗi nhánh ORDER BY ... DESC LIMIT n chỉ cần đọc n entry đầu của index.
+
+-- CreateIndex
+CREATE INDEX "yeu_cau_cuu_tros_created_at_idx" ON "yeu_cau_cuu_tros"("created_at" DESC);
+
+-- CreateIndex
+-- Expression + partial index: Prisma schema không biểu diễn được, khai báo thủ công.
+-- Biểu thức và điều kiện WHERE phải khớp đúng với query để planner dùng được index.
+CREATE INDEX "phan_phois_thoi_gian_hoat_dong_idx" ON "phan_phois"((COALESCE("thoi_gian_xuat", "thoi_gian_giao")) DESC)
+WHERE "thoi_gian_xuat" IS NOT NULL OR "thoi_gian_giao" IS NOT NULL;
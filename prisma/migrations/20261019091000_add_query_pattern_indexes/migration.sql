@@ -0,0 +1,85 @@
+-- Index cho các query của ai-service (main.py) và chatbot (actions/actions.py).
+-- Các index thường khai báo trong schema.prisma (@@index); expression/partial/trigram
+-- index không biểu diễn được trong Prisma nên chỉ có ở đây.
+-- Kiểm tra planner dùng đúng index: python ai-service/scripts/check_query_plans.py
+
+-- CreateExtension
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- CreateFunction
+-- Thứ hạng độ ưu tiên dùng trong ORDER BY. IMMUTABLE để dùng được trong index;
+-- query phải gọi đúng priority_rank(do_uu_tien) thì mới khớp expression index.
+CREATE OR REPLACE FUNCTION priority_rank(do_uu_tien TEXT) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE do_uu_tien
+        WHEN 'khan_cap' THEN 1
+        WHEN 'cao' THEN 2
+        WHEN 'trung_binh' THEN 3
+        ELSE 4
+    END
+$$;
+
+-- CreateIndex
+CREATE INDEX "nguoi_dungs_vai_tro_idx" ON "nguoi_dungs"("vai_tro");
+
+-- CreateIndex
+CREATE INDEX "yeu_cau_cuu_tros_id_nguoi_dung_created_at_idx" ON "yeu_cau_cuu_tros"("id_nguoi_dung", "created_at" DESC);
+
+-- CreateIndex
+-- Yêu cầu chờ duyệt / lọc theo trạng thái phê duyệt, sắp theo độ ưu tiên rồi thời gian
+CREATE INDEX "yeu_cau_cuu_tros_phe_duyet_uu_tien_idx" ON "yeu_cau_cuu_tros"("trang_thai_phe_duyet", priority_rank("do_uu_tien"), "created_at" DESC);
+
+-- CreateIndex
+-- Danh sách yêu cầu không lọc trạng thái
+CREATE INDEX "yeu_cau_cuu_tros_uu_tien_idx" ON "yeu_cau_cuu_tros"(priority_rank("do_uu_tien"), "created_at" DESC);
+
+-- CreateIndex
+-- Yêu cầu khẩn cấp: partial index khớp điều kiện WHERE của query
+CREATE INDEX "yeu_cau_cuu_tros_khan_cap_idx" ON "yeu_cau_cuu_tros"(priority_rank("do_uu_tien"), "created_at" DESC)
+WHERE "do_uu_tien" IN ('khan_cap', 'cao') AND "trang_thai_phe_duyet" <> 'tu_choi';
+
+-- CreateIndex
+CREATE INDEX "yeu_cau_cuu_tros_dia_chi_trgm_idx" ON "yeu_cau_cuu_tros" USING GIN (LOWER("dia_chi") gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "yeu_cau_cuu_tros_loai_yeu_cau_trgm_idx" ON "yeu_cau_cuu_tros" USING GIN (LOWER("loai_yeu_cau") gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "trung_tam_cuu_tros_dia_chi_trgm_idx" ON "trung_tam_cuu_tros" USING GIN (LOWER("dia_chi") gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "trung_tam_cuu_tros_ten_trung_tam_trgm_idx" ON "trung_tam_cuu_tros" USING GIN (LOWER("ten_trung_tam") gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "nguon_lucs_id_trung_tam_idx" ON "nguon_lucs"("id_trung_tam");
+
+-- CreateIndex
+CREATE INDEX "nguon_lucs_loai_trgm_idx" ON "nguon_lucs" USING GIN (LOWER("loai") gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "nguon_lucs_ten_nguon_luc_trgm_idx" ON "nguon_lucs" USING GIN (LOWER("ten_nguon_luc") gin_trgm_ops);
+
+-- CreateIndex
+-- Nguồn lực sắp hết: chỉ index các dòng thỏa điều kiện, sắp theo % còn lại
+CREATE INDEX "nguon_lucs_ton_kho_thap_idx" ON "nguon_lucs"(("so_luong" * 100.0 / NULLIF("so_luong_toi_thieu", 0)) ASC NULLS FIRST, "so_luong")
+WHERE "so_luong" <= "so_luong_toi_thieu" * 1.5;
+
+-- CreateIndex
+CREATE INDEX "phan_phois_id_yeu_cau_idx" ON "phan_phois"("id_yeu_cau");
+
+-- CreateIndex
+CREATE INDEX "phan_phois_id_nguon_luc_idx" ON "phan_phois"("id_nguon_luc");
+
+-- CreateIndex
+CREATE INDEX "phan_phois_id_tinh_nguyen_vien_idx" ON "phan_phois"("id_tinh_nguyen_vien");
+
+-- CreateIndex
+-- ORDER BY thoi_gian_xuat DESC NULLS LAST, id DESC (lịch sử phân phối)
+CREATE INDEX "phan_phois_thoi_gian_xuat_id_idx" ON "phan_phois"("thoi_gian_xuat" DESC NULLS LAST, "id" DESC);
+
+-- CreateIndex
+-- Lọc theo trạng thái + khoảng thời gian xuất (lịch sử phân phối, dữ liệu train)
+CREATE INDEX "phan_phois_trang_thai_thoi_gian_xuat_idx" ON "phan_phois"("trang_thai", "thoi_gian_xuat" DESC NULLS LAST, "id" DESC);
+
+-- CreateIndex
+CREATE INDEX "thong_baos_id_nguoi_nhan_created_at_idx" ON "thong_baos"("id_nguoi_nhan", "created_at" DESC);
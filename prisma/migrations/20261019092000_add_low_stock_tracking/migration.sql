@@ -0,0 +1,33 @@
+-- Theo dõi nguồn lực sắp hết (so_luong <= so_luong_toi_thieu * 1.5):
+-- cột tỷ lệ còn lại được tính sẵn (stored generated column), partial index theo
+-- điều kiện sắp hết, và trigger NOTIFY để ai-service cập nhật danh sách trong bộ nhớ.
+
+-- AlterTable
+ALTER TABLE "nguon_lucs" ADD COLUMN "ty_le_con_lai" NUMERIC
+GENERATED ALWAYS AS ("so_luong" * 100.0 / NULLIF("so_luong_toi_thieu", 0)) STORED;
+
+-- DropIndex
+DROP INDEX IF EXISTS "nguon_lucs_ton_kho_thap_idx";
+
+-- CreateIndex
+CREATE INDEX "nguon_lucs_ton_kho_thap_idx" ON "nguon_lucs"("ty_le_con_lai" ASC NULLS FIRST, "so_luong")
+WHERE "so_luong" <= "so_luong_toi_thieu" * 1.5;
+
+-- CreateFunction
+CREATE OR REPLACE FUNCTION notify_nguon_lucs_ton_kho() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('nguon_lucs_ton_kho', json_build_object('op', TG_OP, 'id', OLD."id")::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('nguon_lucs_ton_kho', json_build_object('op', TG_OP, 'id', NEW."id")::text);
+    RETURN NEW;
+END;
+$$;
+
+-- CreateTrigger
+CREATE TRIGGER "nguon_lucs_ton_kho_notify"
+AFTER INSERT OR DELETE OR UPDATE OF "so_luong", "so_luong_toi_thieu", "trang_thai", "ten_nguon_luc", "loai", "don_vi", "id_trung_tam"
+ON "nguon_lucs"
+FOR EACH ROW EXECUTE FUNCTION notify_nguon_lucs_ton_kho();
@@ -0,0 +1,21 @@
+-- NOTIFY khi trung tâm cứu trợ thay đổi để ai-service build lại index
+-- tìm trung tâm gần nhất (GET /centers/nearest).
+
+-- CreateFunction
+CREATE OR REPLACE FUNCTION notify_trung_tam_cuu_tros() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('trung_tam_cuu_tros_thay_doi', json_build_object('op', TG_OP, 'id', OLD."id")::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('trung_tam_cuu_tros_thay_doi', json_build_object('op', TG_OP, 'id', NEW."id")::text);
+    RETURN NEW;
+END;
+$$;
+
+-- CreateTrigger
+CREATE TRIGGER "trung_tam_cuu_tros_notify"
+AFTER INSERT OR DELETE OR UPDATE OF "vi_do", "kinh_do", "ten_trung_tam", "dia_chi", "so_lien_he"
+ON "trung_tam_cuu_tros"
+FOR EACH ROW EXECUTE FUNCTION notify_trung_tam_cuu_tros();
@@ -0,0 +1,10 @@
+-- Index cho job auto-matching của ai-service (matching.py).
+
+-- CreateIndex
+-- Partial index: chỉ chứa yêu cầu đã phê duyệt còn chờ match, đọc sẵn theo thứ tự ưu tiên.
+-- Điều kiện WHERE phải khớp đúng với PENDING_REQUESTS_QUERY.
+CREATE INDEX "yeu_cau_cuu_tros_cho_match_idx" ON "yeu_cau_cuu_tros"("diem_uu_tien" DESC, "created_at")
+WHERE "trang_thai_phe_duyet" = 'da_phe_duyet' AND "trang_thai_matching" = 'chua_match';
+
+-- CreateIndex
+CREATE INDEX "yeu_cau_cuu_tros_id_nguon_luc_match_idx" ON "yeu_cau_cuu_tros"("id_nguon_luc_match");
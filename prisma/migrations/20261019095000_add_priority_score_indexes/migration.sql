@@ -0,0 +1,67 @@
+-- Sắp xếp theo diem_uu_tien (do ai-service/priority_scoring.py tính định kỳ)
+-- thay cho priority_rank(do_uu_tien).
+
+-- CreateFunction
+-- Điểm mặc định cho yêu cầu mới (độ khẩn cấp + số người, cùng thang 0-100),
+-- để yêu cầu không nằm cuối danh sách tới lượt chấm điểm tiếp theo.
+CREATE OR REPLACE FUNCTION diem_uu_tien_mac_dinh(do_uu_tien TEXT, so_nguoi INTEGER) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT LEAST(100,
+        CASE do_uu_tien
+            WHEN 'khan_cap' THEN 50
+            WHEN 'cao' THEN 40
+            WHEN 'trung_binh' THEN 25
+            ELSE 10
+        END
+        + CASE
+            WHEN so_nguoi >= 100 THEN 30
+            WHEN so_nguoi >= 50 THEN 25
+            WHEN so_nguoi >= 20 THEN 20
+            WHEN so_nguoi >= 10 THEN 15
+            ELSE 10
+        END
+    )
+$$;
+
+-- CreateFunction
+CREATE OR REPLACE FUNCTION set_diem_uu_tien_mac_dinh() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW."diem_uu_tien" IS NULL OR NEW."diem_uu_tien" = 0 THEN
+        NEW."diem_uu_tien" := diem_uu_tien_mac_dinh(NEW."do_uu_tien", NEW."so_nguoi");
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- CreateTrigger
+CREATE TRIGGER "yeu_cau_cuu_tros_diem_uu_tien_mac_dinh"
+BEFORE INSERT ON "yeu_cau_cuu_tros"
+FOR EACH ROW EXECUTE FUNCTION set_diem_uu_tien_mac_dinh();
+
+-- Backfill: các yêu cầu chưa từng được chấm điểm
+UPDATE "yeu_cau_cuu_tros"
+SET "diem_uu_tien" = diem_uu_tien_mac_dinh("do_uu_tien", "so_nguoi")
+WHERE "diem_uu_tien" = 0;
+
+-- DropIndex
+DROP INDEX IF EXISTS "yeu_cau_cuu_tros_phe_duyet_uu_tien_idx";
+
+-- DropIndex
+DROP INDEX IF EXISTS "yeu_cau_cuu_tros_uu_tien_idx";
+
+-- DropIndex
+DROP INDEX IF EXISTS "yeu_cau_cuu_tros_khan_cap_idx";
+
+-- CreateIndex
+-- Danh sách yêu cầu không lọc trạng thái
+CREATE INDEX "yeu_cau_cuu_tros_diem_uu_tien_created_at_idx" ON "yeu_cau_cuu_tros"("diem_uu_tien" DESC, "created_at" DESC);
+
+-- CreateIndex
+-- Yêu cầu chờ duyệt / lọc theo trạng thái phê duyệt
+CREATE INDEX "yeu_cau_cuu_tros_phe_duyet_diem_uu_tien_idx" ON "yeu_cau_cuu_tros"("trang_thai_phe_duyet", "diem_uu_tien" DESC, "created_at" DESC);
+
+-- CreateIndex
+-- Yêu cầu khẩn cấp: partial index khớp điều kiện WHERE của query
+CREATE INDEX "yeu_cau_cuu_tros_khan_cap_idx" ON "yeu_cau_cuu_tros"("diem_uu_tien" DESC, "created_at" DESC)
+WHERE "do_uu_tien" IN ('khan_cap', 'cao') AND "trang_thai_phe_duyet" <> 'tu_choi';
@@ -0,0 +1,8 @@
+-- ai-service ghi dự báo vào du_bao_ais theo lô (forecast_store.py);
+-- các đọc "dự báo mới nhất" (chatbot, ai-service, /api/ai) chỉ cần đọc đầu index.
+
+-- CreateIndex
+CREATE INDEX "du_bao_ais_ngay_du_bao_created_at_idx" ON "du_bao_ais"("ngay_du_bao" DESC, "created_at" DESC);
+
+-- CreateIndex
+CREATE INDEX "du_bao_ais_tinh_thanh_ngay_du_bao_idx" ON "du_bao_ais"("tinh_thanh", "ngay_du_bao" DESC);
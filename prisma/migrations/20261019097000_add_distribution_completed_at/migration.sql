@@ -0,0 +1,32 @@
+-- Thời điểm phân phối chuyển sang 'hoan_thanh', làm watermark cho train incremental
+-- của ai-service (training.py): một phân phối id nhỏ hoàn thành muộn vẫn được đọc.
+
+-- AlterTable
+ALTER TABLE "phan_phois" ADD COLUMN "hoan_thanh_at" TIMESTAMP(3);
+
+-- Backfill: phân phối đã hoàn thành trước migration
+UPDATE "phan_phois"
+SET "hoan_thanh_at" = COALESCE("thoi_gian_giao", "thoi_gian_xuat", NOW())
+WHERE "trang_thai" = 'hoan_thanh';
+
+-- CreateFunction
+CREATE OR REPLACE FUNCTION set_phan_phoi_hoan_thanh_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW."trang_thai" = 'hoan_thanh'
+       AND (TG_OP = 'INSERT' OR OLD."trang_thai" IS DISTINCT FROM 'hoan_thanh') THEN
+        NEW."hoan_thanh_at" = clock_timestamp();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- CreateTrigger
+CREATE TRIGGER "phan_phois_hoan_thanh_at"
+BEFORE INSERT OR UPDATE OF "trang_thai" ON "phan_phois"
+FOR EACH ROW EXECUTE FUNCTION set_phan_phoi_hoan_thanh_at();
+
+-- CreateIndex
+-- Partial index: điều kiện WHERE phải khớp với TRAINING_QUERY
+CREATE INDEX "phan_phois_hoan_thanh_at_idx" ON "phan_phois"("hoan_thanh_at", "id")
+WHERE "trang_thai" = 'hoan_thanh';
@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { aiServiceHeaders } from "@/lib/ai/service-headers";
 
 /**
  * Proxy endpoint để gọi Python AI Service
@@ -29,7 +30,7 @@ export async function POST(request: NextRequest) {
     try {
       const response = await fetch(`${AI_SERVICE_URL}/predict`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: aiServiceHeaders(),
         body: JSON.stringify({
           tinh_thanh: body.tinh_thanh,
           loai_thien_tai: body.loai_thien_tai,
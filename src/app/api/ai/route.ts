@@ -1,9 +1,20 @@
 import { NextRequest, NextResponse } from "next/server";
+import { aiServiceHeaders } from "@/lib/ai/service-headers";
 import { prisma } from "@/lib/prisma";
 import { generateMockPrediction, generateMultiplePredictions } from "@/lib/ai";
 
 const AI_SERVICE_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
 
+function aiServiceBusy(response: Response) {
+  return NextResponse.json(
+    { error: "AI service đang quá tải, vui lòng thử lại sau" },
+    {
+      status: 429,
+      headers: { "Retry-After": response.headers.get("Retry-After") ?? "5" },
+    },
+  );
+}
+
 // GET /api/ai - Get AI predictions
 export async function GET(request: NextRequest) {
   try {
@@ -37,13 +48,19 @@ export async function GET(request: NextRequest) {
             so_nguoi: undefined,
           }));
 
+          // GET không tự lưu: để AI service ghi dự báo vào du_bao_ais (persist mặc định)
           const response = await fetch(`${AI_SERVICE_URL}/predict/batch`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: aiServiceHeaders(),
             body: JSON.stringify(batchRequests),
             signal: AbortSignal.timeout(15000), // 15s timeout
           });
 
+          if (response.status === 429) {
+            // AI service quá tải: báo cho dashboard thử lại, không thay bằng dữ liệu giả
+            return aiServiceBusy(response);
+          }
+
           if (response.ok) {
             const predictions = await response.json();
             return NextResponse.json({ predictions }, { status: 200 });
@@ -123,13 +140,19 @@ export async function POST(request: NextRequest) {
             )
             .slice(0, 10);
 
-          const response = await fetch(`${AI_SERVICE_URL}/predict/batch`, {
+          // persist=false: route tự lưu bên dưới, AI service không cần ghi thêm vào du_bao_ais
+          const response = await fetch(`${AI_SERVICE_URL}/predict/batch?persist=false`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: aiServiceHeaders(),
             body: JSON.stringify(batchRequests),
             signal: AbortSignal.timeout(15000),
           });
 
+          if (response.status === 429) {
+            // AI service quá tải: báo cho dashboard thử lại, không thay bằng dữ liệu giả
+            return aiServiceBusy(response);
+          }
+
           if (response.ok) {
             const predictions = await response.json();
             
@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { aiServiceHeaders } from "@/lib/ai/service-headers";
 import { prisma } from "@/lib/prisma";
 import { NotificationService } from "@/lib/notificationService";
 
@@ -135,7 +136,7 @@ export async function GET(request: NextRequest) {
         `${AI_SERVICE_URL}/weather/check/${encodeURIComponent(tinh_thanh)}`,
         {
           method: "GET",
-          headers: { "Content-Type": "application/json" },
+          headers: aiServiceHeaders(),
           signal: AbortSignal.timeout(15000), // 15s timeout
         }
       );
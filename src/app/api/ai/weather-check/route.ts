@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { aiServiceHeaders } from "@/lib/ai/service-headers";
 
 const AI_SERVICE_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
 
@@ -23,7 +24,7 @@ export async function GET(request: NextRequest) {
         `${AI_SERVICE_URL}/weather/check/${encodeURIComponent(tinh_thanh)}`,
         {
           method: "GET",
-          headers: { "Content-Type": "application/json" },
+          headers: aiServiceHeaders(),
           signal: AbortSignal.timeout(15000), // 15s timeout
         }
       );
@@ -75,7 +76,7 @@ export async function POST(request: NextRequest) {
         `${AI_SERVICE_URL}/weather/check-batch`,
         {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
+          headers: aiServiceHeaders(),
           body: JSON.stringify(provinces),
           signal: AbortSignal.timeout(30000), // 30s timeout for batch
         }
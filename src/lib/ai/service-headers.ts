@@ -0,0 +1,12 @@
+/**
+ * Header gửi kèm request tới Python AI service.
+ * AI_SERVICE_KEY (trùng ADMISSION_SERVICE_KEY của ai-service) đánh dấu Next.js là caller nội bộ,
+ * không bị rate limit theo IP như client thường.
+ */
+export function aiServiceHeaders(): Record<string, string> {
+  const headers: Record<string, string> = { "Content-Type": "application/json" };
+  if (process.env.AI_SERVICE_KEY) {
+    headers["X-Service-Key"] = process.env.AI_SERVICE_KEY;
+  }
+  return headers;
+}